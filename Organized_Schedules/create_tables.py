@@ -1,16 +1,18 @@
 import os
-from supabase import create_client
+import sys
 from dotenv import load_dotenv
 from supabase_config import *
 
+# Shared client setup lives in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from connections import get_supabase
+
 def init_supabase():
     """Initialize Supabase client"""
     load_dotenv()
     
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        raise ValueError("Missing Supabase credentials. Please set SUPABASE_URL and SUPABASE_KEY environment variables.")
-    
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    # One pooled client per process, shared with the rest of the project
+    return get_supabase()
 
 def create_tables(supabase):
     """Create tables in Supabase"""
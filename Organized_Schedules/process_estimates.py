@@ -97,15 +97,15 @@ def main():
         
         print(f"\nFound {len(all_schedules)} valid schedules to process")
         
-        # Initialize Supabase and process schedules
-        from upload_to_supabase import init_supabase
-        supabase = init_supabase()
+        # Initialize the repository and process schedules
+        from upload_to_supabase import init_repository
+        repository = init_repository()
         
         # Process each schedule
         for i, schedule_data in enumerate(all_schedules, 1):
             try:
                 print(f"\nProcessing schedule {i}/{len(all_schedules)}")
-                result = process_schedule(supabase, schedule_data)
+                result = process_schedule(repository, schedule_data)
                 print(f"Successfully created schedule: {result['id']}")
             except Exception as e:
                 print(f"Error processing schedule: {str(e)}")
@@ -1,19 +1,24 @@
 import os
-import pandas as pd
-from supabase import create_client
+import sys
 from dotenv import load_dotenv
 import uuid
 from datetime import datetime, timedelta
 from supabase_config import *
 
-def init_supabase():
-    """Initialize Supabase client"""
+# Shared helpers such as the services cache live in the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from repository import get_repository
+from services_cache import ServicesCache
+
+# One services cache per repository, keyed by id(repository)
+_services_caches = {}
+
+def init_repository():
+    """Initialize the storage repository (Supabase unless REPOSITORY_BACKEND says otherwise)"""
     load_dotenv()
     
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        raise ValueError("Missing Supabase credentials. Please set SUPABASE_URL and SUPABASE_KEY environment variables.")
-    
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    # One repository per process, shared with the rest of the project
+    return get_repository()
 
 def validate_client_data(data):
     """Validate client data before insertion"""
@@ -95,74 +100,78 @@ def validate_schedule_data(data):
         'status': data.get('status', 'scheduled')
     }
 
-def insert_data(supabase, table_name, data, validate_func):
+def insert_data(repository, table_name, data, validate_func):
     """Insert data into specified table with validation"""
     try:
         validated_data = validate_func(data)
-        response = supabase.table(table_name).insert(validated_data).execute()
-        return response.data[0]
+        return repository.create(table_name, validated_data)
     except Exception as e:
         print(f"Error inserting data into {table_name}: {str(e)}")
         raise
 
-def get_or_create_client(supabase, client_data):
+def get_or_create_client(repository, client_data):
     """Get existing client or create new one"""
     try:
         # Check if client exists by email or name
-        query = supabase.table(CLIENTS_TABLE)
         if client_data.get('email'):
-            response = query.select('*').eq('email', client_data['email']).execute()
+            match = {'email': client_data['email']}
         else:
-            response = query.select('*').eq('name', client_data['name']).execute()
+            match = {'name': client_data['name']}
         
-        if response.data:
-            return response.data[0]
-        
-        # Create new client if not found
-        return insert_data(supabase, CLIENTS_TABLE, client_data, validate_client_data)
+        client, _ = repository.get_or_create(CLIENTS_TABLE, match, validate_client_data(client_data))
+        return client
     except Exception as e:
         print(f"Error in get_or_create_client: {str(e)}")
         raise
 
-def get_or_create_service(supabase, service_data):
+def get_services_cache(repository):
+    """Get the services cache for this repository, creating it on first use"""
+    cache = _services_caches.get(id(repository))
+    if cache is None:
+        cache = ServicesCache(lambda: repository.all(SERVICES_TABLE))
+        _services_caches[id(repository)] = cache
+    return cache
+
+def get_or_create_service(repository, service_data):
     """Get existing service or create new one"""
     try:
-        # Check if service exists by name
-        response = supabase.table(SERVICES_TABLE).select('*').eq('name', service_data['name']).execute()
+        # Check if service exists by name, without a database round-trip
+        services_cache = get_services_cache(repository)
+        service = services_cache.get_by_name(service_data['name'])
         
-        if response.data:
-            return response.data[0]
+        if service:
+            return service
         
-        # Create new service if not found
-        return insert_data(supabase, SERVICES_TABLE, service_data, validate_service_data)
+        # Create new service if not found, and add it to the cache
+        service = insert_data(repository, SERVICES_TABLE, service_data, validate_service_data)
+        services_cache.put(service)
+        return service
     except Exception as e:
         print(f"Error in get_or_create_service: {str(e)}")
         raise
 
-def get_or_create_location(supabase, location_data):
+def get_or_create_location(repository, location_data):
     """Get existing location or create new one"""
     try:
         # Check if location exists by address
-        query = supabase.table(LOCATIONS_TABLE)
         if location_data.get('address'):
-            response = query.select('*').eq('address', location_data['address']).execute()
-            
-            if response.data:
-                return response.data[0]
+            location, _ = repository.get_or_create(LOCATIONS_TABLE, {'address': location_data['address']},
+                                                   validate_location_data(location_data))
+            return location
         
-        # Create new location if not found
-        return insert_data(supabase, LOCATIONS_TABLE, location_data, validate_location_data)
+        # Without an address there is nothing to match on
+        return insert_data(repository, LOCATIONS_TABLE, location_data, validate_location_data)
     except Exception as e:
         print(f"Error in get_or_create_location: {str(e)}")
         raise
 
-def process_schedule(supabase, schedule_data):
+def process_schedule(repository, schedule_data):
     """Process and insert schedule data"""
     try:
         # Get or create related records
-        client = get_or_create_client(supabase, schedule_data['client'])
-        service = get_or_create_service(supabase, schedule_data['service'])
-        location = get_or_create_location(supabase, schedule_data['location'])
+        client = get_or_create_client(repository, schedule_data['client'])
+        service = get_or_create_service(repository, schedule_data['service'])
+        location = get_or_create_location(repository, schedule_data['location'])
         
         # Prepare schedule data
         schedule = {
@@ -177,7 +186,7 @@ def process_schedule(supabase, schedule_data):
         }
         
         # Insert schedule
-        return insert_data(supabase, SCHEDULES_TABLE, schedule, validate_schedule_data)
+        return insert_data(repository, SCHEDULES_TABLE, schedule, validate_schedule_data)
     except Exception as e:
         print(f"Error processing schedule: {str(e)}")
         raise
@@ -185,8 +194,8 @@ def process_schedule(supabase, schedule_data):
 def main():
     """Main function to process and upload data"""
     try:
-        # Initialize Supabase client
-        supabase = init_supabase()
+        # Initialize the repository
+        repository = init_repository()
         
         # Example schedule data (replace with your actual data source)
         schedule_data = {
@@ -213,7 +222,7 @@ def main():
         }
         
         # Process schedule
-        result = process_schedule(supabase, schedule_data)
+        result = process_schedule(repository, schedule_data)
         print(f"Successfully created schedule: {result}")
         
     except Exception as e:
@@ -0,0 +1,125 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+import metrics
+
+# Outbound LLM limits, overridable from the environment
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+LLM_RATE_PER_MINUTE = float(os.getenv('LLM_RATE_PER_MINUTE', '120'))
+LLM_BURST = int(os.getenv('LLM_BURST', '10'))
+LLM_MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', '32'))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv('LLM_QUEUE_TIMEOUT_SECONDS', '10'))
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot get an LLM slot in time; maps to an HTTP 429 or 503."""
+
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+
+class LLMLimiter:
+    """Concurrency cap plus token-bucket rate limit for outbound LLM calls.
+
+    At most `max_concurrency` calls run at once and calls start at no more
+    than `rate_per_minute` (with bursts up to `burst`). Up to `max_queue`
+    callers may wait for a slot; beyond that, or when the wait would exceed
+    `queue_timeout`, callers are rejected straight away so the ones already
+    admitted keep predictable latency.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, rate_per_minute: float = LLM_RATE_PER_MINUTE,
+                 burst: int = LLM_BURST, max_queue: int = LLM_MAX_QUEUE,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._waiting = 0
+        self._active = 0
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def _token_wait(self) -> float:
+        """Seconds until a token is available, without taking it."""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate if self.rate > 0 else math.inf
+
+    def _reject(self, reason: str, status_code: int, retry_after: float):
+        metrics.LLM_REJECTED.inc(reason=reason)
+        raise AdmissionRejected(f"LLM capacity exceeded ({reason}), please retry later", status_code, retry_after)
+
+    async def acquire(self, wait: bool = False):
+        """Wait for a call slot, or raise AdmissionRejected.
+
+        With `wait`, the call belongs to work that was already admitted, such as a
+        later tool round of a chat turn: it still takes a token and a slot, but
+        waits as long as that takes instead of being rejected halfway through.
+        """
+        token_wait = self._token_wait()
+        if token_wait > self.queue_timeout and not wait:
+            self._reject('rate_limited', 429, token_wait)
+
+        # Fast path: a token and a slot are free, so there is nothing to queue for
+        if token_wait == 0 and not self._semaphore.locked():
+            self._tokens -= 1
+            await self._semaphore.acquire()
+            self._active += 1
+            return
+
+        if self._waiting >= self.max_queue and not wait:
+            self._reject('queue_full', 503, self.queue_timeout)
+
+        # Reserve the token now so later callers queue up behind this one
+        self._tokens -= 1
+        deadline = time.monotonic() + self.queue_timeout
+        self._waiting += 1
+        metrics.LLM_QUEUE_DEPTH.set(self._waiting)
+        acquired = False
+        try:
+            if token_wait > 0:
+                await asyncio.sleep(token_wait)
+            if wait:
+                await self._semaphore.acquire()
+            else:
+                try:
+                    await asyncio.wait_for(self._semaphore.acquire(), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    self._reject('queue_timeout', 503, self.queue_timeout)
+            acquired = True
+        finally:
+            self._waiting -= 1
+            metrics.LLM_QUEUE_DEPTH.set(self._waiting)
+            if not acquired:
+                # No call was made (timed out, or the caller went away), so the token goes back
+                self._tokens = min(self.burst, self._tokens + 1)
+        self._active += 1
+
+    def release(self):
+        self._active -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self, wait: bool = False):
+        """Hold one LLM call slot for the duration of the block."""
+        await self.acquire(wait)
+        try:
+            yield
+        finally:
+            self.release()
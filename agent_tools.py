@@ -0,0 +1,65 @@
+import json
+import os
+from typing import Any, Dict, List
+
+# Model rounds per turn that may call tools before a final answer is forced
+MAX_TOOL_ROUNDS = int(os.getenv('MAX_TOOL_ROUNDS', '4'))
+
+# Tool results are sent back to the model, so keep them small
+MAX_TOOL_RESULT_ROWS = 20
+MAX_TOOL_RESULT_CHARS = 4000
+
+# Fields the model may change through edit_schedule
+EDITABLE_SCHEDULE_FIELDS = ('service_id', 'service_date', 'start_time', 'end_time', 'notes', 'status', 'crew')
+
+def _tool(name: str, description: str, properties: Dict, required: List[str] = ()) -> Dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": description,
+            "parameters": {"type": "object", "properties": properties, "required": list(required)}
+        }
+    }
+
+DATE = {"type": "string", "description": "Date as YYYY-MM-DD"}
+TIME = {"type": "string", "description": "Time as HH:MM (24-hour)"}
+CREW = {"type": "string", "description": "Crew doing the work; bookings only clash with the same crew's"}
+
+TOOLS = [
+    _tool("search_client", "Find existing clients whose name contains the given text.",
+          {"name": {"type": "string", "description": "Full or partial client name"}}, ["name"]),
+    _tool("get_client_schedules", "List all bookings for one client.",
+          {"client_id": {"type": "string"}}, ["client_id"]),
+    _tool("list_services", "List the services offered, with ids, prices and durations.", {}),
+    _tool("get_calendar", "List all bookings between two dates, inclusive.",
+          {"start_date": DATE, "end_date": DATE}, ["start_date", "end_date"]),
+    _tool("find_free_slots", "Find the earliest open times for a service within business hours. "
+          "Use it to offer times instead of guessing.",
+          {"service_id": {"type": "string"}, "start_date": DATE, "end_date": DATE,
+           "limit": {"type": "integer", "description": "Most slots to return (default 5)"}, "crew": CREW},
+          ["service_id", "start_date", "end_date"]),
+    _tool("create_schedule", "Book a service for a client. Only call after the customer has confirmed the details. "
+          "Fails with the clashing bookings if the time overlaps another booking.",
+          {"client_id": {"type": "string"}, "service_id": {"type": "string"}, "service_date": DATE,
+           "start_time": TIME, "end_time": TIME, "notes": {"type": "string"}, "crew": CREW},
+          ["client_id", "service_id", "service_date"]),
+    _tool("edit_schedule", "Change an existing booking.",
+          {"schedule_id": {"type": "string"},
+           "updates": {"type": "object", "description": "Fields to change",
+                       "properties": {"service_id": {"type": "string"}, "service_date": DATE,
+                                      "start_time": TIME, "end_time": TIME, "notes": {"type": "string"}, "crew": CREW,
+                                      "status": {"type": "string", "enum": ["scheduled", "completed", "cancelled"]}}}},
+          ["schedule_id", "updates"]),
+    _tool("delete_schedule", "Cancel and remove a booking.",
+          {"schedule_id": {"type": "string"}}, ["schedule_id"]),
+]
+
+def format_tool_result(result: Any) -> str:
+    """Serialise a tool result for the model, trimming long lists and output."""
+    if isinstance(result, list) and len(result) > MAX_TOOL_RESULT_ROWS:
+        result = {"rows": result[:MAX_TOOL_RESULT_ROWS], "omitted": len(result) - MAX_TOOL_RESULT_ROWS}
+    text = json.dumps(result, default=str)
+    if len(text) > MAX_TOOL_RESULT_CHARS:
+        text = text[:MAX_TOOL_RESULT_CHARS] + '... (truncated)'
+    return text
@@ -1,106 +1,546 @@
-from flask import Flask, request, jsonify, send_from_directory
-from flask_cors import CORS
-from scheduling_agent import SchedulingAgent
+from quart import Quart, Response, g, request, jsonify
+from quart.json.provider import DefaultJSONProvider
+from quart_cors import cors
 import asyncio
+import base64
+import datetime
+import gzip
+import hashlib
+import hmac
+import json
 import os
+import time
 import traceback
-from functools import wraps
+import uuid
+import metrics
+import static_assets
+from admission import AdmissionRejected
+from connections import probe_connections
+from token_usage import TOKEN_USAGE_LOG_SECONDS, current_endpoint
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider that records serialisation time for every jsonify()."""
+
+    def dumps(self, obj, **kwargs):
+        with metrics.timed('json_serialization'):
+            return super().dumps(obj, **kwargs)
 
 # Set static folder to our simple UI
-app = Flask(__name__, static_folder='simple-scheduling-ui')
-CORS(app)  # Enable CORS for all routes
+# Quart serves the app over ASGI, so every route below runs on the worker's
+# single long-lived event loop and concurrent requests overlap their waits.
+app = cors(Quart(__name__, static_folder='simple-scheduling-ui'))  # Enable CORS for all routes
+app.json = TimedJSONProvider(app)
 agent = None
-loop = None
-
-# Print startup info
-print("\n=== Scheduling GPT API Server ===")
-print(f"Current directory: {os.getcwd()}")
-print(f"Static folder: {app.static_folder}")
-print(f"Static files exist: {os.path.exists(app.static_folder)}")
-print(f"Files in static folder: {os.listdir(app.static_folder) if os.path.exists(app.static_folder) else 'N/A'}")
-
-def async_route(f):
-    @wraps(f)
-    def wrapped(*args, **kwargs):
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        return loop.run_until_complete(f(*args, **kwargs))
-    return wrapped
+agent_lock = asyncio.Lock()
+usage_log_task = None
+metrics.LIVE_SESSIONS.set_function(lambda: len(agent.sessions) if agent is not None else 0)
 
-@app.route('/')
-def index():
+# Opt-in startup work; by default a worker boots without touching the network
+WARM_UP_ON_START = os.getenv('WARM_UP_ON_START', '').lower() in ('1', 'true', 'yes')
+PROBE_ON_START = os.getenv('PROBE_ON_START', '').lower() in ('1', 'true', 'yes')
+
+# Largest batch /api/chat/batch accepts, and the most messages it runs at once
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '500'))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '32'))
+
+# /api/calendar page sizes, and the longest date range one request may cover
+CALENDAR_PAGE_SIZE = int(os.getenv('CALENDAR_PAGE_SIZE', '200'))
+CALENDAR_MAX_PAGE_SIZE = int(os.getenv('CALENDAR_MAX_PAGE_SIZE', '1000'))
+CALENDAR_MAX_DAYS = int(os.getenv('CALENDAR_MAX_DAYS', '366'))
+
+# Most rows one /api/schedules/bulk request may create
+BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', '2000'))
+
+# Free slots returned by /api/availability when the request does not say, and at most
+AVAILABILITY_LIMIT = int(os.getenv('AVAILABILITY_LIMIT', '5'))
+AVAILABILITY_MAX_LIMIT = 100
+
+# JSON responses at least this large are gzipped for clients that accept it
+JSON_COMPRESS_MIN_BYTES = int(os.getenv('JSON_COMPRESS_MIN_BYTES', '1024'))
+
+# Bearer token required by operational endpoints that expose per-customer data; unset disables them
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+# Sessions /api/usage lists by default, and at most
+USAGE_TOP_SESSIONS = 10
+USAGE_MAX_TOP_SESSIONS = 1000
+
+def admin_denied():
+    """An error response unless the request carries the ADMIN_TOKEN bearer token; None if it does."""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'This endpoint is disabled; set ADMIN_TOKEN to enable it'}), 403
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode(), f'Bearer {ADMIN_TOKEN}'.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return None
+
+async def get_agent():
+    """Create the scheduling agent once per worker, on first use."""
+    global agent
+    if agent is None:
+        async with agent_lock:
+            if agent is None:
+                from scheduling_agent import SchedulingAgent
+                print("Initializing scheduling agent...")
+                agent = SchedulingAgent()
+                print("Scheduling agent initialized successfully!")
+    return agent
+
+@app.before_serving
+async def warm_up():
+    if not WARM_UP_ON_START:
+        return
     try:
-        return send_from_directory(app.static_folder, 'index.html')
+        scheduling_agent = await get_agent()
+        status = await asyncio.to_thread(scheduling_agent.warm_up, PROBE_ON_START)
+        print(f"Warm-up complete: {status}")
     except Exception as e:
-        print(f"Error serving index.html: {e}")
+        # A failed warm-up should not stop the worker; requests retry lazily
+        print(f"Error during warm-up: {e}")
         traceback.print_exc()
-        return f"Error serving the application: {str(e)}", 500
+
+async def log_token_usage():
+    """Print the token usage summary every TOKEN_USAGE_LOG_SECONDS while calls are being made."""
+    logged_calls = 0
+    while True:
+        await asyncio.sleep(TOKEN_USAGE_LOG_SECONDS)
+        if agent is None:
+            continue
+        calls = agent.token_usage.calls
+        if calls != logged_calls:
+            logged_calls = calls
+            print(agent.token_usage.log_line())
+
+@app.before_serving
+async def start_usage_log():
+    global usage_log_task
+    if TOKEN_USAGE_LOG_SECONDS > 0:
+        usage_log_task = asyncio.create_task(log_token_usage())
+
+@app.after_serving
+async def shut_down():
+    if usage_log_task is not None:
+        usage_log_task.cancel()
+    # Queued write-behind schedule writes get one last chance to reach Supabase
+    if agent is not None:
+        await asyncio.to_thread(agent.close)
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+    # LLM calls made for this request are counted against its endpoint
+    current_endpoint.set(request.url_rule.rule if request.url_rule else 'unmatched')
+
+@app.after_request
+async def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.STAGE_LATENCY.observe(time.perf_counter() - g.request_started, stage='request')
+    metrics.REQUESTS.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+    if response.status_code >= 500:
+        metrics.REQUEST_ERRORS.inc(endpoint=endpoint)
+    return response
+
+@app.after_request
+async def compress_json(response):
+    if (response.mimetype != 'application/json' or 'Content-Encoding' in response.headers
+            or request.accept_encodings['gzip'] <= 0):
+        return response
+    body = await response.get_data()
+    if len(body) >= JSON_COMPRESS_MIN_BYTES:
+        with metrics.timed('json_compression'):
+            response.set_data(gzip.compress(body, compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+    return response
+
+@app.teardown_request
+async def finish_request(exc):
+    metrics.IN_FLIGHT.dec()
+
+def serve_asset(name: str):
+    """Serve a built UI file from memory, precompressed, with a strong ETag."""
+    asset = static_assets.get_assets().get(name)
+    if asset is None:
+        return 'Not found', 404
+    encoding = asset.negotiate(request.accept_encodings)
+    etag = asset.etag(encoding)
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': asset.cache_control, 'Vary': 'Accept-Encoding'}
+    if request.if_none_match.contains(etag):
+        return '', 304, headers
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(asset.variants[encoding], mimetype=asset.mimetype, headers=headers)
+
+@app.route('/')
+async def index():
+    return serve_asset(static_assets.ENTRY_POINT)
 
 @app.route('/<path:path>')
-def static_files(path):
-    try:
-        return send_from_directory(app.static_folder, path)
-    except Exception as e:
-        print(f"Error serving static file {path}: {e}")
-        return f"Error serving {path}: {str(e)}", 404
+async def static_files(path):
+    return serve_asset(path)
 
 @app.route('/api/chat', methods=['POST'])
-@async_route
 async def chat():
-    global agent
-    if agent is None:
-        try:
-            print("Initializing scheduling agent...")
-            agent = SchedulingAgent()
-            print("Scheduling agent initialized successfully!")
-        except Exception as e:
-            error_msg = f"Error initializing agent: {e}"
-            print(error_msg)
-            traceback.print_exc()
-            return jsonify({'error': error_msg}), 500
-    
-    data = request.json
+    try:
+        scheduling_agent = await get_agent()
+    except Exception as e:
+        error_msg = f"Error initializing agent: {e}"
+        print(error_msg)
+        traceback.print_exc()
+        return jsonify({'error': error_msg}), 500
+
+    data = await request.get_json(silent=True)
     if not data:
         return jsonify({'error': 'No JSON data received'}), 400
-        
+
     message = data.get('message', '')
     if not message:
         return jsonify({'error': 'No message provided'}), 400
-        
+
+    # Conversations are keyed by session id; new visitors get one assigned
+    session_id = str(data.get('session_id') or request.headers.get('X-Session-Id') or uuid.uuid4())
+
     print(f"Received message: {message[:50]}{'...' if len(message) > 50 else ''}")
-    
+
     try:
         print("Processing message...")
-        response = await agent.process_message(message)
+        response = await scheduling_agent.process_message(message, session_id)
         print(f"Response: {response[:50]}{'...' if len(response) > 50 else ''}")
-        return jsonify({'response': response})
+        return jsonify({'response': response, 'session_id': session_id})
+    except AdmissionRejected as e:
+        return admission_rejected(e)
     except Exception as e:
         error_msg = f"Error processing message: {e}"
         print(error_msg)
         traceback.print_exc()
         return jsonify({'error': error_msg}), 500
 
+def admission_rejected(e: AdmissionRejected):
+    """Fast 429/503 telling the client when to try again."""
+    print(f"Rejected chat request: {e}")
+    return jsonify({'error': str(e), 'retry_after': e.retry_after}), e.status_code, {'Retry-After': str(e.retry_after)}
+
+def sse_event(data: dict, event: str = None) -> str:
+    """Format one Server-Sent Events frame."""
+    frame = f"event: {event}\n" if event else ""
+    with metrics.timed('json_serialization'):
+        payload = json.dumps(data)
+    return frame + f"data: {payload}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+async def chat_stream():
+    try:
+        scheduling_agent = await get_agent()
+    except Exception as e:
+        error_msg = f"Error initializing agent: {e}"
+        print(error_msg)
+        traceback.print_exc()
+        return jsonify({'error': error_msg}), 500
+
+    data = await request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'No JSON data received'}), 400
+
+    message = data.get('message', '')
+    if not message:
+        return jsonify({'error': 'No message provided'}), 400
+
+    session_id = str(data.get('session_id') or request.headers.get('X-Session-Id') or uuid.uuid4())
+
+    print(f"Received message (stream): {message[:50]}{'...' if len(message) > 50 else ''}")
+
+    # Start the stream before replying so admission control can still answer 429/503
+    tokens = scheduling_agent.stream_message(message, session_id)
+    try:
+        first_token = await tokens.__anext__()
+    except StopAsyncIteration:
+        first_token = None
+    except AdmissionRejected as e:
+        return admission_rejected(e)
+
+    async def generate():
+        # Send the session id first so the client can keep it even if the stream breaks
+        yield sse_event({'session_id': session_id}, event='session')
+        parts = []
+        try:
+            if first_token is not None:
+                parts.append(first_token)
+                yield sse_event({'token': first_token})
+            async for token in tokens:
+                parts.append(token)
+                yield sse_event({'token': token})
+            yield sse_event({'response': ''.join(parts), 'session_id': session_id}, event='done')
+        except Exception as e:
+            error_msg = f"Error processing message: {e}"
+            print(error_msg)
+            traceback.print_exc()
+            yield sse_event({'error': error_msg}, event='error')
+
+    response = Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stop reverse proxies from buffering the stream
+    })
+    response.timeout = None
+    return response
+
+@app.route('/api/chat/batch', methods=['POST'])
+async def chat_batch():
+    try:
+        scheduling_agent = await get_agent()
+    except Exception as e:
+        error_msg = f"Error initializing agent: {e}"
+        print(error_msg)
+        traceback.print_exc()
+        return jsonify({'error': error_msg}), 500
+
+    data = await request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'No JSON data received'}), 400
+
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'No items provided'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'Too many items: {len(items)} (max {BATCH_MAX_ITEMS})'}), 413
+
+    from scheduling_agent import BATCH_CONCURRENCY
+    try:
+        concurrency = min(max(int(data.get('concurrency') or BATCH_CONCURRENCY), 1), BATCH_MAX_CONCURRENCY)
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({'error': 'concurrency must be an integer'}), 400
+
+    print(f"Received batch of {len(items)} messages (concurrency {concurrency})")
+    started = time.perf_counter()
+    results = await scheduling_agent.process_batch(items, concurrency)
+    summary = {'items': len(results), 'concurrency': concurrency,
+               'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return jsonify({'results': results, 'summary': summary})
+
+@app.route('/api/schedules/bulk', methods=['POST'])
+async def create_schedules_bulk():
+    """Create many bookings at once, such as seasonal contract renewals.
+
+    Rows are validated together and inserted in chunks of `chunk_size`,
+    one request per chunk; each row gets its own result.
+    """
+    data = await request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'No JSON data received'}), 400
+
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'No items provided'}), 400
+    if len(items) > BULK_MAX_ITEMS:
+        return jsonify({'error': f'Too many items: {len(items)} (max {BULK_MAX_ITEMS})'}), 413
+
+    from scheduling_agent import BULK_INSERT_CHUNK
+    try:
+        chunk_size = max(int(data.get('chunk_size') or BULK_INSERT_CHUNK), 1)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'chunk_size must be an integer'}), 400
+
+    started = time.perf_counter()
+    try:
+        scheduling_agent = await get_agent()
+        results = await asyncio.to_thread(scheduling_agent.create_schedules, items, chunk_size)
+    except Exception as e:
+        error_msg = f"Error creating schedules: {e}"
+        print(error_msg)
+        traceback.print_exc()
+        return jsonify({'error': error_msg}), 502
+
+    summary = {'items': len(results), 'chunk_size': chunk_size,
+               'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return jsonify({'results': results, 'summary': summary})
+
+def encode_cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    service_date, schedule_id = json.loads(base64.urlsafe_b64decode(padded))
+    return str(service_date), str(schedule_id)
+
+def parse_timestamp(value: str) -> datetime.datetime:
+    timestamp = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=datetime.timezone.utc)
+
+def fingerprint_etag(fingerprint) -> str:
+    """Strong ETag for a response, from the (id, updated_at) pairs it was built from."""
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+@app.route('/api/calendar', methods=['GET'])
+async def calendar():
+    """Calendar events between `start` and `end`, paged by (service_date, id).
+
+    Pass `cursor` from the previous page to get the next one. To poll, pass
+    the `watermark` from an earlier response as `since` and get back only
+    the events changed after it, plus the ids of every event still in the
+    range so deleted ones can be dropped. Both forms answer 304 when the
+    request's If-None-Match still matches.
+    """
+    try:
+        start = datetime.date.fromisoformat(request.args.get('start', ''))
+        end = datetime.date.fromisoformat(request.args.get('end', ''))
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates as YYYY-MM-DD'}), 400
+    if end < start or (end - start).days >= CALENDAR_MAX_DAYS:
+        return jsonify({'error': f'The range must run forwards and cover at most {CALENDAR_MAX_DAYS} days'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', CALENDAR_PAGE_SIZE)), 1), CALENDAR_MAX_PAGE_SIZE)
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        since = parse_timestamp(request.args['since']) if request.args.get('since') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid limit, cursor or since'}), 400
+
+    try:
+        scheduling_agent = await get_agent()
+        if since is None:
+            events, next_key = await asyncio.to_thread(
+                scheduling_agent.get_calendar_page, start.isoformat(), end.isoformat(), after, limit)
+            body = {'events': events, 'next_cursor': encode_cursor(next_key) if next_key else None}
+            etag = fingerprint_etag([body['next_cursor']] + [(e['id'], e['updated_at']) for e in events])
+        else:
+            # Fingerprint the range from two narrow columns first; full rows only for what changed
+            versions = await asyncio.to_thread(scheduling_agent.get_calendar_versions, start.isoformat(), end.isoformat())
+            etag = fingerprint_etag([request.args['since']] + [(v['id'], v['updated_at']) for v in versions])
+            changed = [] if request.if_none_match.contains(etag) else \
+                [v['id'] for v in versions if v.get('updated_at') and parse_timestamp(v['updated_at']) > since]
+            events = await asyncio.to_thread(scheduling_agent.get_calendar_events, changed) if changed else []
+            body = {'events': events, 'ids': [v['id'] for v in versions]}
+    except Exception as e:
+        error_msg = f"Error loading calendar: {e}"
+        print(error_msg)
+        traceback.print_exc()
+        return jsonify({'error': error_msg}), 502
+
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+    if request.if_none_match.contains(etag):
+        return '', 304, headers
+    stamps = [e['updated_at'] for e in events if e.get('updated_at')]
+    body['watermark'] = max(stamps, key=parse_timestamp) if stamps else request.args.get('since')
+    return jsonify(body), 200, headers
+
+@app.route('/api/availability', methods=['GET'])
+async def availability():
+    """The earliest free slots for `service_id` between `start` and `end`, within business hours.
+
+    Repeat `crew` to limit the search to those crews; each slot names the crew that is free.
+    """
+    service_id = request.args.get('service_id', '')
+    start = request.args.get('start', '')
+    end = request.args.get('end', start)
+    try:
+        limit = min(max(int(request.args.get('limit', AVAILABILITY_LIMIT)), 1), AVAILABILITY_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    crews = request.args.getlist('crew') or None
+
+    try:
+        scheduling_agent = await get_agent()
+        result = await asyncio.to_thread(scheduling_agent.find_free_slots, service_id, start, end, limit, crews)
+    except Exception as e:
+        error_msg = f"Error finding free slots: {e}"
+        print(error_msg)
+        traceback.print_exc()
+        return jsonify({'error': error_msg}), 502
+    if 'error' in result:
+        return jsonify(result), 400
+    return jsonify(result)
+
+@app.route('/api/routes', methods=['GET'])
+async def routes():
+    """Each crew's bookings on `date` in driving order, leaving the base at `start` (default 08:00)."""
+    try:
+        service_date = datetime.date.fromisoformat(request.args.get('date', '')).isoformat()
+        start = request.args.get('start', '08:00')
+        datetime.datetime.strptime(start, '%H:%M')
+    except ValueError:
+        return jsonify({'error': 'date must be YYYY-MM-DD and start HH:MM'}), 400
+
+    try:
+        scheduling_agent = await get_agent()
+        return jsonify(await asyncio.to_thread(scheduling_agent.plan_routes, service_date, start))
+    except Exception as e:
+        error_msg = f"Error planning routes: {e}"
+        print(error_msg)
+        traceback.print_exc()
+        return jsonify({'error': error_msg}), 502
+
 @app.route('/api/health', methods=['GET'])
-def health_check():
-    return jsonify({
+async def health_check():
+    health = {
         'status': 'ok',
-        'agent_initialized': agent is not None
-    })
+        'agent_initialized': agent is not None,
+        'active_sessions': len(agent.sessions) if agent is not None else 0
+    }
+    # Upstream checks cost network round-trips, so they only run when asked for
+    if request.args.get('probe', '').lower() in ('1', 'true', 'yes'):
+        health['connections'] = await asyncio.to_thread(probe_connections)
+        if not all(health['connections'].values()):
+            health['status'] = 'degraded'
+    return jsonify(health)
+
+@app.route('/api/usage', methods=['GET'])
+async def usage():
+    """LLM token counts and cost for this worker: totals, per endpoint and model, and the top sessions.
+
+    With `session_id`, just that session's numbers, including how its prompt grew per call.
+    Sessions are shown by a one-way label, never by id, and the endpoint needs ADMIN_TOKEN.
+    """
+    denied = admin_denied()
+    if denied:
+        return denied
+    try:
+        top = min(max(int(request.args.get('top', USAGE_TOP_SESSIONS)), 0), USAGE_MAX_TOP_SESSIONS)
+    except ValueError:
+        return jsonify({'error': 'Invalid top'}), 400
+
+    try:
+        scheduling_agent = await get_agent()
+    except Exception as e:
+        error_msg = f"Error initializing agent: {e}"
+        print(error_msg)
+        traceback.print_exc()
+        return jsonify({'error': error_msg}), 500
+
+    session_id = request.args.get('session_id')
+    if session_id:
+        session_usage = scheduling_agent.token_usage.session(session_id)
+        if session_usage is None:
+            return jsonify({'error': f"No usage recorded for session '{session_id}'"}), 404
+        return jsonify(session_usage)
+    return jsonify(scheduling_agent.token_usage.summary(top))
+
+@app.route('/api/metrics', methods=['GET'])
+async def metrics_endpoint():
+    # Prometheus text exposition format; counters are per worker process
+    return Response(metrics.render_metrics(), mimetype='text/plain; version=0.0.4')
 
 def run_app():
-    global loop
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
     try:
         host = "0.0.0.0"  # Listen on all interfaces
         port = 5001
-        print(f"\nStarting Flask server on http://localhost:{port}")
+        print("\n=== Scheduling GPT API Server ===")
+        print(f"Current directory: {os.getcwd()}")
+        print(f"Static folder: {app.static_folder}")
+        print(f"\nStarting Quart server on http://localhost:{port}")
         print("API endpoints:")
         print(f"  - http://localhost:{port}/api/chat (POST)")
-        print(f"  - http://localhost:{port}/api/health (GET)")
+        print(f"  - http://localhost:{port}/api/chat/stream (POST, Server-Sent Events)")
+        print(f"  - http://localhost:{port}/api/chat/batch (POST, many messages at once)")
+        print(f"  - http://localhost:{port}/api/schedules/bulk (POST, many bookings at once)")
+        print(f"  - http://localhost:{port}/api/calendar (GET, ?start=&end=, paged, ETag)")
+        print(f"  - http://localhost:{port}/api/availability (GET, ?service_id=&start=&end=)")
+        print(f"  - http://localhost:{port}/api/routes (GET, ?date=, per-crew driving order)")
+        print(f"  - http://localhost:{port}/api/health (GET, ?probe=1 checks Supabase and OpenAI)")
+        print(f"  - http://localhost:{port}/api/usage (GET, ?session_id=, LLM tokens and cost, needs ADMIN_TOKEN)")
+        print(f"  - http://localhost:{port}/api/metrics (GET, Prometheus format)")
         print("\nFrontend:")
         print(f"  - http://localhost:{port}/")
         print("\nPress Ctrl+C to stop the server")
@@ -108,11 +548,8 @@ def run_app():
     except Exception as e:
         print(f"Error starting server: {e}")
         traceback.print_exc()
-    finally:
-        if loop:
-            loop.close()
 
 if __name__ == '__main__':
     # Ensure we're in the correct directory
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
-    run_app() 
\ No newline at end of file
+    run_app()
@@ -0,0 +1,87 @@
+import datetime
+import os
+from typing import Dict, List, Optional, Sequence
+from schedule_index import ScheduleIndex, format_minutes, parse_minutes
+
+# Business hours offered to customers, in local time
+BUSINESS_DAYS = tuple(int(d) for d in os.getenv('BUSINESS_DAYS', '0,1,2,3,4').split(','))  # Monday is 0
+BUSINESS_START = os.getenv('BUSINESS_START', '09:00')
+BUSINESS_END = os.getenv('BUSINESS_END', '17:00')
+
+# Granularity of the occupancy bitmaps; free slots start on these boundaries
+SLOT_MINUTES = int(os.getenv('SLOT_MINUTES', '15'))
+
+# Crews that take bookings, comma-separated; unset means one shared crew
+SCHEDULE_CREWS = [c.strip() for c in os.getenv('SCHEDULE_CREWS', '').split(',') if c.strip()]
+
+# Longest window a free-slot search may cover
+MAX_SEARCH_DAYS = int(os.getenv('MAX_SEARCH_DAYS', '120'))
+
+def _window_mask(start_minute: int, end_minute: int, slot_minutes: int) -> int:
+    """Bits for the slots that lie wholly inside [start_minute, end_minute)."""
+    first, last = -(-start_minute // slot_minutes), end_minute // slot_minutes
+    return ((1 << (last - first)) - 1) << first if last > first else 0
+
+def free_starts(occupied: int, open_mask: int, slots_needed: int) -> int:
+    """Bitmap of the slots where `slots_needed` consecutive open, unoccupied slots begin."""
+    free = open_mask & ~occupied
+    run = free
+    for shift in range(1, slots_needed):
+        run &= free >> shift
+        if not run:
+            break
+    return run
+
+class SlotFinder:
+    """Finds the earliest free slots for a booking of a given length.
+
+    Each (day, crew) is one integer bitmap from the schedule index, so a
+    day is checked with a handful of shifts and ANDs: free slots are the
+    open business hours minus the occupied bits, and a booking fits where
+    enough free bits are set in a row.
+    """
+
+    def __init__(self, index: ScheduleIndex, crews: Sequence[Optional[str]] = None,
+                 business_days: Sequence[int] = BUSINESS_DAYS, business_start: str = BUSINESS_START,
+                 business_end: str = BUSINESS_END, slot_minutes: int = SLOT_MINUTES):
+        self.index = index
+        self.crews = list(crews) if crews else (SCHEDULE_CREWS or [None])
+        self.business_days = set(business_days)
+        self.slot_minutes = slot_minutes
+        self.open_mask = _window_mask(parse_minutes(business_start), parse_minutes(business_end), slot_minutes)
+
+    def find(self, duration_minutes: int, start_date: datetime.date, end_date: datetime.date,
+             limit: int = 5, crews: Optional[Sequence[Optional[str]]] = None,
+             now: Optional[datetime.datetime] = None) -> List[Dict]:
+        """The earliest `limit` slots between the two dates, inclusive, in time order.
+
+        A slot is offered once, with the first listed crew that is free for
+        all of it. Slots that have already started today are skipped.
+        """
+        now = now or datetime.datetime.now()
+        crews = list(crews) if crews else self.crews
+        slots_needed = max(1, -(-int(duration_minutes) // self.slot_minutes))
+        slots: List[Dict] = []
+
+        day = max(start_date, now.date())
+        while day <= end_date and len(slots) < limit:
+            if day.weekday() in self.business_days:
+                open_mask = self.open_mask
+                if day == now.date():
+                    open_mask &= _window_mask(now.hour * 60 + now.minute, 24 * 60, self.slot_minutes)
+                service_date = day.isoformat()
+                starts_by_crew = [(crew, free_starts(self.index.occupancy(service_date, crew, self.slot_minutes),
+                                                     open_mask, slots_needed)) for crew in crews]
+                combined = 0
+                for _, starts in starts_by_crew:
+                    combined |= starts
+                while combined and len(slots) < limit:
+                    lowest = combined & -combined
+                    slot = lowest.bit_length() - 1
+                    crew = next(crew for crew, starts in starts_by_crew if starts & lowest)
+                    start = slot * self.slot_minutes
+                    slots.append({'service_date': service_date, 'start_time': format_minutes(start),
+                                  'end_time': format_minutes(start + int(duration_minutes)), 'crew': crew})
+                    combined ^= lowest
+            day += datetime.timedelta(days=1)
+        return slots
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Compare concurrent /api/chat throughput: legacy sync Flask worker vs. the ASGI app.
+
+Both servers run in-process on local ports with a simulated agent whose
+process_message awaits a fixed delay, standing in for the OpenAI round-trip.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Dict
+from metrics import percentile
+
+class SimulatedAgent:
+    """Agent stand-in that only waits, like a chat turn blocked on GPT-4."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def process_message(self, message: str, *args, **kwargs) -> str:
+        await asyncio.sleep(self.latency)
+        return f"Simulated reply to: {message}"
+
+def build_legacy_app(simulated_agent):
+    """Rebuild the previous Flask serving path: async_route + run_until_complete per request."""
+    from flask import Flask, request, jsonify
+
+    legacy = Flask(__name__)
+
+    def async_route(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            try:
+                loop = asyncio.get_event_loop()
+            except RuntimeError:
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+            return loop.run_until_complete(f(*args, **kwargs))
+        return wrapped
+
+    @legacy.route('/api/chat', methods=['POST'])
+    @async_route
+    async def chat():
+        message = request.json.get('message', '')
+        return jsonify({'response': await simulated_agent.process_message(message)})
+
+    return legacy
+
+def serve_legacy(simulated_agent, port: int):
+    """Serve the legacy app single-threaded, as one sync gunicorn worker would."""
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', port, build_legacy_app(simulated_agent), threaded=False)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+def serve_asgi(simulated_agent, port: int):
+    """Serve app.app under Hypercorn with one worker and one event loop."""
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    import app as app_module
+
+    app_module.agent = simulated_agent
+    config = Config()
+    config.bind = [f'127.0.0.1:{port}']
+    config.accesslog = None
+    loop = asyncio.new_event_loop()
+    shutdown = asyncio.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(serve(app_module.app, config, shutdown_trigger=shutdown.wait))
+
+    threading.Thread(target=run, daemon=True).start()
+    return lambda: loop.call_soon_threadsafe(shutdown.set)
+
+def wait_until_up(url: str, timeout: float = 10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            post_chat(url, 'ping')
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not start")
+
+def post_chat(url: str, message: str) -> float:
+    body = json.dumps({'message': message}).encode()
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    started = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=120) as response:
+        response.read()
+    return time.perf_counter() - started
+
+def run_load(url: str, requests: int, concurrency: int) -> Dict:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(lambda i: post_chat(url, f'message {i}'), range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=50, help='Total chat requests per server')
+    parser.add_argument('--concurrency', type=int, default=25, help='Concurrent clients')
+    parser.add_argument('--latency', type=float, default=0.5, help='Simulated GPT latency in seconds')
+    parser.add_argument('--port', type=int, default=5801, help='First local port to use')
+    args = parser.parse_args()
+
+    simulated_agent = SimulatedAgent(args.latency)
+    results = {}
+    for name, serve, port in (('legacy_sync_worker', serve_legacy, args.port),
+                              ('asgi_worker', serve_asgi, args.port + 1)):
+        url = f'http://127.0.0.1:{port}/api/chat'
+        stop = serve(simulated_agent, port)
+        try:
+            wait_until_up(url)
+            results[name] = run_load(url, args.requests, args.concurrency)
+        finally:
+            stop()
+        print(f"{name}: {json.dumps(results[name])}")
+
+    speedup = results['asgi_worker']['throughput_rps'] / results['legacy_sync_worker']['throughput_rps']
+    print(f"\nThroughput speedup with one ASGI worker: {speedup:.1f}x")
+
+if __name__ == '__main__':
+    main()
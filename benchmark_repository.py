@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Time the agent's and the importer's storage paths end to end, with no network by default.
+
+Seeds an in-memory repository with the same generated data as
+stub_supabase_server.py, then times the hot reads (client search, a
+client's bookings, a month of calendar), single and bulk bookings, and
+the schedule importer's get-or-create path. With --backend supabase the
+same calls go to SUPABASE_URL instead (such as the stub server), so the
+two can be compared; writes made there are deleted again afterwards.
+
+    python benchmark_repository.py --clients 2000 --schedules 20000 --iterations 200
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+from metrics import percentile
+from repository import MemoryRepository, get_repository, set_repository
+from stub_supabase_server import seed_tables
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Organized_Schedules'))
+
+def measure(label: str, iterations: int, call: Callable[[int], object]) -> Dict:
+    samples = []
+    for i in range(iterations):
+        began = time.perf_counter()
+        call(i)
+        samples.append((time.perf_counter() - began) * 1000)
+    print(f"{label:<28} p50 {statistics.median(samples):8.3f} ms  p95 {percentile(samples, 95):8.3f} ms  "
+          f"({iterations} calls)")
+    return {'label': label, 'p50_ms': statistics.median(samples), 'p95_ms': percentile(samples, 95)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=('memory', 'supabase'), default='memory')
+    parser.add_argument('--clients', type=int, default=2000, help='Generated clients (memory backend)')
+    parser.add_argument('--schedules', type=int, default=20000, help='Generated schedules (memory backend)')
+    parser.add_argument('--iterations', type=int, default=200, help='Calls timed per operation')
+    parser.add_argument('--bulk', type=int, default=500, help='Rows per bulk booking')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    if args.backend == 'memory':
+        set_repository(MemoryRepository(seed_tables(args.clients, args.schedules)))
+    repository = get_repository()
+
+    # Imported after the repository is chosen, so every module shares it
+    from scheduling_agent import SchedulingAgent
+    from upload_to_supabase import process_schedule
+
+    agent = SchedulingAgent()
+    clients = repository.all('clients')
+    services = repository.all('services')
+    names = [client['name'] for client in clients]
+    today = datetime.date.today()
+    # Far enough ahead that generated bookings never clash
+    future = today + datetime.timedelta(days=3650)
+    created: Dict[str, List[str]] = {'schedules': [], 'clients': [], 'locations': []}
+
+    print(f"Backend: {args.backend}, {len(clients)} clients, {len(services)} services")
+    began = time.perf_counter()
+    agent.get_available_services()
+    agent.client_index.load()
+    print(f"Warm-up (services and client index): {(time.perf_counter() - began) * 1000:.1f} ms")
+
+    measure('search_client', args.iterations, lambda i: agent.search_client(random.choice(names)))
+    measure('get_client_schedules', args.iterations,
+            lambda i: agent.get_client_schedules(random.choice(clients)['id']))
+    measure('get_calendar_data (31 days)', max(1, args.iterations // 10),
+            lambda i: agent.get_calendar_data(today.isoformat(), (today + datetime.timedelta(days=30)).isoformat()))
+
+    def book(i: int):
+        day = (future + datetime.timedelta(days=i)).isoformat()
+        row = agent.create_schedule(random.choice(clients)['id'], random.choice(services)['id'], day, '09:00', '10:00')
+        if row:
+            created['schedules'].append(row['id'])
+    measure('create_schedule', args.iterations, book)
+
+    items = [{'client_id': random.choice(clients)['id'], 'service_id': random.choice(services)['id'],
+              'service_date': (future + datetime.timedelta(days=args.iterations + i)).isoformat(),
+              'start_time': '09:00', 'end_time': '10:00'} for i in range(args.bulk)]
+    began = time.perf_counter()
+    results = agent.create_schedules(items)
+    created['schedules'].extend(result['schedule']['id'] for result in results if result['status'] == 'created')
+    print(f"{'create_schedules (bulk)':<28} {(time.perf_counter() - began) * 1000:8.1f} ms for {args.bulk} rows")
+
+    def import_row(i: int):
+        schedule = process_schedule(repository, {
+            'client': {'name': f"Benchmark Client {i % 50}"},
+            'service': {'name': random.choice(services)['name']},
+            'location': {'name': 'Home', 'address': f"{i % 50} Benchmark St"},
+            'service_date': (future + datetime.timedelta(days=i)).isoformat(),
+            'notes': 'benchmark_repository.py'
+        })
+        created['schedules'].append(schedule['id'])
+    measure('importer process_schedule', args.iterations, import_row)
+
+    # Leave a shared database as it was
+    created['clients'] = [row['id'] for row in repository.select(
+        'clients', 'id', [('name', 'ilike', 'Benchmark Client %')])]
+    created['locations'] = [row['id'] for row in repository.select(
+        'locations', 'id', [('address', 'ilike', '% Benchmark St')])]
+    for table in ('schedules', 'locations', 'clients'):
+        for row_id in created[table]:
+            repository.delete(table, row_id)
+    agent.close()
+
+if __name__ == '__main__':
+    main()
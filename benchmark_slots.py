@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Benchmark the free-slot finder against thousands of generated bookings.
+
+Builds a schedule index from synthetic bookings spread over the coming
+quarter (weekdays, business hours, 1-4 hours each, optionally across
+several crews), then times SlotFinder.find() for whole-quarter searches
+and compares it with a naive scan that checks every candidate start
+against every booking that day. --check verifies both give the same slots.
+
+    python benchmark_slots.py --bookings 5000 --crews Solo,Team --queries 200
+"""
+import argparse
+import datetime
+import random
+import statistics
+import time
+import uuid
+from typing import Dict, List
+from availability import SLOT_MINUTES, SlotFinder
+from metrics import percentile
+from schedule_index import ScheduleIndex, format_minutes
+
+DURATIONS = (60, 120, 180, 240)
+
+def generate_bookings(count: int, days: int, crews: List, start: datetime.date) -> List[Dict]:
+    weekdays = [start + datetime.timedelta(days=i) for i in range(days)
+                if (start + datetime.timedelta(days=i)).weekday() < 5]
+    rows = []
+    for _ in range(count):
+        duration = random.choice(DURATIONS)
+        begin = random.randrange(8 * 60, 18 * 60 - duration + 1, 15)
+        rows.append({'id': str(uuid.uuid4()), 'service_date': random.choice(weekdays).isoformat(),
+                     'start_time': format_minutes(begin), 'end_time': format_minutes(begin + duration),
+                     'status': random.choice(['scheduled'] * 9 + ['cancelled']), 'crew': random.choice(crews)})
+    return rows
+
+def naive_find(rows: List[Dict], finder: SlotFinder, duration: int, start: datetime.date, end: datetime.date,
+               limit: int, now: datetime.datetime) -> List[Dict]:
+    """The same search done the obvious way, as a baseline and for --check."""
+    by_day: Dict = {}
+    for row in rows:
+        placed = finder.index.interval(row)
+        if placed:
+            by_day.setdefault(placed[0], []).append(placed[1:])
+    open_slots = [i for i in range(24 * 60 // finder.slot_minutes) if finder.open_mask >> i & 1]
+    slots = []
+    day = max(start, now.date())
+    while day <= end and len(slots) < limit:
+        if day.weekday() in finder.business_days:
+            for slot in open_slots:
+                begin = slot * finder.slot_minutes
+                if day == now.date() and begin < now.hour * 60 + now.minute:
+                    continue
+                if not all(s in open_slots for s in range(slot, slot + -(-duration // finder.slot_minutes))):
+                    continue
+                for crew in finder.crews:
+                    booked = by_day.get((day.isoformat(), crew), [])
+                    if all(e <= begin or s >= begin + duration for s, e in booked):
+                        slots.append({'service_date': day.isoformat(), 'start_time': format_minutes(begin),
+                                      'end_time': format_minutes(begin + duration), 'crew': crew})
+                        break
+                if len(slots) >= limit:
+                    break
+        day += datetime.timedelta(days=1)
+    return slots
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=5000, help='Generated bookings')
+    parser.add_argument('--days', type=int, default=91, help='Days the bookings and searches cover')
+    parser.add_argument('--crews', default='', help='Comma-separated crew names (default: one shared crew)')
+    parser.add_argument('--queries', type=int, default=200, help='Searches to time')
+    parser.add_argument('--limit', type=int, default=10, help='Slots asked for per search')
+    parser.add_argument('--check', action='store_true', help='Compare every result with the naive scan')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    crews = [c.strip() for c in args.crews.split(',') if c.strip()] or [None]
+    today = datetime.date.today()
+    rows = generate_bookings(args.bookings, args.days, crews, today)
+    now = datetime.datetime.combine(today, datetime.time(0, 0))
+    end = today + datetime.timedelta(days=args.days - 1)
+
+    built = time.perf_counter()
+    index = ScheduleIndex(lambda from_date: rows, ttl=float('inf'))
+    finder = SlotFinder(index, crews=crews, slot_minutes=SLOT_MINUTES)
+    finder.find(60, today, end, limit=1, now=now)
+    build_ms = (time.perf_counter() - built) * 1000
+
+    fast, naive, mismatches = [], [], 0
+    for _ in range(args.queries):
+        duration = random.choice(DURATIONS)
+        began = time.perf_counter()
+        found = finder.find(duration, today, end, limit=args.limit, now=now)
+        fast.append((time.perf_counter() - began) * 1000)
+        if args.check or len(naive) < min(args.queries, 20):
+            began = time.perf_counter()
+            expected = naive_find(rows, finder, duration, today, end, args.limit, now)
+            naive.append((time.perf_counter() - began) * 1000)
+            mismatches += found != expected
+
+    print(f"{args.bookings} bookings over {args.days} days, crews: {', '.join(str(c) for c in crews)}")
+    print(f"Index build and first bitmaps: {build_ms:.1f} ms")
+    print(f"SlotFinder.find  p50 {statistics.median(fast):.3f} ms  p95 {percentile(fast, 95):.3f} ms  "
+          f"max {max(fast):.3f} ms  ({len(fast)} searches, limit {args.limit})")
+    print(f"Naive scan       p50 {statistics.median(naive):.3f} ms  p95 {percentile(naive, 95):.3f} ms  "
+          f"({len(naive)} searches)")
+    print(f"Results differing from the naive scan: {mismatches}")
+
+    # Worst case: nothing fits, so every day of the quarter is examined
+    began = time.perf_counter()
+    finder.find(24 * 60, today, end, limit=args.limit, now=now)
+    print(f"Full-quarter search with no fit: {(time.perf_counter() - began) * 1000:.3f} ms")
+
+if __name__ == '__main__':
+    main()
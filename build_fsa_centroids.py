@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Build the postal code centroid table that route_planner.py reads.
+
+Reads the GeoNames postal code dump for Canada (CC BY 4.0), either
+downloaded from GeoNames or from a local copy, and writes one
+`fsa,latitude,longitude` row per FSA, the average of the dump's points
+for it. CA.zip has one point per FSA; CA_full.csv.zip has one per full
+postal code, and --full-codes keeps those rows too so stops are placed
+more precisely.
+
+    python build_fsa_centroids.py
+    python build_fsa_centroids.py --source CA_full.csv.zip --full-codes
+"""
+import argparse
+import csv
+import io
+import os
+import urllib.request
+import zipfile
+from typing import Dict, Iterator, List, Tuple
+from route_planner import FSA_CENTROIDS_PATH, normalise_postal_code
+
+GEONAMES_URL = 'https://download.geonames.org/export/zip/CA.zip'
+# Columns of the GeoNames postal code dump, which is tab separated
+POSTAL_CODE_COLUMN, LATITUDE_COLUMN, LONGITUDE_COLUMN = 1, 9, 10
+
+def read_source(source: str) -> bytes:
+    """The raw dump from a URL or a local .zip or .txt file."""
+    if source.startswith(('http://', 'https://')):
+        print(f"Downloading {source}")
+        with urllib.request.urlopen(source, timeout=60) as response:
+            return response.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+def dump_lines(data: bytes) -> Iterator[str]:
+    """Lines of the dump, unpacking the first .txt file of a zip archive."""
+    if zipfile.is_zipfile(io.BytesIO(data)):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            name = next(n for n in archive.namelist() if n.endswith('.txt') and not n.startswith('readme'))
+            data = archive.read(name)
+    return iter(data.decode('utf-8').splitlines())
+
+def centroids(lines: Iterator[str], full_codes: bool = False) -> Dict[str, Tuple[float, float]]:
+    """Average point per FSA, plus each full postal code when `full_codes` is set."""
+    points: Dict[str, List[Tuple[float, float]]] = {}
+    for line in lines:
+        fields = line.split('\t')
+        if len(fields) <= LONGITUDE_COLUMN:
+            continue
+        code = normalise_postal_code(fields[POSTAL_CODE_COLUMN])
+        try:
+            point = (float(fields[LATITUDE_COLUMN]), float(fields[LONGITUDE_COLUMN]))
+        except ValueError:
+            continue
+        if code is None:
+            continue
+        points.setdefault(code[:3], []).append(point)
+        if full_codes and len(code) > 3:
+            points.setdefault(code, []).append(point)
+    return {code: (sum(lat for lat, _ in group) / len(group), sum(lon for _, lon in group) / len(group))
+            for code, group in points.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=GEONAMES_URL, help='GeoNames URL, or a downloaded .zip or .txt file')
+    parser.add_argument('--output', default=FSA_CENTROIDS_PATH, help='CSV to write')
+    parser.add_argument('--full-codes', action='store_true', help='Also write a row per full postal code')
+    args = parser.parse_args()
+
+    table = centroids(dump_lines(read_source(args.source)), args.full_codes)
+    if not table:
+        parser.error(f"no Canadian postal codes found in {args.source}")
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['fsa', 'latitude', 'longitude'])
+        for code in sorted(table):
+            writer.writerow([code, f"{table[code][0]:.5f}", f"{table[code][1]:.5f}"])
+    fsas = sum(1 for code in table if len(code) == 3)
+    print(f"Wrote {len(table)} rows ({fsas} FSAs) to {os.path.abspath(args.output)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Measure worker boot time and fail if it exceeds the startup budget.
+
+Boot is measured in a fresh interpreter: importing app.py and building the
+SchedulingAgent, which is what a Hypercorn worker does before serving. Any
+outbound connection attempted during boot is reported as a failure too.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BOOT_SCRIPT = r'''
+import json, socket, time
+attempts = []
+_connect = socket.socket.connect
+def recording_connect(self, address):
+    attempts.append(str(address))
+    return _connect(self, address)
+socket.socket.connect = recording_connect
+
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+from scheduling_agent import SchedulingAgent
+SchedulingAgent()
+finished = time.perf_counter()
+print(json.dumps({
+    'import_app_s': imported - started,
+    'agent_init_s': finished - imported,
+    'total_s': finished - started,
+    'connections': attempts,
+}))
+'''
+
+def measure_boot() -> dict:
+    env = dict(os.environ)
+    # Boot must not need real credentials, so dummy values are enough
+    env.setdefault('OPENAI_API_KEY', 'sk-startup-check')
+    env.setdefault('SUPABASE_URL', 'https://startup-check.supabase.co')
+    env.setdefault('SUPABASE_KEY', 'startup-check')
+    result = subprocess.run(
+        [sys.executable, '-c', BOOT_SCRIPT],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--budget', type=float, default=float(os.getenv('STARTUP_BUDGET_SECONDS', '2.0')),
+                        help='Maximum allowed boot time in seconds')
+    parser.add_argument('--runs', type=int, default=3, help='Boots to measure; the slowest is compared to the budget')
+    args = parser.parse_args()
+
+    runs = [measure_boot() for _ in range(args.runs)]
+    slowest = max(runs, key=lambda run: run['total_s'])
+    print(f"Worker boot over {args.runs} runs (slowest shown):")
+    print(f"  import app:      {slowest['import_app_s'] * 1000:.0f} ms")
+    print(f"  SchedulingAgent: {slowest['agent_init_s'] * 1000:.0f} ms")
+    print(f"  total:           {slowest['total_s'] * 1000:.0f} ms (budget {args.budget * 1000:.0f} ms)")
+
+    failed = False
+    if slowest['total_s'] > args.budget:
+        print("❌ Worker boot is over budget")
+        failed = True
+    connections = sorted({address for run in runs for address in run['connections']})
+    if connections:
+        print(f"❌ Network connections during boot: {', '.join(connections)}")
+        failed = True
+    if not failed:
+        print("✅ Worker boot is within budget and makes no network calls")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
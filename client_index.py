@@ -0,0 +1,116 @@
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Set
+
+# Clients added by the importers show up in searches after at most this long
+CLIENT_INDEX_TTL_SECONDS = float(os.getenv('CLIENT_INDEX_TTL_SECONDS', '600'))
+
+# Lowest share of the query's trigrams a name must contain to be returned
+CLIENT_SEARCH_MIN_SCORE = float(os.getenv('CLIENT_SEARCH_MIN_SCORE', '0.5'))
+CLIENT_SEARCH_LIMIT = int(os.getenv('CLIENT_SEARCH_LIMIT', '20'))
+
+def normalise(text: str) -> str:
+    """Lower-case, accents removed, and runs of anything but letters and digits turned into one space."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r'[^a-z0-9]+', ' ', text.lower()).strip()
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of each word padded as pg_trgm does ('  a', ' an', 'ann', 'nna', 'na ')."""
+    grams = set()
+    for word in normalise(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class ClientIndex:
+    """In-process trigram index of the clients table for ranked, typo-tolerant name search.
+
+    Each trigram maps to the clients whose name contains it, so a search
+    only touches clients that share at least one trigram with the query.
+    Matches are ranked by how many of the query's trigrams the name has
+    (pg_trgm's word similarity), so "Ana Wong" finds "Anna Wong". Names
+    containing the query from the start of a word come first, and overall
+    similarity breaks ties.
+    """
+
+    def __init__(self, loader: Callable[[], List[Dict]], ttl: float = CLIENT_INDEX_TTL_SECONDS):
+        self.loader = loader
+        self.ttl = ttl
+        self._rows: List[Dict] = []
+        self._names: List[str] = []
+        self._sizes: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def _index(self, rows: List[Dict]):
+        names, sizes, postings = [], [], {}
+        for position, row in enumerate(rows):
+            grams = trigrams(row.get('name') or '')
+            # Leading space so a word-start match is a plain substring test
+            names.append(' ' + normalise(row.get('name') or ''))
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        self._rows, self._names, self._sizes, self._postings = list(rows), names, sizes, postings
+
+    def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        with self._lock:
+            if self._is_fresh():
+                return
+            try:
+                self._index(self.loader())
+                self._loaded_at = time.monotonic()
+            except Exception as e:
+                # Search the last good copy rather than failing every lookup
+                if self._loaded_at is None:
+                    raise
+                print(f"Error refreshing client index, searching stale rows: {e}")
+
+    def search(self, query: str, limit: int = CLIENT_SEARCH_LIMIT,
+               min_score: float = CLIENT_SEARCH_MIN_SCORE) -> List[Dict]:
+        """Clients whose names match `query`, best first, each with a `match_score` from 0 to 1."""
+        self._ensure_loaded()
+        wanted = trigrams(query)
+        needle = ' ' + normalise(query)
+        if not wanted:
+            return []
+        rows, names, sizes, postings = self._rows, self._names, self._sizes, self._postings
+
+        shared = Counter()
+        for gram in wanted:
+            shared.update(postings.get(gram, ()))
+
+        ranked = []
+        for position, count in shared.items():
+            score = count / len(wanted)
+            if score < min_score:
+                continue
+            similarity = count / (len(wanted) + sizes[position] - count)
+            ranked.append((needle in names[position], score, similarity, position))
+        ranked.sort(key=lambda entry: entry[:3], reverse=True)
+        return [dict(rows[position], match_score=round(1.0 if exact else score, 3))
+                for exact, score, _, position in ranked[:limit]]
+
+    def load(self) -> int:
+        """Load the index now unless it is fresh; returns the number of clients."""
+        self._ensure_loaded()
+        return len(self._rows)
+
+    def invalidate(self):
+        """Drop the index; the next search reloads it."""
+        with self._lock:
+            self._loaded_at = None
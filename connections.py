@@ -0,0 +1,126 @@
+from dotenv import load_dotenv
+import os
+import threading
+from typing import Dict, Tuple
+
+# Load environment variables from this directory
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+# LLM backend: 'openai' for the real API, or 'stub' for a local OpenAI-compatible
+# server such as stub_llm_server.py. OPENAI_BASE_URL points either one elsewhere.
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'openai')
+LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4')
+STUB_LLM_URL = os.getenv('STUB_LLM_URL', 'http://127.0.0.1:8010/v1')
+
+# Outbound HTTP pooling for every client built here. Connections are kept
+# alive and reused, so TLS handshakes only happen when the pool grows.
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '20'))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv('HTTP_KEEPALIVE_SECONDS', '60'))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv('HTTP_CONNECT_TIMEOUT_SECONDS', '5'))
+HTTP_TIMEOUT_SECONDS = float(os.getenv('HTTP_TIMEOUT_SECONDS', '60'))
+
+# Clients are built on first use and then shared by the whole process
+_lock = threading.Lock()
+_clients: Dict[str, object] = {}
+
+def check_env_vars(names: Tuple[str, ...] = ('OPENAI_API_KEY', 'SUPABASE_URL', 'SUPABASE_KEY')) -> Dict[str, str]:
+    """Return the required credentials, raising if any are missing."""
+    required_vars = {name: os.getenv(name) for name in names}
+    if LLM_BACKEND == 'stub' and 'OPENAI_API_KEY' in required_vars:
+        # The stub accepts any key
+        required_vars['OPENAI_API_KEY'] = required_vars['OPENAI_API_KEY'] or 'stub'
+
+    missing_vars = [var for var, value in required_vars.items() if not value]
+    if missing_vars:
+        raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
+
+    return required_vars
+
+def _get_or_create(name: str, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+def _http_limits():
+    import httpx
+    return httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE,
+                        keepalive_expiry=HTTP_KEEPALIVE_SECONDS)
+
+def _http_timeout():
+    import httpx
+    return httpx.Timeout(HTTP_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS)
+
+def pooled_http_client(**kwargs):
+    """httpx.Client with the shared pool size, keep-alive and timeouts."""
+    import httpx
+    return httpx.Client(limits=_http_limits(), timeout=_http_timeout(), **kwargs)
+
+def pooled_async_http_client(**kwargs):
+    """httpx.AsyncClient with the shared pool size, keep-alive and timeouts."""
+    import httpx
+    return httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout(), **kwargs)
+
+def get_supabase():
+    """Shared Supabase client; only needs SUPABASE_URL and SUPABASE_KEY."""
+    def create():
+        from supabase import create_client
+        from supabase.lib.client_options import ClientOptions
+        env_vars = check_env_vars(('SUPABASE_URL', 'SUPABASE_KEY'))
+        print(f"Connecting to Supabase at {env_vars['SUPABASE_URL']}")
+        client = create_client(env_vars['SUPABASE_URL'], env_vars['SUPABASE_KEY'],
+                               options=ClientOptions(postgrest_client_timeout=_http_timeout()))
+        # supabase-py does not expose pool limits, so give its PostgREST client a pooled session
+        postgrest = client.postgrest
+        default_session = postgrest.session
+        postgrest.session = type(default_session)(base_url=default_session.base_url, headers=default_session.headers,
+                                                  limits=_http_limits(), timeout=_http_timeout())
+        default_session.close()
+        return client
+    return _get_or_create('supabase', create)
+
+def llm_client_settings() -> Dict[str, str]:
+    """Keyword arguments for building an OpenAI client against the configured backend."""
+    if LLM_BACKEND not in ('openai', 'stub'):
+        raise ValueError(f"Unknown LLM_BACKEND '{LLM_BACKEND}', expected 'openai' or 'stub'")
+    settings = {'api_key': check_env_vars(('OPENAI_API_KEY',))['OPENAI_API_KEY']}
+    base_url = os.getenv('OPENAI_BASE_URL') or (STUB_LLM_URL if LLM_BACKEND == 'stub' else None)
+    if base_url:
+        settings['base_url'] = base_url
+    return settings
+
+def get_openai_client():
+    """Shared synchronous OpenAI client."""
+    def create():
+        from openai import OpenAI
+        return OpenAI(http_client=pooled_http_client(), **llm_client_settings())
+    return _get_or_create('openai', create)
+
+def get_async_openai_client():
+    """Shared asyncio OpenAI client, used on the server's event loop."""
+    def create():
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(http_client=pooled_async_http_client(), **llm_client_settings())
+    return _get_or_create('async_openai', create)
+
+def probe_connections() -> Dict[str, bool]:
+    """Check that Supabase and OpenAI answer. Makes network calls, so only run on request."""
+    results = {}
+    try:
+        get_supabase().table('services').select('id').limit(1).execute()
+        results['supabase'] = True
+    except Exception as e:
+        print(f"Supabase probe failed: {e}")
+        results['supabase'] = False
+    try:
+        # Listing a model checks the key without paying for a completion
+        get_openai_client().models.retrieve(LLM_MODEL)
+        results['openai'] = True
+    except Exception as e:
+        print(f"OpenAI probe failed: {e}")
+        results['openai'] = False
+    return results
@@ -59,4 +59,69 @@ CREATE INDEX IF NOT EXISTS idx_clients_name ON clients(name);
 CREATE INDEX IF NOT EXISTS idx_services_name ON services(name);
 CREATE INDEX IF NOT EXISTS idx_schedules_date ON schedules(service_date);
 CREATE INDEX IF NOT EXISTS idx_schedules_client ON schedules(client_id);
-CREATE INDEX IF NOT EXISTS idx_schedules_service ON schedules(service_id); 
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_schedules_service ON schedules(service_id);
+
+-- Keyset pagination for /api/calendar walks schedules in (service_date, id) order
+CREATE INDEX IF NOT EXISTS idx_schedules_date_id ON schedules(service_date, id);
+CREATE INDEX IF NOT EXISTS idx_schedules_updated_at ON schedules(updated_at);
+
+-- Keep updated_at current so calendar polling can fetch only changed rows
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = TIMEZONE('utc', NOW());
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_schedules_updated_at ON schedules;
+CREATE TRIGGER update_schedules_updated_at
+    BEFORE UPDATE ON schedules
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- The read replica copies rows changed since an updated_at watermark, so every table it mirrors needs the trigger
+DROP TRIGGER IF EXISTS update_clients_updated_at ON clients;
+CREATE TRIGGER update_clients_updated_at
+    BEFORE UPDATE ON clients
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+DROP TRIGGER IF EXISTS update_services_updated_at ON services;
+CREATE TRIGGER update_services_updated_at
+    BEFORE UPDATE ON services
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+DROP TRIGGER IF EXISTS update_locations_updated_at ON locations;
+CREATE TRIGGER update_locations_updated_at
+    BEFORE UPDATE ON locations
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+CREATE INDEX IF NOT EXISTS idx_clients_updated_at ON clients(updated_at);
+CREATE INDEX IF NOT EXISTS idx_services_updated_at ON services(updated_at);
+CREATE INDEX IF NOT EXISTS idx_locations_updated_at ON locations(updated_at);
+
+-- Optional crew per booking; overlapping bookings are only a conflict within the same crew
+ALTER TABLE schedules ADD COLUMN IF NOT EXISTS crew TEXT;
+CREATE INDEX IF NOT EXISTS idx_schedules_date_crew ON schedules(service_date, crew);
+
+-- Fuzzy client search: a trigram index that ILIKE '%...%' and similarity matching can use
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_clients_name_trgm ON clients USING gin (name gin_trgm_ops);
+
+-- Ranked, typo-tolerant name search, called as supabase.rpc('search_clients', ...)
+CREATE OR REPLACE FUNCTION search_clients(query TEXT, max_results INTEGER DEFAULT 20)
+RETURNS SETOF clients
+LANGUAGE sql STABLE
+AS $$
+    -- The query is matched literally, so a search for "%" or "_" does not match every client
+    WITH pattern AS (
+        SELECT '%' || replace(replace(replace(query, '\', '\\'), '%', '\%'), '_', '\_') || '%' AS value
+    )
+    SELECT clients.* FROM clients, pattern
+    WHERE name ILIKE pattern.value OR query <% name
+    ORDER BY name ILIKE pattern.value DESC, word_similarity(query, name) DESC, similarity(query, name) DESC
+    LIMIT max_results;
+$$;
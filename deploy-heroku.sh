@@ -25,7 +25,10 @@ heroku config:set SUPABASE_KEY="$SUPABASE_KEY"
 # Create a temporary directory for deployment
 echo "Preparing files for deployment..."
 mkdir -p deploy_temp
-cp -r app.py scheduling_agent.py requirements.txt Procfile simple-scheduling-ui deploy_temp/
+python static_assets.py
+cp -r app.py scheduling_agent.py admission.py availability.py agent_tools.py client_index.py connections.py intent_classifier.py metrics.py read_replica.py repository.py response_cache.py route_planner.py schedule_index.py services_cache.py session_store.py static_assets.py token_usage.py write_behind.py requirements.txt Procfile simple-scheduling-ui static-build deploy_temp/
+# Route planning needs the postal code centroids when they have been built
+[ -f fsa_centroids.csv ] && cp fsa_centroids.csv deploy_temp/
 
 # Initialize git in the temporary directory
 cd deploy_temp
@@ -0,0 +1,160 @@
+import datetime
+import re
+from typing import Dict, Optional, Tuple
+
+# Local classifier for routine messages. It returns an
+# {"intent": ..., "entities": ...} dict, but only when a whole message
+# matches a known pattern. Everything else returns None and goes to the
+# LLM.
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+MONTHS = {
+    'jan': 1, 'january': 1, 'feb': 2, 'february': 2, 'mar': 3, 'march': 3, 'apr': 4, 'april': 4,
+    'may': 5, 'jun': 6, 'june': 6, 'jul': 7, 'july': 7, 'aug': 8, 'august': 8, 'sep': 9, 'sept': 9,
+    'september': 9, 'oct': 10, 'october': 10, 'nov': 11, 'november': 11, 'dec': 12, 'december': 12
+}
+
+# Optional politeness or framing in front of a request. Up to two framings may stack,
+# as in "can you show me" or "could you please let me see"
+PREFIX = (r"(?:(?:please|pls|hey|hi|hello|ok|okay)[, ]+)?"
+          r"(?:(?:can|could|would) you (?:please )?|i(?:'d| would) like (?:to )?(?:see |know )?|"
+          r"show me |tell me |give me |let me see ){0,2}(?:please )?")
+
+LIST_SERVICES_PATTERNS = [
+    re.compile(rf"^{PREFIX}(?:list|show(?: me)?|see|get|view)?\s*(?:(?:all|the|your|available|of)\s+)*"
+               rf"(?:services|service list|price list|prices|pricing)"
+               rf"(?:\s+(?:list|available|offered|and prices|do you offer|you offer))?$"),
+    re.compile(rf"^{PREFIX}what (?:services|kind of services|do you) (?:do you |you )?(?:offer|provide|have|do)$"),
+    re.compile(rf"^{PREFIX}how much (?:do you charge|are your services)$"),
+]
+
+SHOW_SCHEDULE_PATTERNS = [
+    re.compile(rf"^{PREFIX}(?:what(?:'s| is| do we have) (?:on |booked |scheduled )?|show |see |list |view |get |check )?"
+               rf"(?:the |my |our )?(?:schedule|calendar|bookings|appointments|jobs)"
+               rf"(?: (?:for|on|of))? (?P<date>.+)$"),
+    re.compile(rf"^{PREFIX}what(?:'s| is) (?:on|booked|scheduled|happening)(?: (?:for|on))? (?P<date>.+)$"),
+    re.compile(rf"^{PREFIX}(?:who|what) (?:is|are) (?:we )?(?:booked|scheduled)(?: (?:for|on))? (?P<date>.+)$"),
+]
+
+CANCEL_PATTERN = re.compile(
+    rf"^{PREFIX}(?:cancel|delete|remove)(?: the)? (?:booking|appointment|schedule|job)"
+    rf"(?: (?:number|no\.?|#)| #|#)? ?(?P<ref>\d{{1,3}}|[0-9a-f]{{8}}-[0-9a-f]{{4}}-[0-9a-f]{{4}}-[0-9a-f]{{4}}-[0-9a-f]{{12}})$")
+
+SEARCH_CLIENT_PATTERN = re.compile(
+    rf"^{PREFIX}(?:find|search(?: for)?|look up|lookup|show)(?: the)? (?:client|customer)s? "
+    rf"(?:named |called )?(?P<name>[a-z][a-z .'-]{{1,60}})$")
+
+CONFIRM_PATTERN = re.compile(r"^(?:yes|y|yep|yeah|yes please|confirm|confirmed|do it|go ahead|please do)$")
+DECLINE_PATTERN = re.compile(r"^(?:no|n|nope|no thanks|don't|do not|never mind|nevermind|keep it|stop)$")
+
+ISO_DATE = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})$")
+SLASH_DATE = re.compile(r"^(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?$")
+MONTH_DAY = re.compile(r"^([a-z]+)\.? (\d{1,2})(?:st|nd|rd|th)?(?:,? (\d{4}))?$")
+DAY_MONTH = re.compile(r"^(\d{1,2})(?:st|nd|rd|th)? (?:of )?([a-z]+)(?:,? (\d{4}))?$")
+
+def normalize(message: str) -> str:
+    """Lower-case, collapse spaces, and drop trailing punctuation and curly quotes."""
+    text = message.strip().lower().replace('’', "'")
+    text = re.sub(r"\s+", " ", text)
+    return text.rstrip(" ?!.")
+
+def _month_day(month: int, day: int, year: Optional[int], today: datetime.date) -> Optional[datetime.date]:
+    try:
+        if year is not None:
+            return datetime.date(year, month, day)
+        date = datetime.date(today.year, month, day)
+        # Without a year, a date already past means next year
+        return date if date >= today else datetime.date(today.year + 1, month, day)
+    except ValueError:
+        return None
+
+def parse_date_range(text: str, today: Optional[datetime.date] = None) -> Optional[Tuple[datetime.date, datetime.date]]:
+    """Turn a date phrase into an inclusive (start, end) range, or None if it is not clear-cut."""
+    today = today or datetime.date.today()
+    text = re.sub(r"^(?:on |for )?(?:the )?", "", normalize(text))
+
+    if text in ('today', 'tonight'):
+        return today, today
+    if text == 'tomorrow':
+        day = today + datetime.timedelta(days=1)
+        return day, day
+    if text == 'yesterday':
+        day = today - datetime.timedelta(days=1)
+        return day, day
+    if text in ('this week', 'the week', 'week'):
+        start = today - datetime.timedelta(days=today.weekday())
+        return start, start + datetime.timedelta(days=6)
+    if text == 'next week':
+        start = today - datetime.timedelta(days=today.weekday()) + datetime.timedelta(days=7)
+        return start, start + datetime.timedelta(days=6)
+
+    # A bare or "this" weekday means the next one, counting today; "next friday" is ambiguous
+    match = re.match(r"^(?:this )?([a-z]+)$", text)
+    if match and match.group(1) in WEEKDAYS:
+        day = today + datetime.timedelta(days=(WEEKDAYS.index(match.group(1)) - today.weekday()) % 7)
+        return day, day
+
+    match = ISO_DATE.match(text)
+    if match:
+        try:
+            day = datetime.date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+            return day, day
+        except ValueError:
+            return None
+
+    match = SLASH_DATE.match(text)
+    if match:
+        year = match.group(3)
+        if year is not None and len(year) == 2:
+            year = '20' + year
+        day = _month_day(int(match.group(1)), int(match.group(2)), int(year) if year else None, today)
+        return (day, day) if day else None
+
+    match = MONTH_DAY.match(text)
+    if match and match.group(1) in MONTHS:
+        day = _month_day(MONTHS[match.group(1)], int(match.group(2)),
+                         int(match.group(3)) if match.group(3) else None, today)
+        return (day, day) if day else None
+
+    match = DAY_MONTH.match(text)
+    if match and match.group(2) in MONTHS:
+        day = _month_day(MONTHS[match.group(2)], int(match.group(1)),
+                         int(match.group(3)) if match.group(3) else None, today)
+        return (day, day) if day else None
+
+    return None
+
+def classify(message: str, today: Optional[datetime.date] = None) -> Optional[Dict]:
+    """Return {"intent", "entities"} for a confidently recognised message, else None."""
+    text = normalize(message)
+    if not text or len(text) > 120:
+        return None
+
+    if CONFIRM_PATTERN.match(text):
+        return {"intent": "confirm", "entities": {}}
+    if DECLINE_PATTERN.match(text):
+        return {"intent": "decline", "entities": {}}
+
+    for pattern in LIST_SERVICES_PATTERNS:
+        if pattern.match(text):
+            return {"intent": "list_services", "entities": {}}
+
+    for pattern in SHOW_SCHEDULE_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            date_range = parse_date_range(match.group('date'), today)
+            if date_range:
+                return {"intent": "show_schedule",
+                        "entities": {"start_date": date_range[0].isoformat(), "end_date": date_range[1].isoformat()}}
+
+    match = CANCEL_PATTERN.match(text)
+    if match:
+        ref = match.group('ref')
+        key = 'index' if ref.isdigit() else 'schedule_id'
+        return {"intent": "delete_schedule", "entities": {key: int(ref) if ref.isdigit() else ref}}
+
+    match = SEARCH_CLIENT_PATTERN.match(text)
+    if match:
+        return {"intent": "search_client", "entities": {"client": match.group('name').strip().title()}}
+
+    return None
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""Load generator for the chat API, grown out of test-api.py.
+
+Virtual users play scripted multi-turn conversations against /api/chat (or
+/api/chat/stream), each conversation in its own session. Two modes:
+
+- closed loop (default): --users virtual users run conversations back to back
+- open loop (--rate R): conversations start at R per second (Poisson
+  arrivals) whether or not earlier ones have finished, up to --users at
+  once; arrivals beyond that are counted as dropped
+
+Requests that start during --warmup are sent but left out of the results.
+The summary has p50/p95/p99 latency, throughput and an error breakdown, and
+--output writes it as JSON for comparing releases (--baseline prints the
+change against an earlier file).
+
+--stub starts the app against stub_llm_server.py and stub_supabase_server.py
+in subprocesses, so a full run needs no network access or credentials.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+import httpx
+from metrics import percentile
+
+# Same server as test-api.py
+BASE_URL = "http://localhost:5001"
+
+# Each conversation is one session; the first one is test-api.py's message
+DEFAULT_CONVERSATIONS = [
+    ["Hello, I'd like to schedule a window cleaning service next week.",
+     "What services do you offer?",
+     "How long does window cleaning take?"],
+    ["list services", "what's on the schedule for tomorrow", "Thanks, that's all!"],
+    ["find client Anna Wong", "What bookings does she have coming up?"],
+    ["What are your hours?"],
+]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+class LoadTest:
+    """Runs virtual users and collects one record per request."""
+
+    def __init__(self, base_url: str, conversations: List[List[str]], users: int, duration: float,
+                 warmup: float, rate: Optional[float], think_time: float, stream: bool, timeout: float):
+        self.base_url = base_url.rstrip('/')
+        self.conversations = conversations
+        self.users = users
+        self.duration = duration
+        self.warmup = warmup
+        self.rate = rate
+        self.think_time = think_time
+        self.stream = stream
+        self.timeout = timeout
+        self.records: List[Dict] = []
+        self.dropped = 0
+        self._started = 0.0
+
+    @property
+    def endpoint(self) -> str:
+        return '/api/chat/stream' if self.stream else '/api/chat'
+
+    async def send(self, client: httpx.AsyncClient, message: str, session_id: str, turn: int):
+        started = time.perf_counter()
+        record = {'offset_s': started - self._started, 'turn': turn, 'ok': False}
+        try:
+            body = {'message': message, 'session_id': session_id}
+            if self.stream:
+                async with client.stream('POST', self.endpoint, json=body) as response:
+                    first_byte = None
+                    text = ''
+                    async for chunk in response.aiter_text():
+                        first_byte = first_byte or time.perf_counter()
+                        text += chunk
+                    record['status'] = response.status_code
+                    record['ttfb_s'] = (first_byte or time.perf_counter()) - started
+                    record['ok'] = response.status_code == 200 and 'event: done' in text
+                    if response.status_code == 200 and not record['ok']:
+                        record['error'] = 'stream_error'
+            else:
+                response = await client.post(self.endpoint, json=body)
+                record['status'] = response.status_code
+                record['ok'] = response.status_code == 200 and 'response' in response.json()
+            if not record['ok'] and 'error' not in record:
+                record['error'] = f"http_{record['status']}"
+        except httpx.TimeoutException:
+            record['error'] = 'timeout'
+        except httpx.TransportError as e:
+            record['error'] = type(e).__name__
+        except ValueError:
+            record['error'] = 'bad_response'
+        record['latency_s'] = time.perf_counter() - started
+        self.records.append(record)
+
+    async def conversation(self, client: httpx.AsyncClient, deadline: float):
+        session_id = f"load-{uuid.uuid4()}"
+        for turn, message in enumerate(random.choice(self.conversations)):
+            if time.perf_counter() >= deadline:
+                return
+            await self.send(client, message, session_id, turn)
+            if self.think_time:
+                await asyncio.sleep(random.expovariate(1.0 / self.think_time))
+
+    async def closed_loop(self, client: httpx.AsyncClient, deadline: float):
+        async def user():
+            while time.perf_counter() < deadline:
+                await self.conversation(client, deadline)
+        await asyncio.gather(*(user() for _ in range(self.users)))
+
+    async def open_loop(self, client: httpx.AsyncClient, deadline: float):
+        running = set()
+        while time.perf_counter() < deadline:
+            if len(running) < self.users:
+                task = asyncio.ensure_future(self.conversation(client, deadline))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            else:
+                self.dropped += 1
+            await asyncio.sleep(random.expovariate(self.rate))
+        if running:
+            await asyncio.gather(*running)
+
+    async def run(self) -> Dict:
+        limits = httpx.Limits(max_connections=self.users, max_keepalive_connections=self.users)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+            self._started = time.perf_counter()
+            deadline = self._started + self.warmup + self.duration
+            if self.rate:
+                await self.open_loop(client, deadline)
+            else:
+                await self.closed_loop(client, deadline)
+            elapsed = time.perf_counter() - self._started
+        return self.summarize(elapsed)
+
+    def summarize(self, elapsed: float) -> Dict:
+        measured = [r for r in self.records if r['offset_s'] >= self.warmup]
+        window = max(elapsed - self.warmup, 1e-9)
+        latencies = sorted(r['latency_s'] for r in measured if r['ok'])
+
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        summary = {
+            'requests': len(measured),
+            'succeeded': len(latencies),
+            'warmup_requests': len(self.records) - len(measured),
+            'dropped_arrivals': self.dropped,
+            'elapsed_s': round(window, 3),
+            'throughput_rps': round(len(latencies) / window, 2),
+            'error_rate': round(1 - len(latencies) / len(measured), 4) if measured else None,
+            'errors': dict(Counter(r['error'] for r in measured if not r['ok'])),
+            'latency_ms': {
+                'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+                'p50': ms(percentile(latencies, 50)),
+                'p95': ms(percentile(latencies, 95)),
+                'p99': ms(percentile(latencies, 99)),
+                'max': ms(latencies[-1]) if latencies else None,
+            },
+            'by_turn': {},
+        }
+        for turn in sorted({r['turn'] for r in measured}):
+            turn_latencies = sorted(r['latency_s'] for r in measured if r['ok'] and r['turn'] == turn)
+            summary['by_turn'][str(turn)] = {'requests': sum(1 for r in measured if r['turn'] == turn),
+                                             'p50_ms': ms(percentile(turn_latencies, 50)),
+                                             'p95_ms': ms(percentile(turn_latencies, 95))}
+        if self.stream:
+            ttfb = sorted(r['ttfb_s'] for r in measured if r['ok'])
+            summary['ttfb_ms'] = {'p50': ms(percentile(ttfb, 50)), 'p95': ms(percentile(ttfb, 95)),
+                                  'p99': ms(percentile(ttfb, 99))}
+        return summary
+
+def compare(summary: Dict, baseline: Dict) -> List[str]:
+    """Lines describing how the headline numbers moved against a baseline run."""
+    lines = []
+    pairs = [('throughput_rps', summary['throughput_rps'], baseline['summary']['throughput_rps'])]
+    for key in ('p50', 'p95', 'p99'):
+        pairs.append((f"{key}_ms", summary['latency_ms'][key], baseline['summary']['latency_ms'][key]))
+    pairs.append(('error_rate', summary['error_rate'], baseline['summary']['error_rate']))
+    for name, current, previous in pairs:
+        if current is None or previous is None:
+            continue
+        change = f" ({(current - previous) / previous * 100:+.1f}%)" if previous else ''
+        lines.append(f"{name}: {previous} -> {current}{change}")
+    return lines
+
+def wait_for(url: str, timeout: float = 20.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+def start_stubs(port: int, llm_latency: str) -> List[subprocess.Popen]:
+    """Start the stub LLM, stub Supabase and the app under Hypercorn; return the processes."""
+    llm_port, supabase_port = port + 1, port + 2
+    env = dict(os.environ, LLM_BACKEND='stub', STUB_LLM_URL=f'http://127.0.0.1:{llm_port}/v1',
+               SUPABASE_URL=f'http://127.0.0.1:{supabase_port}', SUPABASE_KEY='stub.stub.stub')
+    env.pop('OPENAI_BASE_URL', None)
+    quiet = {'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL, 'cwd': HERE}
+    processes = [
+        subprocess.Popen([sys.executable, 'stub_llm_server.py', '--port', str(llm_port),
+                          '--latency', llm_latency], **quiet),
+        subprocess.Popen([sys.executable, 'stub_supabase_server.py', '--port', str(supabase_port)], **quiet),
+        subprocess.Popen([sys.executable, '-m', 'hypercorn', 'app:app', '--bind', f'127.0.0.1:{port}'],
+                         env=env, **quiet),
+    ]
+    try:
+        wait_for(f'http://127.0.0.1:{llm_port}/v1/models')
+        wait_for(f'http://127.0.0.1:{supabase_port}/stats')
+        wait_for(f'http://127.0.0.1:{port}/api/health')
+    except RuntimeError:
+        stop(processes)
+        raise
+    return processes
+
+def stop(processes: List[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait(timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=BASE_URL, help='Base URL of the app')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+    parser.add_argument('--rate', type=float, help='Open loop: conversations started per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds, after warm-up')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Seconds of traffic excluded from the results')
+    parser.add_argument('--think-time', type=float, default=0.0, help='Mean pause between turns, in seconds')
+    parser.add_argument('--conversations', help='JSON file with a list of conversations (lists of messages)')
+    parser.add_argument('--stream', action='store_true', help='Use /api/chat/stream and report time to first byte')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Per-request timeout in seconds')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', help='Earlier --output file to compare against')
+    parser.add_argument('--label', default='', help='Free-form label stored with the results, e.g. a release')
+    parser.add_argument('--seed', type=int, help='Seed conversation choice and arrival times')
+    parser.add_argument('--stub', action='store_true', help='Start the app against the offline stubs first')
+    parser.add_argument('--stub-port', type=int, default=5810, help='App port for --stub; the stubs use the next two')
+    parser.add_argument('--stub-llm-latency', default='lognormal:0.8,0.5', help='Latency spec for the stub LLM')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    conversations = DEFAULT_CONVERSATIONS
+    if args.conversations:
+        with open(args.conversations) as f:
+            conversations = json.load(f)
+
+    processes = []
+    url = args.url
+    if args.stub:
+        processes = start_stubs(args.stub_port, args.stub_llm_latency)
+        url = f'http://127.0.0.1:{args.stub_port}'
+
+    mode = f"open loop at {args.rate}/s" if args.rate else "closed loop"
+    print(f"=== Load test: {url}, {args.users} users, {mode}, {args.warmup}s warm-up + {args.duration}s ===")
+    test = LoadTest(url, conversations, args.users, args.duration, args.warmup, args.rate,
+                    args.think_time, args.stream, args.timeout)
+    try:
+        summary = asyncio.run(test.run())
+    finally:
+        if processes:
+            stop(processes)
+
+    print(json.dumps(summary, indent=2))
+    results = {
+        'label': args.label,
+        'finished_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'config': {'url': url, 'endpoint': test.endpoint, 'users': args.users, 'rate': args.rate,
+                   'duration_s': args.duration, 'warmup_s': args.warmup, 'think_time_s': args.think_time,
+                   'stub': args.stub, 'conversations': len(conversations)},
+        'summary': summary,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\n=== Compared with {baseline.get('label') or args.baseline} ===")
+        print("\n".join(compare(summary, baseline)))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Latency buckets in seconds; the top ones cover slow GPT-4 completions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+INF_LABEL = 'le="+Inf"'
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Metric:
+    """Base class for metrics rendered in the Prometheus text format."""
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+class Gauge(Metric):
+    """A value that goes up and down, or is read from a callback at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                return [f'{self.name} {_format_value(self._function())}']
+            except Exception as e:
+                print(f"Error reading gauge {self.name}: {e}")
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: per-bucket counts (non-cumulative), sum, count
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [[0] * len(self.buckets), 0.0, 0]
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        lines = []
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, INF_LABEL)} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    'scheduling_http_requests_total', 'HTTP requests handled, by endpoint, method and status.',
+    ('endpoint', 'method', 'status')))
+REQUEST_ERRORS = REGISTRY.register(Counter(
+    'scheduling_http_request_errors_total', 'HTTP requests that ended with a 5xx status or an exception.',
+    ('endpoint',)))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    'scheduling_http_requests_in_flight', 'HTTP requests currently being handled.'))
+LIVE_SESSIONS = REGISTRY.register(Gauge(
+    'scheduling_live_sessions', 'Chat sessions currently held in memory.'))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    'scheduling_stage_latency_seconds', 'Latency by stage: request, openai, supabase_<table>, json_serialization.',
+    ('stage',)))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    'scheduling_stage_errors_total', 'Exceptions raised inside a timed stage.',
+    ('stage',)))
+LLM_REJECTED = REGISTRY.register(Counter(
+    'scheduling_llm_admission_rejected_total', 'LLM calls turned away by admission control, by reason.',
+    ('reason',)))
+LLM_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'scheduling_llm_queue_depth', 'Callers waiting for an LLM call slot.'))
+LLM_CACHE = REGISTRY.register(Counter(
+    'scheduling_llm_cache_total', 'LLM response cache lookups, by result and tier.',
+    ('result', 'tier')))
+FAST_PATH = REGISTRY.register(Counter(
+    'scheduling_fast_path_total', 'Chat messages checked by the local intent classifier, by intent and result (hit or miss).',
+    ('intent', 'result')))
+BATCH_ITEMS = REGISTRY.register(Counter(
+    'scheduling_batch_items_total', 'Messages processed through /api/chat/batch, by status.',
+    ('status',)))
+SCHEDULE_CONFLICTS = REGISTRY.register(Counter(
+    'scheduling_schedule_conflicts_total', 'Bookings that overlapped another for the same crew, by action (rejected or flagged).',
+    ('action',)))
+BULK_SCHEDULES = REGISTRY.register(Counter(
+    'scheduling_bulk_schedules_total', 'Rows submitted for bulk schedule creation, by status.',
+    ('status',)))
+WRITE_BEHIND = REGISTRY.register(Counter(
+    'scheduling_write_behind_total', 'Journaled schedule writes sent to Supabase, by operation and result.',
+    ('op', 'result')))
+WRITE_BEHIND_QUEUE = REGISTRY.register(Gauge(
+    'scheduling_write_behind_queue', 'Journaled schedule writes not yet in Supabase, by status (pending or failed).',
+    ('status',)))
+REPLICA_READS = REGISTRY.register(Counter(
+    'scheduling_replica_reads_total', 'Reads that could use the local read replica, by table and where they were served.',
+    ('table', 'source')))
+REPLICA_LAG = REGISTRY.register(Gauge(
+    'scheduling_replica_lag_seconds', 'Time since the read replica last finished a sync.'))
+LLM_TOKENS = REGISTRY.register(Counter(
+    'scheduling_llm_tokens_total', 'Tokens used by LLM calls, by endpoint, model and kind (prompt or completion).',
+    ('endpoint', 'model', 'kind')))
+LLM_COST = REGISTRY.register(Counter(
+    'scheduling_llm_cost_usd_total', 'Estimated cost of LLM calls in US dollars, by endpoint and model.',
+    ('endpoint', 'model')))
+LLM_CALLS_UNREPORTED = REGISTRY.register(Counter(
+    'scheduling_llm_calls_unreported_total', 'LLM calls whose response carried no token usage.',
+    ('endpoint', 'model')))
+PROMPT_TOKENS = REGISTRY.register(Histogram(
+    'scheduling_llm_prompt_tokens', 'Prompt size of each LLM call in tokens, by endpoint.',
+    ('endpoint',), buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000)))
+FAST_PATH_HIT_RATIO = REGISTRY.register(Gauge(
+    'scheduling_fast_path_hit_ratio', 'Share of chat messages answered locally without an LLM call.'))
+
+def _fast_path_hit_ratio() -> float:
+    with FAST_PATH._lock:
+        hits = sum(v for key, v in FAST_PATH._values.items() if key[1] == 'hit')
+        total = sum(FAST_PATH._values.values())
+    return hits / total if total else 0.0
+
+FAST_PATH_HIT_RATIO.set_function(_fast_path_hit_ratio)
+
+@contextmanager
+def timed(stage: str):
+    """Record how long the block takes under `stage`, and count it as an error if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage=stage)
+
+def timed_supabase(table: str):
+    """Time one Supabase call against `table`."""
+    return timed(f'supabase_{table}')
+
+def percentile(samples: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (0-100) of the samples, in any order; None if there are none.
+
+    Shared by the load test and benchmarks so their p95s are comparable.
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    # Rounded first so float noise such as 7.000000000000001 does not push the rank up one
+    rank = max(1, math.ceil(round(pct * len(ordered) / 100.0, 9)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -1,35 +1,31 @@
-from supabase import create_client
-from dotenv import load_dotenv
-import os
+from repository import get_repository
 
-load_dotenv()
-
-# Initialize Supabase client
-supabase = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'))
+# Shared repository; connections.py loads .env
+repository = get_repository()
 
 # Find Anna Wong's client record
-client = supabase.table('clients').select('*').eq('name', 'Anna Wong').execute()
+client = repository.find('clients', name='Anna Wong')
 print('\nClient record:')
-print(client.data)
+print(client)
 
-if client.data:
-    client_id = client.data[0]['id']
+if client:
+    client_id = client[0]['id']
     
     # Find associated schedules
-    schedules = supabase.table('schedules').select('*').eq('client_id', client_id).execute()
+    schedules = repository.find('schedules', client_id=client_id)
     print('\nSchedules:')
-    print(schedules.data)
+    print(schedules)
     
     # Get service IDs from schedules
-    service_ids = [s['service_id'] for s in schedules.data if s.get('service_id')]
+    service_ids = [s['service_id'] for s in schedules if s.get('service_id')]
     if service_ids:
-        services = supabase.table('services').select('*').in_('id', service_ids).execute()
+        services = repository.get_many('services', set(service_ids))
         print('\nServices:')
-        print(services.data)
+        print(services)
     
     # Get location IDs from schedules
-    location_ids = [s['location_id'] for s in schedules.data if s.get('location_id')]
+    location_ids = [s['location_id'] for s in schedules if s.get('location_id')]
     if location_ids:
-        locations = supabase.table('locations').select('*').in_('id', location_ids).execute()
+        locations = repository.get_many('locations', set(location_ids))
         print('\nLocations:')
-        print(locations.data) 
\ No newline at end of file
+        print(locations)
\ No newline at end of file
@@ -0,0 +1,205 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import metrics
+from repository import Repository
+
+# SQLite file holding the local copy; unset turns the replica off
+READ_REPLICA_PATH = os.getenv('READ_REPLICA_PATH', '')
+# Reads are served locally only while the last completed sync is at most this old
+READ_REPLICA_MAX_STALENESS_SECONDS = float(os.getenv('READ_REPLICA_MAX_STALENESS_SECONDS', '30'))
+READ_REPLICA_POLL_SECONDS = float(os.getenv('READ_REPLICA_POLL_SECONDS', '5'))
+# Watermark polling cannot see deletes, so ids are compared in full this often. The staleness
+# bound covers deletes too, so this must stay well below it or reads fall back to Supabase
+READ_REPLICA_RECONCILE_SECONDS = float(os.getenv('READ_REPLICA_RECONCILE_SECONDS',
+                                                 str(READ_REPLICA_MAX_STALENESS_SECONDS / 2)))
+# Rows per request while copying changes
+READ_REPLICA_PAGE = 1000
+
+# The tables from create_tables.sql, in SQLite types; created in this order so references resolve
+SCHEMA = {
+    'clients': ('id TEXT PRIMARY KEY', 'name TEXT NOT NULL', 'email TEXT', 'phone TEXT', 'address TEXT',
+                'created_at TEXT', 'updated_at TEXT'),
+    'services': ('id TEXT PRIMARY KEY', 'name TEXT NOT NULL', 'description TEXT', 'price REAL',
+                 'duration_minutes INTEGER', 'created_at TEXT', 'updated_at TEXT'),
+    'locations': ('id TEXT PRIMARY KEY', 'name TEXT NOT NULL', 'address TEXT', 'city TEXT', 'postal_code TEXT',
+                  'created_at TEXT', 'updated_at TEXT'),
+    'schedules': ('id TEXT PRIMARY KEY', 'client_id TEXT', 'service_id TEXT', 'location_id TEXT',
+                  'service_date TEXT NOT NULL', 'start_time TEXT', 'end_time TEXT', 'status TEXT', 'notes TEXT',
+                  'crew TEXT', 'created_at TEXT', 'updated_at TEXT'),
+}
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_clients_name ON clients(name)',
+    'CREATE INDEX IF NOT EXISTS idx_schedules_date_id ON schedules(service_date, id)',
+    'CREATE INDEX IF NOT EXISTS idx_schedules_client ON schedules(client_id)',
+)
+COLUMNS = {table: tuple(column.split()[0] for column in columns) for table, columns in SCHEMA.items()}
+
+class ReadReplica:
+    """Local SQLite copy of clients, services, locations and schedules for hot reads.
+
+    A background thread copies rows changed since each table's `updated_at`
+    watermark, and every READ_REPLICA_RECONCILE_SECONDS drops local rows
+    whose ids are gone upstream. Callers ask fresh() before reading: once
+    the last completed copy of changes or of deletes is older than
+    `max_staleness`, they should go to Supabase instead. This worker's own writes are applied with put(),
+    update() and delete(), so it reads them back straight away.
+    """
+
+    def __init__(self, path: str, get_repository: Callable[[], Repository], max_staleness: float = READ_REPLICA_MAX_STALENESS_SECONDS,
+                 poll_interval: float = READ_REPLICA_POLL_SECONDS,
+                 reconcile_interval: float = READ_REPLICA_RECONCILE_SECONDS):
+        self.path = path
+        self.get_repository = get_repository
+        self.max_staleness = max_staleness
+        self.poll_interval = poll_interval
+        self.reconcile_interval = reconcile_interval
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        for table, columns in SCHEMA.items():
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+        for statement in INDEXES:
+            self._db.execute(statement)
+        self._db.execute('CREATE TABLE IF NOT EXISTS replica_state '
+                         '(table_name TEXT PRIMARY KEY, watermark TEXT, reconciled_at REAL)')
+        self._lock = threading.Lock()
+        self._synced_at: Optional[float] = None
+        self._reconciled_at: Optional[float] = None
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            metrics.REPLICA_LAG.set_function(self.lag_seconds)
+            self._thread = threading.Thread(target=self._run, name='read-replica', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def fresh(self) -> bool:
+        """True while both the last sync of changes and of deletes are within the staleness bound."""
+        return self.lag_seconds() < self.max_staleness
+
+    def lag_seconds(self) -> float:
+        if self._synced_at is None or self._reconciled_at is None:
+            return float('inf')
+        return time.monotonic() - min(self._synced_at, self._reconciled_at)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Error syncing read replica: {e}")
+            self._stopping.wait(self.poll_interval)
+
+    def sync(self):
+        """Copy every table's changes since its watermark, reconciling deletes when due."""
+        started = time.monotonic()
+        for table in SCHEMA:
+            self._pull_changes(table)
+        self._synced_at = started
+        # Deletes made before a restart are unknown too, so the first sync always reconciles
+        if self._reconciled_at is None or started - self._reconciled_at >= self.reconcile_interval:
+            for table in SCHEMA:
+                self._reconcile(table)
+            self._reconciled_at = started
+
+    def _state(self, table: str) -> Dict:
+        with self._lock:
+            row = self._db.execute('SELECT watermark, reconciled_at FROM replica_state WHERE table_name = ?',
+                                   (table,)).fetchone()
+        return dict(row) if row else {'watermark': None, 'reconciled_at': None}
+
+    def _pull_changes(self, table: str):
+        watermark = self._state(table)['watermark']
+        # Rows sharing the watermark's timestamp were copied last time; skip those already seen
+        skip = 0
+        while True:
+            # '*' so databases without the optional schedules.crew column still sync
+            page = self.get_repository().select(table, '*', [('updated_at', 'gte', watermark)] if watermark else [],
+                                                order='updated_at,id', limit=READ_REPLICA_PAGE, offset=skip)
+            if page:
+                self.put(table, page)
+                last = page[-1]['updated_at']
+                skip = (skip if last == watermark else 0) + sum(1 for row in page if row['updated_at'] == last)
+                watermark = last
+                with self._lock:
+                    self._db.execute('INSERT INTO replica_state (table_name, watermark) VALUES (?, ?) '
+                                     'ON CONFLICT(table_name) DO UPDATE SET watermark = excluded.watermark',
+                                     (table, watermark))
+            if len(page) < READ_REPLICA_PAGE:
+                return
+
+    def _reconcile(self, table: str):
+        # Listed first, so rows this worker writes while upstream is read are not taken for deleted
+        with self._lock:
+            local = {row[0] for row in self._db.execute(f'SELECT id FROM {table}')}
+        upstream = set()
+        while True:
+            page = self.get_repository().select(table, 'id', order='id', limit=READ_REPLICA_PAGE,
+                                                offset=len(upstream))
+            upstream.update(str(row['id']) for row in page)
+            if len(page) < READ_REPLICA_PAGE:
+                break
+        gone = local - upstream
+        with self._lock:
+            self._db.executemany(f'DELETE FROM {table} WHERE id = ?', [(row_id,) for row_id in gone])
+            self._db.execute('INSERT INTO replica_state (table_name, reconciled_at) VALUES (?, ?) '
+                             'ON CONFLICT(table_name) DO UPDATE SET reconciled_at = excluded.reconciled_at',
+                             (table, time.time()))
+        if gone:
+            print(f"Read replica dropped {len(gone)} deleted {table} rows")
+
+    def put(self, table: str, rows: List[Dict]):
+        """Insert or replace whole rows."""
+        columns = COLUMNS[table]
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    [tuple(row.get(column) for column in columns) for row in rows])
+            except BaseException:
+                # Left open, the transaction would make every later BEGIN fail
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+
+    def update(self, table: str, row_id: str, changes: Dict):
+        """Apply a partial update, such as a write-behind edit not yet in Supabase."""
+        changes = {column: value for column, value in changes.items() if column in COLUMNS[table]}
+        if changes:
+            with self._lock:
+                self._db.execute(f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in changes)} WHERE id = ?",
+                                 (*changes.values(), row_id))
+
+    def delete(self, table: str, row_id: str):
+        with self._lock:
+            self._db.execute(f'DELETE FROM {table} WHERE id = ?', (row_id,))
+
+    def query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params)]
+
+    def all(self, table: str) -> List[Dict]:
+        return self.query(f'SELECT * FROM {table} ORDER BY id')
+
+    def client_schedules(self, client_id: str) -> List[Dict]:
+        return self.query('SELECT * FROM schedules WHERE client_id = ?', (client_id,))
+
+    def calendar(self, start_date: str, end_date: str) -> List[Dict]:
+        """Schedules in a date range shaped like the PostgREST calendar query, names embedded."""
+        rows = self.query(
+            'SELECT s.*, c.name AS client_name, v.name AS service_name FROM schedules s '
+            'LEFT JOIN clients c ON c.id = s.client_id LEFT JOIN services v ON v.id = s.service_id '
+            'WHERE s.service_date BETWEEN ? AND ? ORDER BY s.service_date, s.id', (start_date, end_date))
+        for row in rows:
+            client_name, service_name = row.pop('client_name'), row.pop('service_name')
+            row['clients'] = {'name': client_name} if client_name is not None else None
+            row['services'] = {'name': service_name} if service_name is not None else None
+        return rows
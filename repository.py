@@ -0,0 +1,387 @@
+import datetime
+import functools
+import os
+import re
+import threading
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from connections import get_supabase
+from metrics import timed_supabase
+
+# Where rows live: 'supabase', or 'memory' for an in-process store with no network (tests,
+# benchmarks). Read after connections.py has loaded .env
+REPOSITORY_BACKEND = os.getenv('REPOSITORY_BACKEND', 'supabase').lower()
+
+# PostgREST returns at most about this many rows per request, so longer reads are paged
+REPOSITORY_PAGE = 1000
+# Values per `in` filter when fetching by id, and rows per request in bulk writes
+ID_CHUNK = 100
+BULK_CHUNK = 100
+
+# (column, operator, value); operators are eq, neq, gt, gte, lt, lte, in and ilike
+Filter = Tuple[str, str, object]
+OPERATORS = ('eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'in', 'ilike')
+
+def like_escape(text: str) -> str:
+    """`text` with LIKE's wildcards escaped, so an ilike pattern matches it literally."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def uniform_keys(rows: List[Dict]) -> List[Dict]:
+    """The rows with every key any of them has, the missing ones set to None.
+
+    PostgREST rejects a bulk insert or upsert whose objects have different
+    keys (PGRST102), such as a chunk where only some bookings name a crew.
+    """
+    keys = {key: None for row in rows for key in row}
+    if all(len(row) == len(keys) for row in rows):
+        return rows
+    return [dict(keys, **row) for row in rows]
+
+class Repository:
+    """Typed access to the clients, services, locations and schedules tables.
+
+    Backends implement five primitives: select(), insert(), upsert(),
+    update() and delete(). Everything else (get-or-create, paged range
+    queries, chunked id lookups, bulk upserts) is built on them here, so
+    the Supabase and in-memory backends behave the same and the queries
+    callers depend on are tuned in one place.
+
+    `columns` takes a PostgREST select list, including one level of
+    embedded resources such as "*, clients(name)".
+    """
+
+    def select(self, table: str, columns: str = '*', filters: Sequence[Filter] = (), order: Optional[str] = None,
+               limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        raise NotImplementedError
+
+    def insert(self, table: str, rows: List[Dict]) -> List[Dict]:
+        raise NotImplementedError
+
+    def upsert(self, table: str, rows: List[Dict]) -> List[Dict]:
+        raise NotImplementedError
+
+    def update(self, table: str, row_id: str, changes: Dict) -> Optional[Dict]:
+        """Change one row by id and return it, or None if there is no such row."""
+        raise NotImplementedError
+
+    def delete(self, table: str, row_id: str) -> bool:
+        raise NotImplementedError
+
+    def search_clients(self, query: str, limit: int) -> List[Dict]:
+        """Ranked fuzzy client search in the database, where the backend has one."""
+        raise NotImplementedError(f"{type(self).__name__} has no database client search")
+
+    def get(self, table: str, row_id: str, columns: str = '*') -> Optional[Dict]:
+        rows = self.select(table, columns, [('id', 'eq', row_id)], limit=1)
+        return rows[0] if rows else None
+
+    def find(self, table: str, columns: str = '*', order: Optional[str] = None, limit: Optional[int] = None,
+             **equals) -> List[Dict]:
+        """Rows whose columns equal the keyword arguments."""
+        return self.select(table, columns, [(column, 'eq', value) for column, value in equals.items()],
+                           order=order, limit=limit)
+
+    def find_one(self, table: str, columns: str = '*', **equals) -> Optional[Dict]:
+        rows = self.find(table, columns, limit=1, **equals)
+        return rows[0] if rows else None
+
+    def get_many(self, table: str, values: Iterable, column: str = 'id', columns: str = '*',
+                 order: Optional[str] = None, chunk_size: int = ID_CHUNK) -> List[Dict]:
+        """Rows whose `column` is one of `values`, one request per `chunk_size` values."""
+        values = list(values)
+        rows = []
+        for i in range(0, len(values), chunk_size):
+            rows.extend(self.select(table, columns, [(column, 'in', values[i:i + chunk_size])], order=order))
+        return rows
+
+    def range(self, table: str, column: str, start=None, end=None, columns: str = '*',
+              filters: Sequence[Filter] = (), order: Optional[str] = None) -> List[Dict]:
+        """Every row with `start <= column <= end` (either bound optional), paged past the row limit.
+
+        Ordered by `column` then id unless `order` says otherwise; the order
+        must be total so pages neither skip nor repeat rows.
+        """
+        bounds = list(filters)
+        if start is not None:
+            bounds.append((column, 'gte', start))
+        if end is not None:
+            bounds.append((column, 'lte', end))
+        return self._paged(table, columns, bounds, order or f'{column},id')
+
+    def all(self, table: str, columns: str = '*', order: str = 'id') -> List[Dict]:
+        """Every row of a table, paged past the row limit."""
+        return self._paged(table, columns, [], order)
+
+    def _paged(self, table: str, columns: str, filters: Sequence[Filter], order: str) -> List[Dict]:
+        rows = []
+        while True:
+            page = self.select(table, columns, filters, order=order, limit=REPOSITORY_PAGE, offset=len(rows))
+            rows.extend(page)
+            if len(page) < REPOSITORY_PAGE:
+                return rows
+
+    def create(self, table: str, data: Dict) -> Optional[Dict]:
+        """Insert one row and return it as stored."""
+        rows = self.insert(table, [data])
+        return rows[0] if rows else None
+
+    def get_or_create(self, table: str, match: Dict, data: Dict) -> Tuple[Dict, bool]:
+        """The first row equal to `match` on every column, else a new row from `data`; and whether it is new."""
+        existing = self.find_one(table, **match)
+        if existing is not None:
+            return existing, False
+        return self.create(table, data), True
+
+    def bulk_upsert(self, table: str, rows: List[Dict], chunk_size: int = BULK_CHUNK) -> List[Dict]:
+        """Insert or update rows by id, one request per `chunk_size` rows."""
+        stored = []
+        for i in range(0, len(rows), max(1, chunk_size)):
+            stored.extend(self.upsert(table, rows[i:i + chunk_size]))
+        return stored
+
+class SupabaseRepository(Repository):
+    """Reads and writes through the shared Supabase client, timing each request per table."""
+
+    def __init__(self, get_client: Callable = get_supabase):
+        self.get_client = get_client
+
+    def select(self, table: str, columns: str = '*', filters: Sequence[Filter] = (), order: Optional[str] = None,
+               limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        query = self.get_client().table(table).select(columns)
+        for column, op, value in filters:
+            if op not in OPERATORS:
+                raise ValueError(f"Unsupported filter '{op}'")
+            query = getattr(query, 'in_' if op == 'in' else op)(column, value)
+        if order:
+            query = query.order(order)
+        if limit is not None:
+            query = query.limit(limit)
+        if offset:
+            query = query.offset(offset)
+        with timed_supabase(table):
+            return query.execute().data
+
+    def insert(self, table: str, rows: List[Dict]) -> List[Dict]:
+        with timed_supabase(table):
+            return self.get_client().table(table).insert(uniform_keys(rows)).execute().data
+
+    def upsert(self, table: str, rows: List[Dict]) -> List[Dict]:
+        with timed_supabase(table):
+            return self.get_client().table(table).upsert(uniform_keys(rows)).execute().data
+
+    def update(self, table: str, row_id: str, changes: Dict) -> Optional[Dict]:
+        with timed_supabase(table):
+            rows = self.get_client().table(table).update(changes).eq('id', row_id).execute().data
+        return rows[0] if rows else None
+
+    def delete(self, table: str, row_id: str) -> bool:
+        with timed_supabase(table):
+            return bool(self.get_client().table(table).delete().eq('id', row_id).execute().data)
+
+    def search_clients(self, query: str, limit: int) -> List[Dict]:
+        with timed_supabase('clients'):
+            return self.get_client().rpc('search_clients', {'query': query, 'max_results': limit}).execute().data
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+@functools.lru_cache(maxsize=64)
+def _parse_select(columns: str) -> Tuple:
+    """'*, clients(name)' -> (('*', None), ('clients', (('name', None),)))"""
+    parts = []
+    for part in re.findall(r'\w+\([^)]*\)|[^,\s()]+', columns or '*'):
+        embedded = re.match(r'^(\w+)\((.*)\)$', part)
+        parts.append((embedded.group(1), _parse_select(embedded.group(2))) if embedded else (part, None))
+    return tuple(parts)
+
+def _compare(value, operand) -> Optional[int]:
+    if value is None or operand is None:
+        return None
+    if isinstance(value, (int, float)) and isinstance(operand, (int, float)):
+        left, right = value, operand
+    else:
+        left, right = str(value), str(operand)
+    return (left > right) - (left < right)
+
+# Whether a comparison result (-1, 0 or 1) passes each operator
+_COMPARISONS = {'eq': lambda order: order == 0, 'neq': lambda order: order != 0, 'gt': lambda order: order > 0,
+                'gte': lambda order: order >= 0, 'lt': lambda order: order < 0, 'lte': lambda order: order <= 0}
+
+def _predicate(column: str, op: str, operand) -> Callable[[Dict], bool]:
+    """A row test for one filter, with the operand prepared once rather than per row."""
+    if op == 'eq':
+        key = str(operand)
+        def equals(row: Dict) -> bool:
+            value = row.get(column)
+            return value is not None and (value == operand or str(value) == key)
+        return equals
+    if op == 'in':
+        wanted = {str(item) for item in operand}
+        return lambda row: row.get(column) is not None and str(row[column]) in wanted
+    if op == 'ilike':
+        # As in SQL: % is any run, _ any one character, and a backslash escapes the next character
+        pattern = re.compile('^' + ''.join(
+            re.escape(escaped) if escaped else '.*' if wildcard == '%' else '.' if wildcard else re.escape(literal)
+            for escaped, wildcard, literal in re.findall(r'\\(.)|([%_])|(.)', str(operand), re.DOTALL)) + '$',
+            re.IGNORECASE | re.DOTALL)
+        return lambda row: row.get(column) is not None and pattern.match(str(row[column])) is not None
+    if op not in _COMPARISONS:
+        raise ValueError(f"Unsupported filter '{op}'")
+    passes = _COMPARISONS[op]
+    # Like SQL, a null only gets through neq (PostgREST's neq is "is distinct from" here)
+    return lambda row: op == 'neq' if row.get(column) is None else passes(_compare(row[column], operand))
+
+class MemoryRepository(Repository):
+    """In-process tables with the same semantics as the Supabase backend and no network.
+
+    Rows are kept per table in insertion order, keyed by id. New rows get a
+    uuid and created_at/updated_at stamps, and updates move updated_at, as
+    the database defaults and triggers do. Embedded resources follow the
+    `<singular>_id` foreign key, e.g. clients(name) reads client_id.
+
+    The first equality filter on a column builds a hash index for it, like
+    the indexes in create_tables.sql, so lookups such as a client's bookings
+    do not scan the table. Every write keeps the indexes current.
+    """
+
+    def __init__(self, tables: Optional[Dict[str, List[Dict]]] = None):
+        self._tables: Dict[str, Dict[str, Dict]] = {}
+        # (table, column) -> value -> {id: row}
+        self._indexes: Dict[Tuple[str, str], Dict[str, Dict[str, Dict]]] = {}
+        self._lock = threading.Lock()
+        for table, rows in (tables or {}).items():
+            self._tables[table] = {str(row['id']): dict(row) for row in rows}
+
+    def _table(self, table: str) -> Dict[str, Dict]:
+        return self._tables.setdefault(table, {})
+
+    def _index(self, table: str, column: str) -> Dict[str, Dict[str, Dict]]:
+        index = self._indexes.get((table, column))
+        if index is None:
+            index = self._indexes[(table, column)] = {}
+            for row in self._table(table).values():
+                if row.get(column) is not None:
+                    index.setdefault(str(row[column]), {})[row['id']] = row
+        return index
+
+    def _reindex(self, table: str, row: Dict, add: bool):
+        for (indexed_table, column), index in self._indexes.items():
+            if indexed_table != table or row.get(column) is None:
+                continue
+            if add:
+                index.setdefault(str(row[column]), {})[row['id']] = row
+            else:
+                index.get(str(row[column]), {}).pop(row['id'], None)
+
+    def _project(self, row: Dict, parts: Tuple) -> Dict:
+        result = {}
+        for name, inner in parts:
+            if inner is not None:
+                target = self._table(name).get(str(row.get(f"{name[:-1]}_id")))
+                result[name] = self._project(target, inner) if target else None
+            elif name == '*':
+                result.update(row)
+            else:
+                result[name] = row.get(name)
+        return result
+
+    def select(self, table: str, columns: str = '*', filters: Sequence[Filter] = (), order: Optional[str] = None,
+               limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        with self._lock:
+            rows = self._table(table).values()
+            equals = [(column, operand) for column, op, operand in filters if op == 'eq']
+            if equals:
+                # Start from the rows with the first equality filter's value instead of scanning
+                column, operand = min(equals, key=lambda pair: pair[0] != 'id')
+                if column == 'id':
+                    row = self._table(table).get(str(operand))
+                    rows = [row] if row is not None else []
+                else:
+                    rows = self._index(table, column).get(str(operand), {}).values()
+            tests = [_predicate(column, op, operand) for column, op, operand in filters]
+            rows = [row for row in rows if all(test(row) for test in tests)]
+            for term in reversed(order.split(',') if order else []):
+                column, _, direction = term.strip().partition('.')
+                # Nulls sort last, as in Postgres
+                rows.sort(key=lambda row: (row.get(column) is None, '' if row.get(column) is None else row.get(column)),
+                          reverse=direction.startswith('desc'))
+            rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            parts = _parse_select(columns)
+            return [self._project(row, parts) for row in rows]
+
+    def _paged(self, table: str, columns: str, filters: Sequence[Filter], order: str) -> List[Dict]:
+        # No row limit in memory, so one pass instead of re-filtering the table per page
+        return self.select(table, columns, filters, order=order)
+
+    def insert(self, table: str, rows: List[Dict]) -> List[Dict]:
+        with self._lock:
+            stored = self._table(table)
+            inserted = []
+            for row in rows:
+                row = dict(row)
+                row['id'] = str(row.get('id') or uuid.uuid4())
+                if row['id'] in stored:
+                    raise ValueError(f"Duplicate key {row['id']} in {table}")
+                row.setdefault('created_at', _now())
+                row.setdefault('updated_at', row['created_at'])
+                stored[row['id']] = row
+                self._reindex(table, row, add=True)
+                inserted.append(dict(row))
+            return inserted
+
+    def upsert(self, table: str, rows: List[Dict]) -> List[Dict]:
+        with self._lock:
+            stored = self._table(table)
+            upserted = []
+            for row in rows:
+                row_id = str(row.get('id') or uuid.uuid4())
+                existing = stored.get(row_id)
+                if existing is None:
+                    existing = stored[row_id] = {'created_at': _now()}
+                self._reindex(table, existing, add=False)
+                existing.update(row, id=row_id, updated_at=_now())
+                self._reindex(table, existing, add=True)
+                upserted.append(dict(existing))
+            return upserted
+
+    def update(self, table: str, row_id: str, changes: Dict) -> Optional[Dict]:
+        with self._lock:
+            row = self._table(table).get(str(row_id))
+            if row is None:
+                return None
+            self._reindex(table, row, add=False)
+            row.update(changes)
+            row['updated_at'] = _now()
+            self._reindex(table, row, add=True)
+            return dict(row)
+
+    def delete(self, table: str, row_id: str) -> bool:
+        with self._lock:
+            row = self._table(table).pop(str(row_id), None)
+            if row is None:
+                return False
+            self._reindex(table, row, add=False)
+            return True
+
+_repository: Optional[Repository] = None
+_repository_lock = threading.Lock()
+
+def get_repository() -> Repository:
+    """The process-wide repository for REPOSITORY_BACKEND, built on first use."""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                if REPOSITORY_BACKEND == 'supabase':
+                    _repository = SupabaseRepository()
+                elif REPOSITORY_BACKEND == 'memory':
+                    _repository = MemoryRepository()
+                else:
+                    raise ValueError(f"Unknown REPOSITORY_BACKEND '{REPOSITORY_BACKEND}', expected 'supabase' or 'memory'")
+    return _repository
+
+def set_repository(repository: Repository):
+    """Use `repository` everywhere in this process, e.g. a seeded MemoryRepository in a benchmark."""
+    global _repository
+    with _repository_lock:
+        _repository = repository
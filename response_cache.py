@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import metrics
+
+# LLM response cache settings, overridable from the environment
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '512'))
+LLM_CACHE_TTL_SECONDS = float(os.getenv('LLM_CACHE_TTL_SECONDS', '86400'))
+# Set to a file path (e.g. llm_cache.sqlite3) to keep entries across restarts
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', '')
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text.strip().lower()).rstrip(" ?!.")
+
+def _normalize_message(message: Dict) -> Dict:
+    normalized = dict(message)
+    if isinstance(normalized.get('content'), str):
+        # Only the customer's wording is normalized; prompts are sent as written
+        if normalized.get('role') == 'user':
+            normalized['content'] = _normalize_text(normalized['content'])
+    return normalized
+
+class ResponseCache:
+    """LRU + TTL cache of LLM responses, keyed on model, parameters and normalized messages.
+
+    The in-memory tier holds up to `max_entries` responses. When `path` is
+    set, entries are also written to a SQLite file and read back after a
+    restart.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL_SECONDS,
+                 path: str = LLM_CACHE_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS llm_responses '
+                             '(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)')
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, params: Dict, messages: List[Dict]) -> str:
+        payload = json.dumps({
+            'model': model,
+            'params': params,
+            'messages': [_normalize_message(m) for m in messages]
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    metrics.LLM_CACHE.inc(result='hit', tier='memory')
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute('SELECT value, created_at FROM llm_responses WHERE key = ?', (key,)).fetchone()
+                if row and now - row[1] < self.ttl:
+                    self._remember(key, row[0], row[1])
+                    metrics.LLM_CACHE.inc(result='hit', tier='disk')
+                    return row[0]
+
+        metrics.LLM_CACHE.inc(result='miss', tier='all')
+        return None
+
+    def set(self, key: str, value: str):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, value, created_at)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO llm_responses (key, value, created_at) VALUES (?, ?, ?)',
+                                 (key, value, created_at))
+                self._writes += 1
+                # Prune expired rows now and then so the file stays small
+                if self._writes % 100 == 0:
+                    self._db.execute('DELETE FROM llm_responses WHERE created_at < ?', (created_at - self.ttl,))
+                self._db.commit()
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._entries[key] = (value, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM llm_responses')
+                self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""Offline daily route planning for crews, from postal codes.
+
+Each stop is placed at the centroid of its postal code, or of its FSA
+(the first three characters, e.g. M4E) when the full code is not in the
+table. Distances are straight-line kilometres times ROAD_FACTOR, and
+drive times assume AVERAGE_SPEED_KMH, so no network or map service is
+needed. Stops are ordered with nearest neighbour, then improved with
+2-opt until no move helps or the time budget runs out.
+
+The centroid table is a CSV with `fsa,latitude,longitude` columns (a
+full postal code may be used in place of an FSA). It is not bundled;
+build_fsa_centroids.py writes it from the GeoNames postal code dump.
+Without it no stop can be placed, and every plan says so in `warnings`.
+
+A stop with a `start_time` is a booked appointment. The crew waits when
+it arrives early, and a late arrival is reported in `conflicts`. If the
+shortest order makes bookings later than the order given does, the
+given order is kept.
+
+    python route_planner.py --stops stops.csv --base "M4E 1A1"
+    python route_planner.py --benchmark 300
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from schedule_index import format_minutes, parse_minutes
+
+FSA_CENTROIDS_PATH = os.getenv('FSA_CENTROIDS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                   'fsa_centroids.csv'))
+# Optional JSON file that keeps computed distances across runs
+DISTANCE_CACHE_PATH = os.getenv('DISTANCE_CACHE_PATH')
+
+# Roads are longer than straight lines; 1.3 is typical for city grids
+ROAD_FACTOR = float(os.getenv('ROAD_FACTOR', '1.3'))
+AVERAGE_SPEED_KMH = float(os.getenv('AVERAGE_SPEED_KMH', '30'))
+# Where crews start and end the day, as a postal code or FSA; unset means routes start at the first job
+ROUTE_BASE_POSTAL_CODE = os.getenv('ROUTE_BASE_POSTAL_CODE')
+# Longest time spent improving one crew's route
+ROUTE_TIME_BUDGET_SECONDS = float(os.getenv('ROUTE_TIME_BUDGET_SECONDS', '0.5'))
+
+POSTAL_CODE = re.compile(r'\b([ABCEGHJ-NPRSTVXY]\d[ABCEGHJ-NPRSTV-Z])\s?(\d[ABCEGHJ-NPRSTV-Z]\d)?\b', re.IGNORECASE)
+EARTH_RADIUS_KM = 6371.0
+
+def normalise_postal_code(text: Optional[str]) -> Optional[str]:
+    """'m4e1a1' -> 'M4E 1A1', 'M4E' -> 'M4E'; None if the text holds no Canadian postal code or FSA."""
+    match = POSTAL_CODE.search(text or '')
+    if not match:
+        return None
+    fsa, ldu = match.group(1).upper(), match.group(2)
+    return f"{fsa} {ldu.upper()}" if ldu else fsa
+
+def haversine_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+class CentroidTable:
+    """Latitude and longitude per postal code or FSA."""
+
+    def __init__(self, centroids: Dict[str, Tuple[float, float]], path: Optional[str] = None):
+        self.centroids = {normalise_postal_code(code): point for code, point in centroids.items()
+                          if normalise_postal_code(code)}
+        self.path = path
+
+    @classmethod
+    def load(cls, path: str = FSA_CENTROIDS_PATH) -> 'CentroidTable':
+        """Read a `fsa,latitude,longitude` CSV; a missing file gives an empty table."""
+        if not os.path.exists(path):
+            print(f"WARNING: no postal code centroids at {path}. Route planning cannot place any stop, so "
+                  f"routes keep their booked order. Run build_fsa_centroids.py to create the table.")
+            return cls({}, path)
+        with open(path, newline='') as f:
+            return cls({row['fsa']: (float(row['latitude']), float(row['longitude']))
+                        for row in csv.DictReader(f)}, path)
+
+    def missing_warning(self) -> Optional[str]:
+        """Why no stop can be placed, or None if the table has entries."""
+        if self.centroids:
+            return None
+        return (f"No postal code centroids loaded from {self.path or 'the table given'}, so stops keep their "
+                f"booked order and have no drive times. Run build_fsa_centroids.py to create the table.")
+
+    def key_for(self, postal_code: Optional[str]) -> Optional[str]:
+        """The most precise table entry for a postal code: the full code, else its FSA."""
+        code = normalise_postal_code(postal_code)
+        if code is None:
+            return None
+        if code in self.centroids:
+            return code
+        return code[:3] if code[:3] in self.centroids else None
+
+class DistanceMatrix:
+    """Road-adjusted distances between centroid keys, computed once per pair and cached."""
+
+    def __init__(self, table: CentroidTable, cache_path: Optional[str] = DISTANCE_CACHE_PATH):
+        self.table = table
+        self.cache_path = cache_path
+        self._km: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path) as f:
+                self._km = {tuple(key.split('|')): km for key, km in json.load(f).items()}
+
+    def km(self, a: str, b: str) -> float:
+        if a == b:
+            return 0.0
+        key = (a, b) if a < b else (b, a)
+        km = self._km.get(key)
+        if km is None:
+            km = haversine_km(self.table.centroids[a], self.table.centroids[b]) * ROAD_FACTOR
+            with self._lock:
+                self._km[key] = km
+                self._dirty = True
+        return km
+
+    def matrix(self, keys: Sequence[str]) -> List[List[float]]:
+        """Full distance matrix for `keys`, in their order."""
+        return [[self.km(a, b) for b in keys] for a in keys]
+
+    def save(self):
+        """Write new distances to DISTANCE_CACHE_PATH, if set."""
+        if not self.cache_path or not self._dirty:
+            return
+        with self._lock:
+            snapshot = {f"{a}|{b}": km for (a, b), km in self._km.items()}
+            self._dirty = False
+        with open(self.cache_path, 'w') as f:
+            json.dump(snapshot, f)
+
+def drive_minutes(km: float) -> float:
+    return km / AVERAGE_SPEED_KMH * 60
+
+def _tour_length(order: List[int], dist: List[List[float]], closed: bool) -> float:
+    total = sum(dist[order[i]][order[i + 1]] for i in range(len(order) - 1))
+    return total + (dist[order[-1]][order[0]] if closed and len(order) > 1 else 0.0)
+
+def solve(dist: List[List[float]], start: int = 0, closed: bool = False,
+          time_budget: float = ROUTE_TIME_BUDGET_SECONDS) -> List[int]:
+    """Visit order for every node, beginning at `start`.
+
+    Nearest neighbour builds a first route, then 2-opt reverses segments
+    while that shortens it. A closed route returns to `start` at the end.
+    """
+    n = len(dist)
+    if n <= 2:
+        return [start] + [i for i in range(n) if i != start]
+    deadline = time.perf_counter() + time_budget
+
+    order, unvisited = [start], set(range(n)) - {start}
+    while unvisited:
+        row = dist[order[-1]]
+        nearest = min(unvisited, key=row.__getitem__)
+        order.append(nearest)
+        unvisited.remove(nearest)
+
+    # Node 0 of the order stays fixed; with a closed route the last edge wraps back to it
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, n - 1):
+            a, b = order[i - 1], order[i]
+            dist_a, ab = dist[a], dist[a][b]
+            for j in range(i + 1, n):
+                c = order[j]
+                d = order[j + 1] if j + 1 < n else (order[0] if closed else None)
+                before = ab + (dist[c][d] if d is not None else 0.0)
+                after = dist_a[c] + (dist[b][d] if d is not None else 0.0)
+                if after < before - 1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    b, ab = order[i], dist_a[order[i]]
+                    improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return order
+
+class RoutePlanner:
+    """Orders one crew's stops for a day and estimates the drive between them.
+
+    A stop is a dict with an `id`, a `postal_code` and optionally
+    `duration_minutes` and a booked `start_time`; other keys are passed
+    through. Stops are given in booked order. Stops whose postal code is
+    not in the centroid table go last, in the order given.
+    """
+
+    def __init__(self, table: Optional[CentroidTable] = None, base_postal_code: Optional[str] = ROUTE_BASE_POSTAL_CODE,
+                 time_budget: float = ROUTE_TIME_BUDGET_SECONDS):
+        self.table = table if table is not None else CentroidTable.load()
+        self.distances = DistanceMatrix(self.table)
+        self.base = self.table.key_for(base_postal_code) if base_postal_code else None
+        self.time_budget = time_budget
+
+    def plan(self, stops: List[Dict], day_start_minutes: Optional[int] = None) -> Dict:
+        """The itinerary: stops in visiting order with legs, drive times and, given a start time, ETAs.
+
+        `order` is 'optimized' for the shortest route found, or 'booked'
+        when that route would be later for booked start times than the
+        order given. `conflicts` lists the stops still reached late.
+        """
+        placed = [(stop, self.table.key_for(stop.get('postal_code'))) for stop in stops]
+        located = [(stop, key) for stop, key in placed if key]
+        unlocated = [(stop, key) for stop, key in placed if not key]
+
+        keys = ([self.base] if self.base else []) + [key for _, key in located]
+        order = solve(self.distances.matrix(keys), 0, closed=bool(self.base), time_budget=self.time_budget) if keys else []
+        visits = [located[i - 1 if self.base else i] for i in order if not (self.base and i == 0)]
+
+        result = dict(self._itinerary(visits + unlocated, day_start_minutes), order='optimized')
+        if result['late_minutes']:
+            booked = self._itinerary(placed, day_start_minutes)
+            if booked['late_minutes'] < result['late_minutes']:
+                result = dict(booked, order='booked')
+        self.distances.save()
+
+        warning = self.table.missing_warning()
+        del result['late_minutes']
+        return dict(result, unlocated=len(unlocated), warnings=[warning] if warning else [])
+
+    def _itinerary(self, visits: List[Tuple[Dict, Optional[str]]], day_start_minutes: Optional[int]) -> Dict:
+        """Legs, ETAs and booking conflicts for stops visited in the given order."""
+        itinerary, conflicts, previous, clock = [], [], self.base, day_start_minutes
+        total_km = total_drive = late_minutes = 0.0
+        for stop, key in visits:
+            km = self.distances.km(previous, key) if previous and key else None
+            drive = drive_minutes(km) if km is not None else None
+            entry = dict(stop, located=key is not None, leg_km=None if km is None else round(km, 2),
+                         drive_minutes=None if drive is None else round(drive, 1))
+            if clock is not None:
+                clock += drive or 0
+                entry['arrive'] = format_minutes(int(clock))
+                booked = parse_minutes(stop.get('start_time'))
+                if booked is not None and clock < booked:
+                    # Early for a booked time: the crew waits and starts on time
+                    entry['wait_minutes'] = round(booked - clock, 1)
+                    clock = booked
+                elif booked is not None and int(clock) > booked:
+                    entry['late_minutes'] = round(clock - booked, 1)
+                    late_minutes += clock - booked
+                    conflicts.append({'id': stop.get('id'), 'start_time': format_minutes(booked),
+                                      'arrive': entry['arrive'], 'late_minutes': entry['late_minutes']})
+                clock += stop.get('duration_minutes') or 0
+            itinerary.append(entry)
+            total_km += km or 0
+            total_drive += drive or 0
+            previous = key or previous
+
+        if self.base and previous and previous != self.base:
+            km = self.distances.km(previous, self.base)
+            total_km += km
+            total_drive += drive_minutes(km)
+        return {'stops': itinerary, 'total_km': round(total_km, 2), 'total_drive_minutes': round(total_drive, 1),
+                'conflicts': conflicts, 'late_minutes': late_minutes}
+
+def _benchmark(count: int, seed: int):
+    """Time plan() on synthetic stops spread over the Toronto area."""
+    random.seed(seed)
+    centroids = {}
+    letters = 'ABCEGHJKLMNPRSTVWXYZ'
+    for i in range(150):
+        code = f"M{i % 10}{letters[i // 10 % len(letters)]}"
+        centroids[code] = (43.58 + random.random() * 0.27, -79.64 + random.random() * 0.47)
+    planner = RoutePlanner(CentroidTable(centroids), base_postal_code='M4E', time_budget=float('inf'))
+    fsas = list(centroids)
+    stops = [{'id': i, 'postal_code': random.choice(fsas), 'duration_minutes': 30} for i in range(count)]
+
+    naive_km = 0.0
+    previous = 'M4E'
+    for stop in stops:
+        naive_km += planner.distances.km(previous, stop['postal_code'])
+        previous = stop['postal_code']
+    naive_km += planner.distances.km(previous, 'M4E')
+
+    began = time.perf_counter()
+    result = planner.plan(stops, day_start_minutes=8 * 60)
+    elapsed = time.perf_counter() - began
+    print(f"{count} stops over {len(set(fsas))} FSAs: planned in {elapsed * 1000:.0f} ms")
+    print(f"Route {result['total_km']} km ({result['total_drive_minutes']} min driving); "
+          f"booked order would be {naive_km:.1f} km")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stops', help='CSV with id, postal_code and optional duration_minutes columns')
+    parser.add_argument('--base', default=ROUTE_BASE_POSTAL_CODE, help='Postal code or FSA the crew starts from')
+    parser.add_argument('--start', default='08:00', help='Time the crew leaves the base')
+    parser.add_argument('--benchmark', type=int, metavar='STOPS', help='Time the solver on generated stops')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        _benchmark(args.benchmark, args.seed)
+        return
+    if not args.stops:
+        parser.error('--stops or --benchmark is required')
+    with open(args.stops, newline='') as f:
+        stops = [dict(row, duration_minutes=int(row['duration_minutes']) if row.get('duration_minutes') else None)
+                 for row in csv.DictReader(f)]
+    hours, minutes = map(int, args.start.split(':'))
+    result = RoutePlanner(base_postal_code=args.base).plan(stops, day_start_minutes=hours * 60 + minutes)
+    for stop in result['stops']:
+        drive = f"{stop['drive_minutes']} min" if stop['drive_minutes'] is not None else 'unknown'
+        print(f"{stop.get('arrive', '')}  {stop['id']}  {stop.get('postal_code') or '?'}  (drive {drive})")
+    print(f"Total: {result['total_km']} km, {result['total_drive_minutes']} min driving, "
+          f"{result['unlocated']} stop(s) without a known postal code, {result['order']} order")
+    for conflict in result['conflicts']:
+        print(f"Late: {conflict['id']} booked for {conflict['start_time']}, arriving {conflict['arrive']}")
+    for warning in result['warnings']:
+        print(f"Warning: {warning}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+import bisect
+import datetime
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Other workers' bookings show up in this worker's index after at most this long
+SCHEDULE_INDEX_TTL_SECONDS = float(os.getenv('SCHEDULE_INDEX_TTL_SECONDS', '300'))
+
+# Length assumed for a booking with a start time but no end time or known service duration
+DEFAULT_BOOKING_MINUTES = int(os.getenv('DEFAULT_BOOKING_MINUTES', '120'))
+
+# Bookings in these states no longer hold their slot
+INACTIVE_STATUSES = ('cancelled',)
+
+def parse_minutes(value) -> Optional[int]:
+    """Minutes after midnight for 'HH:MM' or 'HH:MM:SS', or None if missing or malformed."""
+    if not value:
+        return None
+    try:
+        parts = str(value).split(':')
+        return int(parts[0]) * 60 + int(parts[1])
+    except (ValueError, IndexError):
+        return None
+
+def format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+class ScheduleConflict(ValueError):
+    """A booking overlaps others held by the same crew on the same day."""
+
+    def __init__(self, conflicts: List[Dict]):
+        self.conflicts = conflicts
+        times = ', '.join(f"{c['start_time']}-{c['end_time']}" for c in conflicts)
+        super().__init__(f"That time overlaps {len(conflicts)} existing booking(s): {times}")
+
+class DayIntervals:
+    """One crew's bookings on one day, sorted by start time.
+
+    `max_end[i]` is the latest end among the first i+1 bookings, so "does
+    [start, end) overlap anything?" is one bisect on the starts plus one
+    lookup, whether or not existing bookings already overlap each other.
+    Adding or removing a booking rebuilds the day's arrays, which stay short.
+    """
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.entries: List[Tuple[int, int, str]] = []
+        self.max_end: List[int] = []
+        self._bitmaps: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _rebuild_max_end(self, from_index: int):
+        self._bitmaps = {}
+        latest = self.max_end[from_index - 1] if from_index > 0 else -1
+        del self.max_end[from_index:]
+        for _, end, _ in self.entries[from_index:]:
+            latest = max(latest, end)
+            self.max_end.append(latest)
+
+    def add(self, start: int, end: int, schedule_id: str):
+        index = bisect.bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.entries.insert(index, (start, end, schedule_id))
+        self._rebuild_max_end(index)
+
+    def remove(self, start: int, schedule_id: str):
+        index = bisect.bisect_left(self.starts, start)
+        while index < len(self.entries) and self.entries[index][0] == start:
+            if self.entries[index][2] == schedule_id:
+                del self.starts[index]
+                del self.entries[index]
+                self._rebuild_max_end(index)
+                return
+            index += 1
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """True if any booking here overlaps [start, end), in O(log n)."""
+        before_end = bisect.bisect_left(self.starts, end)
+        return before_end > 0 and self.max_end[before_end - 1] > start
+
+    def overlapping(self, start: int, end: int, exclude_id: Optional[str] = None) -> List[Tuple[int, int, str]]:
+        """The bookings that overlap [start, end), other than `exclude_id`."""
+        if not self.overlaps(start, end):
+            return []
+        before_end = bisect.bisect_left(self.starts, end)
+        return [entry for entry in self.entries[:before_end] if entry[1] > start and entry[2] != exclude_id]
+
+    def occupancy(self, slot_minutes: int) -> int:
+        """Bitmap of the day's slots: bit i is set if any booking touches minutes [i*slot, (i+1)*slot)."""
+        bitmap = self._bitmaps.get(slot_minutes)
+        if bitmap is None:
+            bitmap = 0
+            for start, end, _ in self.entries:
+                first, last = start // slot_minutes, -(-end // slot_minutes)
+                bitmap |= ((1 << (last - first)) - 1) << first
+            self._bitmaps[slot_minutes] = bitmap
+        return bitmap
+
+class ScheduleIndex:
+    """In-process index of upcoming bookings, per day and crew, for conflict checks and free slots.
+
+    Rows from today on are loaded through `loader(from_date)` and reloaded
+    once the TTL has passed, which picks up writes made by other workers.
+    This worker's own writes go through reserve(), put() and remove(), so
+    they are visible to the next check straight away without a query.
+    `duration_for(service_id)` gives the length of bookings that have a
+    start time but no end time.
+    """
+
+    def __init__(self, loader: Callable[[str], List[Dict]],
+                 duration_for: Callable[[Optional[str]], Optional[int]] = lambda service_id: None,
+                 ttl: float = SCHEDULE_INDEX_TTL_SECONDS):
+        self.loader = loader
+        self.duration_for = duration_for
+        self.ttl = ttl
+        self._days: Dict[Tuple[str, Optional[str]], DayIntervals] = {}
+        self._by_id: Dict[str, Dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        with self._lock:
+            if self._is_fresh():
+                return
+            try:
+                rows = self.loader(datetime.date.today().isoformat())
+            except Exception as e:
+                # Keep checking against the last good copy rather than failing every write
+                if self._loaded_at is None:
+                    raise
+                print(f"Error refreshing schedule index, using stale bookings: {e}")
+                return
+            self._days, self._by_id = {}, {}
+            for row in rows:
+                self._add(row)
+            self._loaded_at = time.monotonic()
+
+    def interval(self, row: Dict) -> Optional[Tuple[Tuple[str, Optional[str]], int, int]]:
+        """The ((service_date, crew), start, end) a booking occupies, or None if it holds no slot."""
+        if row.get('status') in INACTIVE_STATUSES or not row.get('service_date'):
+            return None
+        start = parse_minutes(row.get('start_time'))
+        if start is None:
+            return None
+        end = parse_minutes(row.get('end_time'))
+        if end is None or end <= start:
+            end = start + (self.duration_for(row.get('service_id')) or DEFAULT_BOOKING_MINUTES)
+        return (str(row['service_date']), row.get('crew')), start, end
+
+    def _add(self, row: Dict):
+        placed = self.interval(row)
+        if placed is None:
+            return
+        key, start, end = placed
+        self._days.setdefault(key, DayIntervals()).add(start, end, str(row['id']))
+        self._by_id[str(row['id'])] = {'key': key, 'start': start, 'end': end}
+
+    def _remove(self, schedule_id: str) -> Optional[Dict]:
+        held = self._by_id.pop(str(schedule_id), None)
+        if held is not None:
+            day = self._days[held['key']]
+            day.remove(held['start'], str(schedule_id))
+            if not day:
+                del self._days[held['key']]
+        return held
+
+    def _conflicts(self, row: Dict) -> List[Dict]:
+        placed = self.interval(row)
+        if placed is None:
+            return []
+        key, start, end = placed
+        day = self._days.get(key)
+        if day is None:
+            return []
+        return [{'id': schedule_id, 'service_date': key[0], 'crew': key[1],
+                 'start_time': format_minutes(s), 'end_time': format_minutes(e)}
+                for s, e, schedule_id in day.overlapping(start, end, exclude_id=str(row.get('id')))]
+
+    def conflicts(self, row: Dict) -> List[Dict]:
+        """Bookings that `row` would overlap, ignoring `row` itself."""
+        self._ensure_loaded()
+        with self._lock:
+            return self._conflicts(row)
+
+    def reserve(self, row: Dict, allow_conflicts: bool = False) -> List[Dict]:
+        """Check `row` and, unless it conflicts, index it in the same step.
+
+        Returns the conflicts. When there are some and `allow_conflicts` is
+        false, the index is left unchanged. Call remove() if the write then fails.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            conflicts = self._conflicts(row)
+            if not conflicts or allow_conflicts:
+                self._remove(row['id'])
+                self._add(row)
+            return conflicts
+
+    def occupancy(self, service_date: str, crew: Optional[str], slot_minutes: int) -> int:
+        """The crew's occupancy bitmap for one day (see DayIntervals.occupancy); 0 when it is free."""
+        self._ensure_loaded()
+        with self._lock:
+            day = self._days.get((service_date, crew))
+            return day.occupancy(slot_minutes) if day else 0
+
+    def get(self, schedule_id: str) -> Optional[Dict]:
+        """Where a booking sits in the index: {'key', 'start', 'end'}, or None."""
+        with self._lock:
+            held = self._by_id.get(str(schedule_id))
+            return dict(held) if held else None
+
+    def edited(self, schedule_id: str, updates: Dict) -> Dict:
+        """The booking as it would be after `updates`, filled in from the index.
+
+        Moving only the start time keeps the booking's length.
+        """
+        self._ensure_loaded()
+        row = dict(updates, id=str(schedule_id))
+        held = self.get(schedule_id)
+        if held is None:
+            return row
+        (service_date, crew), start, end = held['key'], held['start'], held['end']
+        row.setdefault('service_date', service_date)
+        row.setdefault('crew', crew)
+        new_start = parse_minutes(row.get('start_time'))
+        if new_start is None:
+            row['start_time'] = format_minutes(start)
+            new_start = start
+        if 'end_time' not in updates:
+            row['end_time'] = format_minutes(min(new_start + end - start, 24 * 60 - 1))
+        return row
+
+    def merge(self, rows: List[Dict]):
+        """Add or replace bookings just read from the database, such as a day re-checked before a write.
+
+        Indexed bookings missing from `rows` are kept, since they may be
+        this worker's writes still waiting in the write-behind journal.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            for row in rows:
+                self._remove(row['id'])
+                self._add(row)
+
+    def put(self, row: Dict):
+        """Add or replace one booking after the app has written it."""
+        with self._lock:
+            self._remove(row['id'])
+            self._add(row)
+
+    def remove(self, schedule_id: str):
+        """Drop one booking after the app has deleted it."""
+        with self._lock:
+            self._remove(schedule_id)
+
+    def invalidate(self):
+        """Drop the index; the next check reloads it."""
+        with self._lock:
+            self._loaded_at = None
@@ -1,73 +1,70 @@
-from supabase import create_client
-from dotenv import load_dotenv
-import os
 import datetime
+import os
+import time
 import uuid
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import re
 import json
-from openai import OpenAI
 import asyncio
+from admission import AdmissionRejected, LLMLimiter
+from availability import MAX_SEARCH_DAYS, SlotFinder
+from client_index import CLIENT_SEARCH_LIMIT, ClientIndex
+from agent_tools import EDITABLE_SCHEDULE_FIELDS, MAX_TOOL_ROUNDS, TOOLS, format_tool_result
+from connections import LLM_MODEL, get_async_openai_client, probe_connections
+from intent_classifier import classify
+import metrics
+from metrics import timed
+from read_replica import READ_REPLICA_PATH, ReadReplica
+from repository import Repository, get_repository, like_escape
+from response_cache import ResponseCache
+from route_planner import RoutePlanner
+from schedule_index import DEFAULT_BOOKING_MINUTES, ScheduleConflict, ScheduleIndex, parse_minutes
+from services_cache import ServicesCache
+from session_store import Session, SessionStore
+from token_usage import UsageTracker
+from write_behind import ScheduleJournal, WriteBehindFlusher
+
+# Settings shared by every chat completion; part of the response cache key
+CHAT_MODEL = LLM_MODEL
+CHAT_PARAMS = {"temperature": 0.7, "max_tokens": 500}
+
+# Batch processing: messages handled at once, and retries when the LLM limiter is full
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '8'))
+BATCH_ADMISSION_RETRIES = int(os.getenv('BATCH_ADMISSION_RETRIES', '3'))
+
+# Only the columns a calendar event needs, with client and service names embedded
+CALENDAR_COLUMNS = ('id, service_date, start_time, end_time, status, notes, client_id, service_id, updated_at, '
+                    'clients(name), services(name)')
+# Ids per request when fetching changed events by id
+CALENDAR_ID_CHUNK = 100
+
+# What to do when a booking overlaps another for the same crew: reject, flag (write it and
+# report the overlap) or off
+SCHEDULE_CONFLICT_POLICY = os.getenv('SCHEDULE_CONFLICT_POLICY', 'reject').lower()
+# Where client name searches run: 'memory' (trigram index in this worker) or 'database'
+# (the search_clients function from create_tables.sql)
+CLIENT_SEARCH_BACKEND = os.getenv('CLIENT_SEARCH_BACKEND', 'memory').lower()
+
+# Write-behind: schedule writes go to a local journal and reach Supabase in the background
+SCHEDULE_WRITE_BEHIND = os.getenv('SCHEDULE_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+
+# Bulk creation: rows per insert request, and ids per request when checking clients exist
+BULK_INSERT_CHUNK = int(os.getenv('BULK_INSERT_CHUNK', '100'))
+BULK_ID_CHUNK = 100
+
+# A day's bookings with where they are and how long they take. '*' rather than a column list,
+# so databases without the optional crew column still work
+ROUTE_COLUMNS = '*, locations(name, address, city, postal_code), clients(name, address), services(name, duration_minutes)'
 
-# Load environment variables from current directory
-env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
-print("Looking for .env file at:", env_path)
-load_dotenv(env_path)
-
-# Debug: Print current directory and environment variables
-print("Current working directory:", os.getcwd())
-print("OPENAI_API_KEY exists:", bool(os.getenv('OPENAI_API_KEY')))
-print("OPENAI_API_KEY value:", os.getenv('OPENAI_API_KEY')[:10] + "..." if os.getenv('OPENAI_API_KEY') else None)
-print("SUPABASE_URL exists:", bool(os.getenv('SUPABASE_URL')))
-print("SUPABASE_KEY exists:", bool(os.getenv('SUPABASE_KEY')))
-
-# Check for required environment variables
-def check_env_vars():
-    required_vars = {
-        'OPENAI_API_KEY': os.getenv('OPENAI_API_KEY'),
-        'SUPABASE_URL': os.getenv('SUPABASE_URL'),
-        'SUPABASE_KEY': os.getenv('SUPABASE_KEY')
-    }
-    
-    missing_vars = [var for var, value in required_vars.items() if not value]
-    if missing_vars:
-        raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
-    
-    return required_vars
-
-# Get environment variables
-env_vars = check_env_vars()
-
-# Initialize Supabase client
-supabase = create_client(env_vars['SUPABASE_URL'], env_vars['SUPABASE_KEY'])
-
-# Initialize OpenAI client
-try:
-    client = OpenAI(api_key=env_vars['OPENAI_API_KEY'])
-    # Test the connection
-    test_response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "system", "content": "Test"}],
-        max_tokens=5
-    )
-    print("Successfully initialized OpenAI client")
-except Exception as e:
-    print(f"Error initializing OpenAI client: {e}")
-    raise e
+# Changing any of these can move a booking onto another one
+SLOT_FIELDS = {'service_date', 'start_time', 'end_time', 'service_id', 'status', 'crew'}
 
 class SchedulingAgent:
     def __init__(self):
-        try:
-            print(f"Connecting to Supabase at {env_vars['SUPABASE_URL']}")
-            self.supabase = supabase
-            self.client = OpenAI(api_key=env_vars['OPENAI_API_KEY'])  # Initialize OpenAI client here
-            print("Successfully connected to Supabase")
-        except Exception as e:
-            print(f"Error connecting to Supabase: {str(e)}")
-            raise e
+        # Supabase and OpenAI clients are shared and only built on first use,
+        # so creating the agent makes no network calls.
 
-        self.current_context = {}
-        
         # System prompt for ChatGPT
         self.system_prompt = """You are an AI scheduling assistant for a window cleaning and maintenance business. 
         Your role is to help customers schedule appointments, check availability, and manage their bookings.
@@ -87,101 +84,382 @@ class SchedulingAgent:
         3. Confirm booking details
         4. Create appointment in system
         
+        Use the provided tools to look up clients, services and bookings, and to create, change or
+        cancel bookings. Never make up ids; get them from the tools.
+        
         Be professional, friendly, and helpful. Always confirm details before making bookings."""
         
-        self.conversation_history = [{"role": "system", "content": self.system_prompt}]
+        # Each customer gets their own bounded history and context
+        self.sessions = SessionStore(self.system_prompt)
+
+        # Services rarely change, so lookups are served from memory
+        self.services_cache = ServicesCache(self._load_services)
+
+        # Caps concurrent and per-minute OpenAI calls so bursts queue or fail fast
+        self.llm_limiter = LLMLimiter()
+
+        # Repeated opening questions and intent extractions are answered from here
+        self.response_cache = ResponseCache()
+
+        # Tokens and cost of every OpenAI call, per session, endpoint and model
+        self.token_usage = UsageTracker()
+
+        # Typo-tolerant client name search without a table scan per lookup
+        self.client_index = ClientIndex(self._load_clients)
+
+        # Upcoming bookings per day and crew, so overlaps are caught without a query per booking
+        self.schedule_index = ScheduleIndex(self._load_upcoming_schedules, self._service_duration)
+        self.slot_finder = SlotFinder(self.schedule_index)
+
+        # In write-behind mode the chat turn only waits for a local journal append
+        self.write_journal: Optional[ScheduleJournal] = None
+        self.write_flusher: Optional[WriteBehindFlusher] = None
+        if SCHEDULE_WRITE_BEHIND:
+            self.write_journal = ScheduleJournal()
+            self.write_flusher = WriteBehindFlusher(self.write_journal, get_repository)
+            self.write_flusher.start()
+
+        # Hot reads come from a local SQLite copy while it is within its staleness bound
+        self.read_replica: Optional[ReadReplica] = None
+        if READ_REPLICA_PATH:
+            self.read_replica = ReadReplica(READ_REPLICA_PATH, get_repository)
+            self.read_replica.start()
+
+        # Loads the postal code centroid table on first use
+        self._route_planner: Optional[RoutePlanner] = None
+
         print("Welcome to the AI Scheduling Assistant! I can help you schedule services and manage appointments. Type 'help' for available commands.")
 
-    async def chat_with_gpt(self, message: str) -> str:
-        """Interact with ChatGPT to get more natural responses."""
+    @property
+    def repository(self) -> Repository:
+        return get_repository()
+
+    @property
+    def async_client(self):
+        return get_async_openai_client()
+
+    def warm_up(self, probe: bool = False) -> Dict:
+        """Build the shared clients and preload the services list ahead of the first request."""
+        get_repository()
+        get_async_openai_client()
+        services = self.get_available_services()
+        status = {'services_loaded': len(services)}
+        if CLIENT_SEARCH_BACKEND == 'memory':
+            status['clients_indexed'] = self.client_index.load()
+        if probe:
+            status.update(probe_connections())
+        return status
+
+    def _messages_for(self, session: Session) -> List[Dict]:
+        """The session's history with today's date, so the model can resolve relative dates."""
+        today = datetime.date.today()
+        date_note = {"role": "system", "content": f"Today is {today.strftime('%A')}, {today.isoformat()}."}
+        history = session.conversation_history
+        return history[:1] + [date_note] + history[1:]
+
+    async def _run_tool_calls(self, tool_calls: List[Dict], session: Session):
+        """Record the model's tool calls, run them, and add their results to the session."""
+        session.add_entry({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {"id": call["id"], "type": "function",
+                 "function": {"name": call["name"], "arguments": call["arguments"]}}
+                for call in tool_calls
+            ]
+        })
+        # OpenAI rejects a history with an unanswered tool call, so every call gets a result
+        answered = 0
         try:
-            # Add message to conversation history
-            self.conversation_history.append({"role": "user", "content": message})
-            
-            # Get response from ChatGPT
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
-                model="gpt-4",
-                messages=self.conversation_history,
-                temperature=0.7,
-                max_tokens=500
-            )
-            
+            for call in tool_calls:
+                try:
+                    result = await self.run_tool(call["name"], call["arguments"], session)
+                except Exception as e:
+                    print(f"Error running tool {call['name']}: {str(e)}")
+                    result = {"error": f"{call['name']} failed: {str(e)}"}
+                session.add_entry({"role": "tool", "tool_call_id": call["id"], "content": format_tool_result(result)})
+                answered += 1
+        finally:
+            # Also when the turn is cancelled mid-way, such as a client leaving a stream
+            for call in tool_calls[answered:]:
+                session.add_entry({"role": "tool", "tool_call_id": call["id"],
+                                   "content": format_tool_result({"error": "The tool call was not run"})})
+
+    async def run_tool(self, name: str, arguments: str, session: Session):
+        """Execute one tool the model asked for and return a JSON-serialisable result."""
+        try:
+            args = json.loads(arguments or "{}")
+        except json.JSONDecodeError:
+            return {"error": f"Arguments for {name} were not valid JSON"}
+        if not isinstance(args, dict):
+            return {"error": f"Arguments for {name} must be a JSON object"}
+        print(f"Running tool {name} with {args}")
+
+        if name == "search_client":
+            clients = await asyncio.to_thread(self.search_client, args.get("name", ""))
+            session.current_context['clients'] = clients
+            return clients
+        if name == "get_client_schedules":
+            return await asyncio.to_thread(self.get_client_schedules, args.get("client_id", ""))
+        if name == "list_services":
+            return await asyncio.to_thread(self.get_available_services)
+        if name == "get_calendar":
+            return await asyncio.to_thread(self.get_calendar_data, args.get("start_date", ""), args.get("end_date", ""))
+        if name == "find_free_slots":
+            crew = args.get("crew")
+            try:
+                return await asyncio.to_thread(
+                    self.find_free_slots, args.get("service_id", ""), args.get("start_date", ""),
+                    args.get("end_date") or args.get("start_date", ""), int(args.get("limit") or 5),
+                    [crew] if crew else None)
+            except Exception as e:
+                print(f"Error finding free slots: {str(e)}")
+                return {"error": "Availability could not be checked right now"}
+        if name == "create_schedule":
+            try:
+                schedule = await asyncio.to_thread(
+                    self.create_schedule, args.get("client_id"), args.get("service_id"), args.get("service_date"),
+                    args.get("start_time"), args.get("end_time"), args.get("notes"), args.get("crew"))
+            except ScheduleConflict as e:
+                return {"error": str(e), "conflicts": e.conflicts}
+            if not schedule:
+                return {"error": "The booking was not created. Check the ids, and that the date is today or later."}
+            session.current_context['last_schedule'] = schedule
+            return schedule
+        if name == "edit_schedule":
+            updates = args.get("updates") or {}
+            if not isinstance(updates, dict):
+                return {"error": "updates must be an object of field names to new values"}
+            updates = {k: v for k, v in updates.items() if k in EDITABLE_SCHEDULE_FIELDS}
+            if not updates:
+                return {"error": f"Nothing to update. Allowed fields: {', '.join(EDITABLE_SCHEDULE_FIELDS)}"}
+            try:
+                schedule = await asyncio.to_thread(self.edit_schedule, args.get("schedule_id", ""), updates)
+            except ScheduleConflict as e:
+                return {"error": str(e), "conflicts": e.conflicts}
+            return schedule or {"error": "The booking was not updated. Check the id, and that any new date is today or later."}
+        if name == "delete_schedule":
+            deleted = await asyncio.to_thread(self.delete_schedule, args.get("schedule_id", ""))
+            return {"deleted": deleted}
+        return {"error": f"Unknown tool: {name}"}
+
+    def _opening_cache_key(self, message: str, session: Session) -> Optional[str]:
+        """Cache key for the first message of a session; later turns depend on the conversation.
+
+        Opening replies are sampled at CHAT_PARAMS' temperature, so caching one deliberately
+        freezes it: every customer who opens with the same question gets that one answer. The
+        key covers the system prompt and today's date note, so editing the prompt or a new day
+        starts afresh.
+        """
+        if session.messages:
+            return None
+        messages = self._messages_for(session) + [{"role": "user", "content": message}]
+        return self.response_cache.make_key(CHAT_MODEL, dict(CHAT_PARAMS, tools=TOOLS), messages)
+
+    def _replay_cached_reply(self, cache_key: Optional[str], message: str, session: Session) -> Optional[str]:
+        """Return a cached reply for this opening message, recording the turn in the session."""
+        cached = self.response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            session.add_message("user", message)
+            session.add_message("assistant", cached)
+        return cached
+
+    async def chat_with_gpt(self, message: str, session: Session) -> str:
+        """Run one chat turn, letting ChatGPT call tools to look up data or make bookings."""
+        cache_key = self._opening_cache_key(message, session)
+        cached = self._replay_cached_reply(cache_key, message, session)
+        if cached is not None:
+            return cached
+
+        # Every completion takes its own LLM slot and rate token, so tools run without one.
+        # Only the first can be turned away, before the message is recorded, and then
+        # AdmissionRejected propagates to the caller; later rounds of the turn wait instead.
+        try:
+            for round_number in range(MAX_TOOL_ROUNDS + 1):
+                # On the last round the model must answer in text
+                tool_choice = "auto" if round_number < MAX_TOOL_ROUNDS else "none"
+                async with self.llm_limiter.slot(wait=round_number > 0):
+                    if round_number == 0:
+                        # Add message to the session's conversation history
+                        session.add_message("user", message)
+                    with timed('openai'):
+                        response = await self.async_client.chat.completions.create(
+                            model=CHAT_MODEL,
+                            messages=self._messages_for(session),
+                            tools=TOOLS,
+                            tool_choice=tool_choice,
+                            **CHAT_PARAMS
+                        )
+                self.token_usage.record(CHAT_MODEL, response.usage, session.session_id)
+                reply = response.choices[0].message
+                if not reply.tool_calls:
+                    break
+                await self._run_tool_calls([
+                    {"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+                    for call in reply.tool_calls
+                ], session)
+
             # Extract and store response
-            assistant_message = response.choices[0].message.content
-            self.conversation_history.append({"role": "assistant", "content": assistant_message})
-            
+            assistant_message = reply.content or ""
+            session.add_message("assistant", assistant_message)
+
+            # An answer that needed no tools depends only on the prompt, so this sample is kept
+            # and replayed (see _opening_cache_key)
+            if cache_key and round_number == 0 and assistant_message:
+                self.response_cache.set(cache_key, assistant_message)
+
             return assistant_message
-            
+
+        except AdmissionRejected:
+            raise
         except Exception as e:
             print(f"Error in chat_with_gpt: {e}")
             if "invalid_api_key" in str(e):
                 return "I apologize, but there seems to be an issue with the API key. Please contact support."
             return "I apologize, but I'm having trouble processing your request. Please try again."
 
-    def extract_intent(self, message: str) -> Dict:
-        """Use ChatGPT to extract intent and entities from user message."""
+    async def stream_chat_with_gpt(self, message: str, session: Session) -> AsyncIterator[str]:
+        """Like chat_with_gpt, but yield response tokens as ChatGPT produces them."""
+        cache_key = self._opening_cache_key(message, session)
+        cached = self._replay_cached_reply(cache_key, message, session)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        used_tools = False
         try:
-            prompt = f"""Extract scheduling intent and entities from this message: "{message}"
-            Return a JSON object with these fields:
-            - intent: search_client, show_schedule, list_services, schedule_service, edit_schedule, delete_schedule, or unknown
-            - entities: any relevant names, dates, or services mentioned
-            Example: {{"intent": "schedule_service", "entities": {{"client": "John Doe", "service": "window cleaning", "date": "2024-03-25"}}}}
-            Response should be valid JSON only."""
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a JSON-producing assistant that extracts scheduling intents and entities."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0
-            )
-            
-            return json.loads(response.choices[0].message.content)
-            
+            for round_number in range(MAX_TOOL_ROUNDS + 1):
+                tool_choice = "auto" if round_number < MAX_TOOL_ROUNDS else "none"
+                # Text is relayed as it arrives; tool calls arrive in fragments and are assembled
+                tool_calls = {}
+                usage = None
+                # As in chat_with_gpt, each completion holds a slot while it streams
+                async with self.llm_limiter.slot(wait=round_number > 0):
+                    if round_number == 0:
+                        session.add_message("user", message)
+                    # A streamed completion returns once the first tokens are ready
+                    with timed('openai'):
+                        stream = await self.async_client.chat.completions.create(
+                            model=CHAT_MODEL,
+                            messages=self._messages_for(session),
+                            tools=TOOLS,
+                            tool_choice=tool_choice,
+                            stream=True,
+                            # Not a named argument in this openai version; asks for a final usage chunk
+                            extra_body={"stream_options": {"include_usage": True}},
+                            **CHAT_PARAMS
+                        )
+                    async for chunk in stream:
+                        if getattr(chunk, 'usage', None):
+                            usage = chunk.usage
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        if delta.content:
+                            parts.append(delta.content)
+                            yield delta.content
+                        for fragment in delta.tool_calls or []:
+                            call = tool_calls.setdefault(fragment.index, {"id": "", "name": "", "arguments": ""})
+                            if fragment.id:
+                                call["id"] = fragment.id
+                            if fragment.function and fragment.function.name:
+                                call["name"] += fragment.function.name
+                            if fragment.function and fragment.function.arguments:
+                                call["arguments"] += fragment.function.arguments
+                self.token_usage.record(CHAT_MODEL, usage, session.session_id)
+                if not tool_calls:
+                    if cache_key and not used_tools and parts:
+                        self.response_cache.set(cache_key, "".join(parts))
+                    break
+                used_tools = True
+                await self._run_tool_calls([tool_calls[index] for index in sorted(tool_calls)], session)
+        except AdmissionRejected:
+            raise
         except Exception as e:
-            print(f"Error in intent extraction: {str(e)}")
-            return {"intent": "unknown", "entities": {}}
+            print(f"Error in stream_chat_with_gpt: {e}")
+            if "invalid_api_key" in str(e):
+                apology = "I apologize, but there seems to be an issue with the API key. Please contact support."
+            else:
+                apology = "I apologize, but I'm having trouble processing your request. Please try again."
+            if not parts:
+                yield apology
+                return
+        finally:
+            # Store whatever was generated, even if the client disconnected mid-stream
+            if parts:
+                session.add_message("assistant", "".join(parts))
 
     def search_client(self, name: str) -> List[Dict]:
-        """Search for a client by name."""
+        """Search for clients by name, best match first, tolerating typos."""
         try:
-            print(f"Searching for client with name containing '{name}'")
-            response = self.supabase.table('clients').select('*').ilike('name', f'%{name}%').execute()
-            print(f"Found {len(response.data)} matching clients")
-            return response.data
+            print(f"Searching for client with name like '{name}'")
+            if CLIENT_SEARCH_BACKEND == 'database':
+                clients = self.repository.search_clients(name, CLIENT_SEARCH_LIMIT)
+            else:
+                with timed('client_search'):
+                    clients = self.client_index.search(name)
+            print(f"Found {len(clients)} matching clients")
+            return clients
+        except Exception as e:
+            print(f"Error searching for client, falling back to a substring match: {str(e)}")
+        try:
+            return self.repository.select('clients', filters=[('name', 'ilike', f'%{like_escape(name)}%')])
         except Exception as e:
             print(f"Error searching for client: {str(e)}")
             if hasattr(e, 'response'):
                 print(f"Response: {e.response}")
             return []
 
+    def _load_clients(self) -> List[Dict]:
+        """Every client, for the search index."""
+        replica = self._replica_for('clients')
+        if replica is not None:
+            return replica.all('clients')
+        rows = self.repository.all('clients')
+        print(f"Loaded {len(rows)} clients into the search index")
+        return rows
+
     def get_client_schedules(self, client_id: str) -> List[Dict]:
         """Get all schedules for a client."""
         try:
-            response = self.supabase.table('schedules').select('*').eq('client_id', client_id).execute()
-            return response.data
+            replica = self._replica_for('schedules')
+            if replica is not None:
+                return replica.client_schedules(client_id)
+            return self.repository.find('schedules', client_id=client_id)
         except Exception as e:
             print(f"Error getting client schedules: {str(e)}")
             return []
 
+    def _load_services(self) -> List[Dict]:
+        replica = self._replica_for('services')
+        if replica is not None:
+            return replica.all('services')
+        print("Fetching available services from Supabase")
+        services = self.repository.all('services')
+        print(f"Found {len(services)} services")
+        return services
+
     def get_service_details(self, service_id: str) -> Optional[Dict]:
         """Get service details by ID."""
         try:
-            response = self.supabase.table('services').select('*').eq('id', service_id).execute()
-            return response.data[0] if response.data else None
+            return self.services_cache.get_by_id(service_id)
         except Exception as e:
             print(f"Error getting service details: {str(e)}")
             return None
 
+    def find_service(self, name: str) -> Optional[Dict]:
+        """Get service details by name, ignoring case."""
+        try:
+            return self.services_cache.get_by_name(name)
+        except Exception as e:
+            print(f"Error finding service: {str(e)}")
+            return None
+
     def get_available_services(self) -> List[Dict]:
         """Get list of available services."""
         try:
-            print("Fetching available services from Supabase")
-            response = self.supabase.table('services').select('*').execute()
-            print(f"Found {len(response.data)} services")
-            return response.data
+            return self.services_cache.all()
         except Exception as e:
             print(f"Error getting available services: {str(e)}")
             if hasattr(e, 'response'):
@@ -197,8 +475,16 @@ class SchedulingAgent:
             return False
 
     def create_schedule(self, client_id: str, service_id: str, service_date: str, 
-                       start_time: str = None, end_time: str = None, notes: str = None) -> Optional[Dict]:
-        """Create a new schedule."""
+                       start_time: str = None, end_time: str = None, notes: str = None,
+                       crew: str = None) -> Optional[Dict]:
+        """Create a new schedule.
+
+        In write-behind mode the row is returned with a `pending_write`
+        journal number straight away and reaches Supabase shortly after.
+        Raises ScheduleConflict if the slot overlaps another booking for the
+        same crew and SCHEDULE_CONFLICT_POLICY is 'reject'.
+        """
+        schedule_data = None
         try:
             if not self.validate_date(service_date):
                 raise ValueError("Invalid date or date in the past")
@@ -214,102 +500,587 @@ class SchedulingAgent:
                 'status': 'scheduled',
                 'location_id': None
             }
-            response = self.supabase.table('schedules').insert(schedule_data).execute()
-            return response.data[0] if response.data else None
+            if crew:
+                schedule_data['crew'] = crew
+            self._recheck_days([service_date])
+            conflicts = self._reserve_slot(schedule_data)
+            if self.write_journal is not None:
+                pending = dict(schedule_data, pending_write=self._journal('insert', schedule_data['id'], schedule_data))
+                self._replicate('put', [schedule_data])
+                return dict(pending, conflicts=conflicts) if conflicts else pending
+            created = self.repository.create('schedules', schedule_data)
+            if not created:
+                self.schedule_index.remove(schedule_data['id'])
+                return None
+            self.schedule_index.put(created)
+            self._replicate('put', [created])
+            return dict(created, conflicts=conflicts) if conflicts else created
+        except ScheduleConflict:
+            raise
         except Exception as e:
             print(f"Error creating schedule: {str(e)}")
+            if schedule_data:
+                self.schedule_index.remove(schedule_data['id'])
             return None
 
-    def select_client(self, selection: str) -> Optional[Dict]:
+    def create_schedules(self, items: List[Dict], chunk_size: int = BULK_INSERT_CHUNK) -> List[Dict]:
+        """Create many schedules, one insert request per chunk, and return one result per item, in order.
+
+        The whole list is validated up front: each distinct date is parsed
+        once, services come from the cache and clients are checked with one
+        query per BULK_ID_CHUNK ids. Valid rows are checked for overlaps
+        against the schedule index and each other, then inserted
+        `chunk_size` at a time. If a chunk fails, its rows are retried one
+        by one so the failure is pinned to the rows that caused it.
+        """
+        results: List[Dict] = []
+        pending: List[Tuple[Dict, Dict]] = []
+        today = datetime.date.today()
+        dates: Dict[str, Optional[datetime.date]] = {}
+
+        rows = [item if isinstance(item, dict) else {} for item in items]
+        for row in rows:
+            service_date = str(row.get('service_date') or '')
+            if service_date not in dates:
+                try:
+                    dates[service_date] = datetime.datetime.strptime(service_date, '%Y-%m-%d').date()
+                except ValueError:
+                    dates[service_date] = None
+        # One query for every day being booked, then each row is checked against the index
+        self._recheck_days([service_date for service_date, date in dates.items() if date and date >= today])
+        client_ids = {str(row['client_id']) for row in rows if row.get('client_id')}
+        known_clients = {str(client['id'])
+                         for client in self.repository.get_many('clients', sorted(client_ids), columns='id',
+                                                                chunk_size=BULK_ID_CHUNK)}
+
+        for index, row in enumerate(rows):
+            result = {'index': index}
+            if 'id' in row:
+                result['id'] = row['id']
+            results.append(result)
+
+            service_date = str(row.get('service_date') or '')
+            start, end = parse_minutes(row.get('start_time')), parse_minutes(row.get('end_time'))
+            if not row.get('client_id') or not row.get('service_id') or not service_date:
+                error = 'client_id, service_id and service_date are required'
+            elif dates[service_date] is None or dates[service_date] < today:
+                error = 'Invalid date or date in the past'
+            elif str(row['client_id']) not in known_clients:
+                error = f"Unknown client id: {row['client_id']}"
+            elif not self.services_cache.get_by_id(row['service_id']):
+                error = f"Unknown service id: {row['service_id']}"
+            elif (row.get('start_time') and start is None) or (row.get('end_time') and end is None):
+                error = 'Times must be HH:MM'
+            elif start is not None and end is not None and end <= start:
+                error = 'end_time must be after start_time'
+            else:
+                error = None
+            if error:
+                result.update(status='invalid', error=error)
+                continue
+
+            schedule_data = {
+                'id': str(uuid.uuid4()),
+                'client_id': row['client_id'],
+                'service_id': row['service_id'],
+                'service_date': service_date,
+                'start_time': row.get('start_time'),
+                'end_time': row.get('end_time'),
+                'notes': row.get('notes'),
+                'status': 'scheduled',
+                'location_id': row.get('location_id')
+            }
+            # Only sent when given, so databases without the crew column still work. The
+            # repository gives the other rows of a mixed chunk crew None
+            if row.get('crew'):
+                schedule_data['crew'] = row['crew']
+            try:
+                conflicts = self._reserve_slot(schedule_data)
+            except ScheduleConflict as e:
+                result.update(status='conflict', error=str(e), conflicts=e.conflicts)
+                continue
+            if conflicts:
+                result['conflicts'] = conflicts
+            pending.append((schedule_data, result))
+
+        chunk_size = max(1, chunk_size)
+        for i in range(0, len(pending), chunk_size):
+            chunk = pending[i:i + chunk_size]
+            try:
+                self._insert_schedules(chunk)
+            except Exception as e:
+                print(f"Error inserting {len(chunk)} schedules, retrying one by one: {str(e)}")
+                for entry in chunk:
+                    try:
+                        self._insert_schedules([entry])
+                    except Exception as row_error:
+                        self.schedule_index.remove(entry[0]['id'])
+                        entry[1].update(status='error', error=str(row_error))
+
+        for result in results:
+            metrics.BULK_SCHEDULES.inc(status=result['status'])
+        return results
+
+    def _insert_schedules(self, entries: List[Tuple[Dict, Dict]]):
+        """Insert (schedule_data, result) pairs in one request and record the created rows."""
+        rows = self.repository.insert('schedules', [data for data, _ in entries])
+        created = {str(row['id']): row for row in rows}
+        self._replicate('put', rows)
+        for data, result in entries:
+            row = created.get(data['id'])
+            if row is None:
+                self.schedule_index.remove(data['id'])
+                result.update(status='error', error='The row was not returned by the insert')
+                continue
+            self.schedule_index.put(row)
+            result.update(status='created', schedule=row)
+
+    def select_client(self, selection: str, session: Session) -> Optional[Dict]:
         """Handle client selection from search results."""
         try:
-            if not self.current_context.get('clients'):
+            if not session.current_context.get('clients'):
                 return None
             
             idx = int(selection) - 1
-            if 0 <= idx < len(self.current_context['clients']):
-                selected_client = self.current_context['clients'][idx]
-                self.current_context['selected_client'] = selected_client
+            if 0 <= idx < len(session.current_context['clients']):
+                selected_client = session.current_context['clients'][idx]
+                session.current_context['selected_client'] = selected_client
                 return selected_client
         except ValueError:
             pass
         return None
 
     def edit_schedule(self, schedule_id: str, updates: Dict) -> Optional[Dict]:
-        """Edit an existing schedule."""
+        """Edit an existing schedule.
+
+        In write-behind mode the result is the changes with a
+        `pending_write` number, since the row has not been written yet.
+        Raises ScheduleConflict if the new time overlaps another booking for
+        the same crew and SCHEDULE_CONFLICT_POLICY is 'reject'.
+        """
         try:
             # Validate date if it's being updated
             if 'service_date' in updates and not self.validate_date(updates['service_date']):
                 raise ValueError("Invalid date or date in the past")
 
-            response = self.supabase.table('schedules').update(updates).eq('id', schedule_id).execute()
-            return response.data[0] if response.data else None
+            conflicts = []
+            if SLOT_FIELDS.intersection(updates):
+                edited = self.schedule_index.edited(schedule_id, updates)
+                self._recheck_days([edited['service_date']] if edited.get('service_date') else [])
+                conflicts = self._reserve_slot(edited)
+
+            # Keeps calendar polling deltas correct even without the updated_at trigger
+            updates = dict(updates, updated_at=datetime.datetime.now(datetime.timezone.utc).isoformat())
+            if self.write_journal is not None:
+                pending = dict(updates, id=schedule_id, pending_write=self._journal('update', schedule_id, updates))
+                self._replicate('update', schedule_id, updates)
+                return dict(pending, conflicts=conflicts) if conflicts else pending
+            updated = self.repository.update('schedules', schedule_id, updates)
+            if not updated:
+                self.schedule_index.invalidate()
+                return None
+            self.schedule_index.put(updated)
+            self._replicate('put', [updated])
+            return dict(updated, conflicts=conflicts) if conflicts else updated
+        except ScheduleConflict:
+            raise
         except Exception as e:
             print(f"Error editing schedule: {str(e)}")
+            # The slot may have been reserved for a write that never happened
+            self.schedule_index.invalidate()
             return None
 
     def delete_schedule(self, schedule_id: str) -> bool:
         """Delete a schedule."""
         try:
-            response = self.supabase.table('schedules').delete().eq('id', schedule_id).execute()
-            return bool(response.data)
+            if self.write_journal is not None:
+                self._journal('delete', schedule_id)
+                self.schedule_index.remove(schedule_id)
+                self._replicate('delete', schedule_id)
+                return True
+            deleted = self.repository.delete('schedules', schedule_id)
+            self.schedule_index.remove(schedule_id)
+            self._replicate('delete', schedule_id)
+            return deleted
         except Exception as e:
             print(f"Error deleting schedule: {str(e)}")
             return False
 
+    def _journal(self, op: str, schedule_id: str, payload: Optional[Dict] = None) -> int:
+        """Queue a schedule write for the background flusher and return its journal number."""
+        seq = self.write_journal.append(op, schedule_id, payload)
+        self.write_flusher.notify()
+        return seq
+
+    def close(self):
+        """Flush queued schedule writes before the process exits."""
+        if self.write_flusher is not None:
+            self.write_flusher.stop()
+        if self.read_replica is not None:
+            self.read_replica.stop()
+
+    def _replica_for(self, table: str) -> Optional[ReadReplica]:
+        """The read replica if it may serve a read of `table` now, else None; counts where reads go."""
+        if self.read_replica is None:
+            return None
+        fresh = self.read_replica.fresh()
+        metrics.REPLICA_READS.inc(table=table, source='replica' if fresh else 'supabase')
+        return self.read_replica if fresh else None
+
+    def _replicate(self, action: str, *args):
+        """Apply this worker's own schedule write to the read replica, so it reads it back at once."""
+        if self.read_replica is None:
+            return
+        try:
+            getattr(self.read_replica, action)('schedules', *args)
+        except Exception as e:
+            # The next sync copies the row anyway
+            print(f"Error updating read replica: {str(e)}")
+
+    def _recheck_days(self, service_dates: List[str]):
+        """Merge the bookings on these days, as the database has them now, into the schedule index.
+
+        The index only reloads every SCHEDULE_INDEX_TTL_SECONDS, so a booking
+        another worker made since then would otherwise go unseen. If the
+        query fails, the write is checked against the index as it is.
+        """
+        if SCHEDULE_CONFLICT_POLICY == 'off' or not service_dates:
+            return
+        try:
+            days = sorted(set(service_dates))
+            rows = self.repository.range('schedules', 'service_date', days[0], days[-1],
+                                         filters=[('service_date', 'in', days)])
+        except Exception as e:
+            print(f"Error re-checking bookings before a write, using the schedule index as is: {e}")
+            return
+        self.schedule_index.merge(rows)
+
+    def _reserve_slot(self, schedule: Dict) -> List[Dict]:
+        """Hold the booking's slot in the schedule index before it is written.
+
+        Returns the overlapping bookings when they are allowed through, and
+        raises ScheduleConflict when SCHEDULE_CONFLICT_POLICY rejects them.
+        """
+        if SCHEDULE_CONFLICT_POLICY == 'off':
+            return []
+        conflicts = self.schedule_index.reserve(schedule, allow_conflicts=SCHEDULE_CONFLICT_POLICY == 'flag')
+        if conflicts:
+            action = 'flagged' if SCHEDULE_CONFLICT_POLICY == 'flag' else 'rejected'
+            metrics.SCHEDULE_CONFLICTS.inc(action=action)
+            if action == 'rejected':
+                raise ScheduleConflict(conflicts)
+        return conflicts
+
+    def find_free_slots(self, service_id: str, start_date: str, end_date: str, limit: int = 5,
+                        crews: Optional[List[str]] = None) -> Dict:
+        """The earliest free slots for a service within business hours, between two dates inclusive.
+
+        Bad input comes back as {"error": ...}; failing to load bookings raises.
+        """
+        try:
+            start = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
+            end = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            return {"error": "Dates must be YYYY-MM-DD"}
+        if end < start or (end - start).days >= MAX_SEARCH_DAYS:
+            return {"error": f"The range must run forwards and cover at most {MAX_SEARCH_DAYS} days"}
+        service = self.get_service_details(service_id)
+        if not service:
+            return {"error": f"Unknown service id: {service_id}"}
+        duration = service.get('duration_minutes') or DEFAULT_BOOKING_MINUTES
+        slots = self.slot_finder.find(duration, start, end, limit=limit, crews=crews)
+        return {"service_id": service_id, "duration_minutes": duration, "slots": slots}
+
+    @property
+    def route_planner(self) -> RoutePlanner:
+        if self._route_planner is None:
+            self._route_planner = RoutePlanner()
+        return self._route_planner
+
+    def plan_routes(self, service_date: str, start_time: str = '08:00') -> Dict:
+        """Each crew's bookings for one day in driving order, with drive times and ETAs.
+
+        A booking is placed by its location's postal code, or failing that
+        one found in the location's or the client's address. Booked start
+        times are kept (see RoutePlanner.plan). Raises on Supabase errors.
+        """
+        rows = self.repository.select('schedules', ROUTE_COLUMNS,
+                                      [('service_date', 'eq', service_date), ('status', 'neq', 'cancelled')],
+                                      order='start_time')
+
+        by_crew: Dict[Optional[str], List[Dict]] = {}
+        for row in rows:
+            location = row.get('locations') or {}
+            client = row.get('clients') or {}
+            service = row.get('services') or {}
+            by_crew.setdefault(row.get('crew'), []).append({
+                'id': row['id'],
+                'client': client.get('name'),
+                'service': service.get('name'),
+                'address': location.get('address') or client.get('address'),
+                'postal_code': location.get('postal_code') or location.get('address') or client.get('address'),
+                'start_time': row.get('start_time'),
+                'duration_minutes': service.get('duration_minutes')
+            })
+
+        hours, minutes = map(int, start_time.split(':')[:2])
+        routes = []
+        with timed('route_planning'):
+            for crew, stops in by_crew.items():
+                routes.append(dict(self.route_planner.plan(stops, day_start_minutes=hours * 60 + minutes), crew=crew))
+        warning = self.route_planner.table.missing_warning()
+        return {'service_date': service_date, 'routes': routes, 'warnings': [warning] if warning else []}
+
+    def _load_upcoming_schedules(self, from_date: str) -> List[Dict]:
+        """Every booking on or after `from_date`, for the schedule index."""
+        # All columns rather than a list, so databases without the optional crew column still load
+        return self.repository.range('schedules', 'service_date', start=from_date)
+
+    def _service_duration(self, service_id: Optional[str]) -> Optional[int]:
+        service = self.get_service_details(service_id) if service_id else None
+        return service.get('duration_minutes') if service else None
+
+    @staticmethod
+    def _calendar_event(schedule: Dict) -> Dict:
+        client = (schedule.get('clients') or {}).get('name', 'Unknown client')
+        service = (schedule.get('services') or {}).get('name', 'Unknown service')
+        return {
+            'id': schedule['id'],
+            'title': f"{client} - {service}",
+            'start': schedule['service_date'],
+            'end': schedule['service_date'],
+            'start_time': schedule.get('start_time'),
+            'end_time': schedule.get('end_time'),
+            'status': schedule['status'],
+            'client_id': schedule['client_id'],
+            'service_id': schedule['service_id'],
+            'notes': schedule['notes'],
+            'updated_at': schedule.get('updated_at')
+        }
+
     def get_calendar_data(self, start_date: str, end_date: str) -> List[Dict]:
         """Get all schedules within a date range with client and service details."""
         try:
-            response = self.supabase.table('schedules')\
-                .select('*, clients(name), services(name)')\
-                .gte('service_date', start_date)\
-                .lte('service_date', end_date)\
-                .execute()
-            
-            calendar_data = []
-            for schedule in response.data:
-                calendar_data.append({
-                    'id': schedule['id'],
-                    'title': f"{schedule['clients']['name']} - {schedule['services']['name']}",
-                    'start': schedule['service_date'],
-                    'end': schedule['service_date'],
-                    'status': schedule['status'],
-                    'client_id': schedule['client_id'],
-                    'service_id': schedule['service_id'],
-                    'notes': schedule['notes']
-                })
-            return calendar_data
+            replica = self._replica_for('schedules')
+            if replica is not None:
+                return [self._calendar_event(schedule) for schedule in replica.calendar(start_date, end_date)]
+            rows = self.repository.range('schedules', 'service_date', start_date, end_date, columns=CALENDAR_COLUMNS)
+            return [self._calendar_event(schedule) for schedule in rows]
         except Exception as e:
             print(f"Error getting calendar data: {str(e)}")
             return []
 
-    async def process_message(self, message: str) -> str:
-        """Process a message from the user and return a response."""
+    def get_calendar_page(self, start_date: str, end_date: str, after: Optional[Tuple[str, str]] = None,
+                          limit: int = 200) -> Tuple[List[Dict], Optional[Tuple[str, str]]]:
+        """One page of events ordered by (service_date, id), and the key to continue after, if any.
+
+        Keyset pagination: the page starts after the `after` key instead of
+        skipping rows, so every page costs the same however deep it is.
+        Raises on Supabase errors so callers never cache an empty page.
+        """
+        rows = []
+        if after:
+            # Rest of the day the previous page stopped in, then the following days
+            rows = self.repository.select('schedules', CALENDAR_COLUMNS,
+                                          [('service_date', 'eq', after[0]), ('id', 'gt', after[1])],
+                                          order='id', limit=limit + 1)
+        if len(rows) <= limit:
+            lower = ('service_date', 'gt', after[0]) if after else ('service_date', 'gte', start_date)
+            rows += self.repository.select('schedules', CALENDAR_COLUMNS, [lower, ('service_date', 'lte', end_date)],
+                                           order='service_date,id', limit=limit + 1 - len(rows))
+        next_key = (rows[limit - 1]['service_date'], rows[limit - 1]['id']) if len(rows) > limit else None
+        return [self._calendar_event(schedule) for schedule in rows[:limit]], next_key
+
+    def get_calendar_versions(self, start_date: str, end_date: str) -> List[Dict]:
+        """id and updated_at of every schedule in the range: a cheap fingerprint for polling."""
+        return self.repository.range('schedules', 'service_date', start_date, end_date, columns='id, updated_at')
+
+    def get_calendar_events(self, schedule_ids: List[str]) -> List[Dict]:
+        """Calendar events for the given schedule ids."""
+        rows = self.repository.get_many('schedules', schedule_ids, columns=CALENDAR_COLUMNS, order='service_date,id',
+                                        chunk_size=CALENDAR_ID_CHUNK)
+        return [self._calendar_event(schedule) for schedule in rows]
+
+    @staticmethod
+    def _describe_schedule(schedule: Dict) -> str:
+        times = ""
+        if schedule.get('start_time'):
+            times = f" {str(schedule['start_time'])[:5]}"
+            if schedule.get('end_time'):
+                times += f"-{str(schedule['end_time'])[:5]}"
+        return f"{schedule['title']} on {schedule['start']}{times} ({schedule['status']})"
+
+    async def try_fast_path(self, message: str, session: Session) -> Optional[str]:
+        """Answer routine messages straight from Supabase or the cache, without an LLM call.
+
+        Returns None when the message is not a confident match, so the caller
+        falls through to GPT-4.
+        """
+        match = classify(message)
+        intent = match["intent"] if match else "none"
+        pending = session.current_context.pop('pending_action', None)
+        reply = None
+
+        if intent == "confirm" and pending:
+            deleted = await asyncio.to_thread(self.delete_schedule, pending['schedule_id'])
+            reply = (f"Done, I've cancelled {pending['label']}." if deleted
+                     else f"Sorry, I couldn't cancel {pending['label']}. It may already be gone.")
+        elif intent == "decline" and pending:
+            reply = f"OK, I've kept {pending['label']}."
+        elif intent == "list_services":
+            services = await asyncio.to_thread(self.get_available_services)
+            if services:
+                lines = []
+                for service in services:
+                    details = []
+                    if service.get('price') is not None:
+                        details.append(f"${float(service['price']):.2f}")
+                    if service.get('duration_minutes'):
+                        details.append(f"about {service['duration_minutes']} minutes")
+                    lines.append(f"- {service['name']}" + (f" ({', '.join(details)})" if details else ""))
+                reply = "Here are the services we offer:\n" + "\n".join(lines)
+        elif intent == "show_schedule":
+            entities = match["entities"]
+            schedules = await asyncio.to_thread(self.get_calendar_data, entities['start_date'], entities['end_date'])
+            schedules.sort(key=lambda item: (item['start'], str(item.get('start_time') or '')))
+            session.current_context['schedules'] = schedules
+            period = entities['start_date'] if entities['start_date'] == entities['end_date'] \
+                else f"{entities['start_date']} to {entities['end_date']}"
+            if schedules:
+                lines = [f"{i}. {self._describe_schedule(item)}" for i, item in enumerate(schedules, 1)]
+                reply = f"Bookings for {period}:\n" + "\n".join(lines)
+            else:
+                reply = f"There are no bookings for {period}."
+        elif intent == "delete_schedule":
+            entities = match["entities"]
+            target = None
+            if 'index' in entities:
+                # "Cancel booking 3" refers to the last schedule list shown in this session
+                listed = session.current_context.get('schedules') or []
+                if 1 <= entities['index'] <= len(listed):
+                    item = listed[entities['index'] - 1]
+                    target = {'schedule_id': item['id'], 'label': f"booking {entities['index']}: {self._describe_schedule(item)}"}
+            else:
+                target = {'schedule_id': entities['schedule_id'], 'label': f"booking {entities['schedule_id']}"}
+            if target:
+                # Cancelling cannot be undone, so ask first and act on the next "yes"
+                session.current_context['pending_action'] = target
+                reply = f"Just to confirm: cancel {target['label']}? Reply yes to cancel it or no to keep it."
+        elif intent == "search_client":
+            name = match["entities"]['client']
+            clients = await asyncio.to_thread(self.search_client, name)
+            session.current_context['clients'] = clients
+            if clients:
+                lines = [f"{i}. {client['name']}" + (f" ({client['email']})" if client.get('email') else "")
+                         for i, client in enumerate(clients[:10], 1)]
+                reply = f"I found {len(clients)} client(s) matching '{name}':\n" + "\n".join(lines)
+            else:
+                reply = f"I couldn't find a client matching '{name}'."
+
+        metrics.FAST_PATH.inc(intent=intent, result='hit' if reply is not None else 'miss')
+        if reply is None:
+            return None
+
+        session.add_message("user", message)
+        session.add_message("assistant", reply)
+        return reply
+
+    async def process_message(self, message: str, session_id: str = 'default') -> str:
+        """Process a message from the user and return a response.
+
+        Turns for the same session run one at a time, in arrival order, so
+        concurrent requests never interleave their history or tool results.
+        """
         try:
             # Log the incoming message
             print(f"Processing message: {message[:50]}{'...' if len(message) > 50 else ''}")
             
-            # Get response from ChatGPT
-            response = await self.chat_with_gpt(message)
+            # Routine requests are answered locally; everything else goes to ChatGPT
+            session = self.sessions.get(session_id)
+            async with session.turn_lock:
+                response = await self.try_fast_path(message, session)
+                if response is None:
+                    response = await self.chat_with_gpt(message, session)
             
             # Log the response
             print(f"Generated response: {response[:50]}{'...' if len(response) > 50 else ''}")
             
             return response
+        except AdmissionRejected:
+            raise
         except Exception as e:
             print(f"Error in process_message: {str(e)}")
             import traceback
             traceback.print_exc()
             return f"I'm sorry, but I encountered an error while processing your request. Please try again later. Error: {str(e)}"
 
-    async def handle_scheduling(self, message: str, gpt_response: str):
-        try:
-            # Extract scheduling information from the message
-            if 'schedule' in message.lower() or 'book' in message.lower():
-                # Store in Supabase if needed
-                print(f"Processing scheduling request: {message}")
-        except Exception as e:
-            print(f"Error in handle_scheduling: {e}")
+    async def stream_message(self, message: str, session_id: str = 'default') -> AsyncIterator[str]:
+        """Process a message from the user, yielding the response token by token."""
+        print(f"Streaming response to: {message[:50]}{'...' if len(message) > 50 else ''}")
+        session = self.sessions.get(session_id)
+        # The lock is held until the stream ends, so a second message waits for this reply
+        async with session.turn_lock:
+            response = await self.try_fast_path(message, session)
+            if response is not None:
+                yield response
+                return
+            async for token in self.stream_chat_with_gpt(message, session):
+                yield token
+
+    async def process_batch(self, items: List[Dict], concurrency: int = BATCH_CONCURRENCY) -> List[Dict]:
+        """Process many {session_id, message} items at once and return one result per item, in order.
+
+        Up to `concurrency` messages are in flight together. Messages for the
+        same session run one after another, in the order given, so a replayed
+        conversation keeps its turn order.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        batch_started = time.perf_counter()
+        results: List[Optional[Dict]] = [None] * len(items)
+        sessions: "OrderedDict[str, List[int]]" = OrderedDict()
+
+        for index, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            message = item.get('message')
+            result = {'index': index, 'session_id': str(item.get('session_id') or uuid.uuid4())}
+            if 'id' in item:
+                result['id'] = item['id']
+            results[index] = result
+            if not isinstance(message, str) or not message.strip():
+                result.update(status='invalid', error='No message provided')
+                metrics.BATCH_ITEMS.inc(status='invalid')
+                continue
+            sessions.setdefault(result['session_id'], []).append(index)
+
+        async def run_session(indexes: List[int]):
+            for index in indexes:
+                async with semaphore:
+                    await self._process_batch_item(items[index]['message'], results[index], batch_started)
+
+        await asyncio.gather(*(run_session(indexes) for indexes in sessions.values()))
+        return results
+
+    async def _process_batch_item(self, message: str, result: Dict, batch_started: float):
+        started = time.perf_counter()
+        result['queued_ms'] = round((started - batch_started) * 1000, 1)
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                result.update(status='ok', response=await self.process_message(message, result['session_id']))
+            except AdmissionRejected as e:
+                if attempts <= BATCH_ADMISSION_RETRIES:
+                    # Batches are background work, so wait for capacity instead of failing
+                    await asyncio.sleep(e.retry_after)
+                    continue
+                result.update(status='rejected', error=str(e), retry_after=e.retry_after)
+            except Exception as e:
+                print(f"Error in batch item {result['index']}: {str(e)}")
+                result.update(status='error', error=str(e))
+            break
+        result['attempts'] = attempts
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        metrics.BATCH_ITEMS.inc(status=result['status'])
 
 async def main():
     try:
@@ -0,0 +1,74 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# The services table changes rarely, so an hour is a safe default
+SERVICES_CACHE_TTL_SECONDS = float(os.getenv('SERVICES_CACHE_TTL_SECONDS', '3600'))
+
+class ServicesCache:
+    """In-process copy of the services table, indexed by id and lower-cased name.
+
+    Rows are reloaded through `loader` once the TTL has passed or after
+    invalidate(). Anything that writes to services should call invalidate()
+    or put() so readers never see an outdated catalog.
+    """
+
+    def __init__(self, loader: Callable[[], List[Dict]], ttl: float = SERVICES_CACHE_TTL_SECONDS):
+        self.loader = loader
+        self.ttl = ttl
+        self._rows: List[Dict] = []
+        self._by_id: Dict[str, Dict] = {}
+        self._by_name: Dict[str, Dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def _index(self, rows: List[Dict]):
+        self._rows = list(rows)
+        self._by_id = {str(row['id']): row for row in self._rows if row.get('id') is not None}
+        self._by_name = {row['name'].strip().lower(): row for row in self._rows if row.get('name')}
+
+    def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            if self._is_fresh():
+                return
+            try:
+                self._index(self.loader())
+                self._loaded_at = time.monotonic()
+            except Exception as e:
+                # Serve the last good catalog rather than failing every lookup
+                if self._loaded_at is None:
+                    raise
+                print(f"Error refreshing services cache, serving stale rows: {e}")
+
+    def all(self) -> List[Dict]:
+        """All services."""
+        self._ensure_loaded()
+        return list(self._rows)
+
+    def get_by_id(self, service_id: str) -> Optional[Dict]:
+        self._ensure_loaded()
+        return self._by_id.get(str(service_id))
+
+    def get_by_name(self, name: str) -> Optional[Dict]:
+        """Look up a service by name, ignoring case and surrounding spaces."""
+        self._ensure_loaded()
+        return self._by_name.get(name.strip().lower())
+
+    def put(self, row: Dict):
+        """Add or replace one service after the app has written it."""
+        with self._lock:
+            rows = [r for r in self._rows if str(r.get('id')) != str(row.get('id'))]
+            rows.append(row)
+            self._index(rows)
+
+    def invalidate(self):
+        """Drop the cached rows; the next lookup reloads them."""
+        with self._lock:
+            self._loaded_at = None
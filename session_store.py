@@ -0,0 +1,95 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# Session limits, overridable from the environment
+SESSION_MAX_COUNT = int(os.getenv('SESSION_MAX_COUNT', '1000'))
+SESSION_IDLE_TTL_SECONDS = float(os.getenv('SESSION_IDLE_TTL_SECONDS', '1800'))
+SESSION_MAX_HISTORY = int(os.getenv('SESSION_MAX_HISTORY', '20'))
+
+class Session:
+    """Conversation state for one customer: chat history plus scratch context."""
+
+    def __init__(self, session_id: str, system_prompt: str, max_history: int = SESSION_MAX_HISTORY):
+        self.session_id = session_id
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.max_history = max_history
+        self.messages: List[Dict] = []
+        self.current_context: Dict = {}
+        self.last_seen = time.monotonic()
+        # Held for a whole turn, so two requests for one session never interleave their messages
+        self.turn_lock = asyncio.Lock()
+
+    @property
+    def conversation_history(self) -> List[Dict]:
+        """Messages to send to the model: the system prompt plus the recent turns."""
+        return [self.system_message] + self.messages
+
+    def add_message(self, role: str, content: str):
+        """Append a message and drop the oldest turns beyond max_history."""
+        self.add_entry({"role": role, "content": content})
+
+    def add_entry(self, entry: Dict):
+        """Append a raw chat message (e.g. tool calls or results) and trim the history."""
+        self.messages.append(entry)
+        if len(self.messages) > self.max_history:
+            start = len(self.messages) - self.max_history
+            # Only cut at a user message, so tool results never lose the call that asked for
+            # them, and always keep the turn in progress
+            last_user = max((i for i, m in enumerate(self.messages) if m["role"] == "user"), default=0)
+            while start < last_user and self.messages[start]["role"] != "user":
+                start += 1
+            del self.messages[:min(start, last_user)]
+
+class SessionStore:
+    """Bounded session map with idle expiry and least-recently-used eviction."""
+
+    def __init__(self, system_prompt: str, max_sessions: int = SESSION_MAX_COUNT,
+                 idle_ttl: float = SESSION_IDLE_TTL_SECONDS, max_history: int = SESSION_MAX_HISTORY):
+        self.system_prompt = system_prompt
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_history = max_history
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Session:
+        """Return the session for this id, creating it if needed, and mark it recently used."""
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = Session(session_id, self.system_prompt, self.max_history)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_seen = now
+            return session
+
+    def peek(self, session_id: str) -> Optional[Session]:
+        """Return the session if it exists, without creating it or refreshing it."""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict_expired(self, now: float):
+        # Sessions are ordered by last use, so expired ones sit at the front
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_seen < self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            return len(self._sessions)
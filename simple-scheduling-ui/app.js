@@ -3,12 +3,15 @@ const chatMessages = document.getElementById('chatMessages');
 const messageForm = document.getElementById('messageForm');
 const userMessageInput = document.getElementById('userMessage');
 
-// API URL (Flask server)
-const API_URL = 'http://localhost:5001/api/chat';
+// API URL (Quart server)
+const STREAM_API_URL = 'http://localhost:5001/api/chat/stream';
 
 // Initial loading state
 let isWaitingForResponse = false;
 
+// Conversation session id, assigned by the server on the first reply
+let sessionId = sessionStorage.getItem('schedulingSessionId');
+
 // Add event listener for form submission
 messageForm.addEventListener('submit', async (e) => {
     e.preventDefault();
@@ -29,14 +32,28 @@ messageForm.addEventListener('submit', async (e) => {
         // Add typing indicator
         addTypingIndicator();
         
-        // Send message to API
-        const response = await sendMessageToAPI(message);
+        // Stream the response, rendering tokens as they arrive
+        let paragraph = null;
+        let text = '';
+        const response = await streamMessageFromAPI(message, (token) => {
+            if (!paragraph) {
+                removeTypingIndicator();
+                paragraph = addMessageToChat('assistant', '');
+            }
+            text += token;
+            paragraph.innerHTML = formatMessage(text);
+            scrollToBottom();
+        });
         
         // Remove typing indicator
         removeTypingIndicator();
         
-        // Add assistant response to chat
-        addMessageToChat('assistant', response);
+        // Show the final message (covers responses that arrived without tokens)
+        if (paragraph) {
+            paragraph.innerHTML = formatMessage(response);
+        } else {
+            addMessageToChat('assistant', response);
+        }
     } catch (error) {
         console.error('Error:', error);
         
@@ -51,36 +68,84 @@ messageForm.addEventListener('submit', async (e) => {
 });
 
 /**
- * Send message to API and get response
+ * Send message to the streaming API, calling onToken for each token received
  * @param {string} message - The user's message
- * @returns {Promise<string>} - The assistant's response
+ * @param {function(string)} onToken - Called with each new piece of text
+ * @returns {Promise<string>} - The assistant's complete response
  */
-async function sendMessageToAPI(message) {
-    try {
-        const response = await fetch(API_URL, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({ message })
-        });
-        
-        if (!response.ok) {
-            throw new Error(`HTTP error! Status: ${response.status}`);
+async function streamMessageFromAPI(message, onToken) {
+    const response = await fetch(STREAM_API_URL, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        },
+        body: JSON.stringify({ message, session_id: sessionId })
+    });
+    
+    if (!response.ok) {
+        throw new Error(`HTTP error! Status: ${response.status}`);
+    }
+    
+    let buffer = '';
+    let fullResponse = '';
+    
+    // Handle every complete Server-Sent Events frame; frames are separated by a blank line
+    const handleFrames = () => {
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            for (const line of frame.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            if (!data) continue;
+            const payload = JSON.parse(data);
+            
+            if (event === 'session') {
+                sessionId = payload.session_id;
+                sessionStorage.setItem('schedulingSessionId', sessionId);
+            } else if (event === 'done') {
+                fullResponse = payload.response;
+            } else if (event === 'error') {
+                throw new Error(payload.error);
+            } else if (payload.token) {
+                fullResponse += payload.token;
+                onToken(payload.token);
+            }
         }
-        
-        const data = await response.json();
-        return data.response || 'Sorry, I did not understand that.';
-    } catch (error) {
-        console.error('API Error:', error);
-        throw error;
+    };
+    
+    // Browsers without streaming bodies get the whole stream at once. The message has
+    // already been processed, so it must not be sent again.
+    if (!response.body || !response.body.getReader) {
+        buffer = await response.text();
+        handleFrames();
+        return fullResponse || 'Sorry, I did not understand that.';
     }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        handleFrames();
+    }
+    
+    return fullResponse || 'Sorry, I did not understand that.';
 }
 
 /**
  * Add a message to the chat
  * @param {string} role - Either 'user' or 'assistant'
  * @param {string} content - The message content
+ * @returns {HTMLElement} - The paragraph holding the message text
  */
 function addMessageToChat(role, content) {
     // Create message element
@@ -102,6 +167,8 @@ function addMessageToChat(role, content) {
     
     // Scroll to bottom
     scrollToBottom();
+    
+    return paragraph;
 }
 
 /**
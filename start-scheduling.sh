@@ -13,7 +13,7 @@ if ! command -v python3 &> /dev/null; then
 fi
 
 # Check if all required packages are installed
-REQUIRED_PACKAGES=("flask" "flask-cors" "python-dotenv" "supabase" "openai")
+REQUIRED_PACKAGES=("quart" "quart-cors" "python-dotenv" "supabase" "openai")
 MISSING_PACKAGES=()
 
 for package in "${REQUIRED_PACKAGES[@]}"; do
@@ -41,6 +41,6 @@ EOF
     echo "Please edit the .env file with your actual credentials."
 fi
 
-# Start the Flask server
-echo "Starting Flask server..."
+# Start the Quart server
+echo "Starting Quart server..."
 python3 app.py 
\ No newline at end of file
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Build and serve the scheduling UI as precompressed, content-hashed assets.
+
+`python static_assets.py` writes the build to STATIC_BUILD_DIR:
+
+- app.js and styles.css are copied to content-hashed names (app.<hash>.js),
+  and index.html is rewritten to reference them
+- each file gets .gz and, when the optional `brotli` package is installed,
+  .br variants
+- manifest.json lists every file with its encodings and content hash
+
+At runtime the app loads that build into memory. If there is no build, it
+builds the same thing in memory from simple-scheduling-ui on first use.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STATIC_SOURCE_DIR = os.path.join(HERE, 'simple-scheduling-ui')
+STATIC_BUILD_DIR = os.getenv('STATIC_BUILD_DIR', os.path.join(HERE, 'static-build'))
+
+ENTRY_POINT = 'index.html'
+# Files the entry point references; these get content-hashed names
+HASHED_ASSETS = ('app.js', 'styles.css')
+
+# Hashed files never change, so clients may keep them for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# The entry point and unhashed names are revalidated with their ETag on every use
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Preferred first when the client accepts several
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+class Asset:
+    """One static file in every encoding it is available in."""
+
+    def __init__(self, name: str, body: bytes, immutable: bool, variants: Optional[Dict[str, bytes]] = None):
+        self.name = name
+        self.mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.immutable = immutable
+        self.variants = {'identity': body}
+        self.variants.update(variants if variants is not None else compress(body))
+
+    @property
+    def cache_control(self) -> str:
+        return IMMUTABLE_CACHE_CONTROL if self.immutable else REVALIDATE_CACHE_CONTROL
+
+    def etag(self, encoding: str) -> str:
+        """Strong ETag, different per encoding since the bytes differ."""
+        suffix = '' if encoding == 'identity' else f'-{encoding}'
+        return f'{self.digest[:20]}{suffix}'
+
+    def negotiate(self, accepts) -> str:
+        """Best encoding this asset has that the client accepts (a werkzeug Accept object)."""
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and accepts[encoding] > 0:
+                return encoding
+        return 'identity'
+
+def compress(body: bytes) -> Dict[str, bytes]:
+    variants = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    return variants
+
+def hashed_name(name: str, body: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(body).hexdigest()[:10]}{ext}"
+
+def build(source_dir: str = STATIC_SOURCE_DIR) -> Dict[str, Asset]:
+    """Build every asset in memory, keyed by the name it is served under."""
+    assets: Dict[str, Asset] = {}
+    with open(os.path.join(source_dir, ENTRY_POINT), encoding='utf-8') as f:
+        index_html = f.read()
+
+    for name in HASHED_ASSETS:
+        with open(os.path.join(source_dir, name), 'rb') as f:
+            body = f.read()
+        hashed = hashed_name(name, body)
+        assets[hashed] = Asset(hashed, body, immutable=True)
+        # The plain name keeps working for old pages and bookmarks, revalidated each time
+        assets[name] = Asset(name, body, immutable=False, variants=assets[hashed].variants)
+        index_html = re.sub(rf'''(src|href)=(["']){re.escape(name)}\2''', rf'\1=\2{hashed}\2', index_html)
+
+    assets[ENTRY_POINT] = Asset(ENTRY_POINT, index_html.encode('utf-8'), immutable=False)
+    return assets
+
+def write(assets: Dict[str, Asset], build_dir: str = STATIC_BUILD_DIR):
+    """Write a build to disk, with a manifest the server loads at startup."""
+    os.makedirs(build_dir, exist_ok=True)
+    manifest = {}
+    for name, asset in assets.items():
+        for encoding, body in asset.variants.items():
+            extension = dict(ENCODINGS).get(encoding, '')
+            with open(os.path.join(build_dir, name + extension), 'wb') as f:
+                f.write(body)
+        manifest[name] = {'immutable': asset.immutable, 'encodings': sorted(asset.variants), 'sha256': asset.digest}
+    with open(os.path.join(build_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def load(build_dir: str = STATIC_BUILD_DIR) -> Dict[str, Asset]:
+    """Load a build written by write()."""
+    with open(os.path.join(build_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    assets = {}
+    for name, entry in manifest.items():
+        variants = {}
+        for encoding in entry['encodings']:
+            with open(os.path.join(build_dir, name + dict(ENCODINGS).get(encoding, '')), 'rb') as f:
+                variants[encoding] = f.read()
+        assets[name] = Asset(name, variants.pop('identity'), entry['immutable'], variants)
+    return assets
+
+_lock = threading.Lock()
+_assets: Optional[Dict[str, Asset]] = None
+
+def get_assets() -> Dict[str, Asset]:
+    """The served assets, loaded from the build directory or built from source on first use."""
+    global _assets
+    if _assets is None:
+        with _lock:
+            if _assets is None:
+                if os.path.exists(os.path.join(STATIC_BUILD_DIR, 'manifest.json')):
+                    _assets = load(STATIC_BUILD_DIR)
+                else:
+                    print(f"No static build in {STATIC_BUILD_DIR}, building the UI in memory")
+                    _assets = build(STATIC_SOURCE_DIR)
+    return _assets
+
+if __name__ == '__main__':
+    built = build()
+    write(built)
+    for asset_name, built_asset in sorted(built.items()):
+        sizes = ', '.join(f"{encoding} {len(body)}B" for encoding, body in sorted(built_asset.variants.items()))
+        print(f"{asset_name}: {sizes}")
+    print(f"Static build written to {STATIC_BUILD_DIR}" + ('' if brotli else ' (install brotli for .br files)'))
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""Offline OpenAI-compatible chat server for profiling and load testing.
+
+Serves /v1/chat/completions (plain and streamed) and /v1/models with
+configurable latency, scripted replies and tool calls, and injected errors,
+so the whole /api/chat pipeline runs without network access or a paid key.
+Point the app at it with LLM_BACKEND=stub (and STUB_LLM_URL if the port
+differs).
+
+A script file is JSON, for example:
+
+    {
+      "latency": "lognormal:0.8,0.5",
+      "token_delay": 0.02,
+      "error_rate": 0.01,
+      "error_statuses": [429, 500, 503],
+      "responses": [
+        {"match": "hours", "reply": "We're open Monday to Friday, 9 to 5."},
+        {"match": "quote", "replies": ["About $150.", "Roughly $200."]},
+        {"match": "what services", "tool_calls": [{"name": "list_services", "arguments": {}}]},
+        {"match": "break", "error": 500}
+      ]
+    }
+
+Rules are tried in order against the last user message (case-insensitive
+regex search). "replies" are served in rotation. Tool calls are only
+returned when the request offers tools and allows them, and never right
+after a tool result, so the agent's loop always finishes.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+from quart import Quart, Response, jsonify, request
+
+DEFAULT_REPLY = "This is a stub reply to: {message}"
+AFTER_TOOL_REPLY = "All done, I've taken care of that for you."
+
+def parse_latency(spec) -> Callable[[], float]:
+    """Build a sampler from 'fixed:s', 'uniform:lo,hi', 'normal:mean,sd', 'lognormal:median,sigma' or 'exponential:mean'."""
+    if isinstance(spec, (int, float)):
+        spec = f"fixed:{spec}"
+    name, _, args = str(spec).partition(':')
+    params = [float(a) for a in args.split(',') if a.strip()]
+    try:
+        if name == 'fixed':
+            return lambda: params[0]
+        if name == 'uniform':
+            return lambda: random.uniform(params[0], params[1])
+        if name == 'normal':
+            return lambda: max(0.0, random.gauss(params[0], params[1]))
+        if name == 'lognormal':
+            return lambda: random.lognormvariate(math.log(params[0]), params[1])
+        if name == 'exponential':
+            return lambda: random.expovariate(1.0 / params[0])
+    except IndexError:
+        pass
+    raise ValueError(f"Invalid latency spec '{spec}'")
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token), for the usage block."""
+    return max(1, len(text) // 4) if text else 0
+
+class StubScript:
+    """Decides what the stub answers for each request: content, tool calls or an error."""
+
+    def __init__(self, config: Dict):
+        self.latency = parse_latency(config.get('latency', 'fixed:0.5'))
+        self.token_delay = float(config.get('token_delay', 0.02))
+        self.error_rate = float(config.get('error_rate', 0.0))
+        self.error_statuses = list(config.get('error_statuses', [500]))
+        self.default_reply = config.get('default_reply', DEFAULT_REPLY)
+        self.after_tool_reply = config.get('after_tool_reply', AFTER_TOOL_REPLY)
+        self.rules = []
+        for rule in config.get('responses', []):
+            rule = dict(rule)
+            rule['pattern'] = re.compile(rule.get('match', ''), re.IGNORECASE)
+            if 'replies' in rule:
+                rule['rotation'] = itertools.cycle(rule['replies'])
+            if 'latency' in rule:
+                rule['latency'] = parse_latency(rule['latency'])
+            self.rules.append(rule)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Optional[str], **overrides) -> 'StubScript':
+        config = {}
+        if path:
+            with open(path) as f:
+                config = json.load(f)
+        config.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(config)
+
+    def plan(self, body: Dict) -> Dict:
+        """Return {'delay', 'error'} or {'delay', 'content', 'tool_calls'} for one request."""
+        messages = body.get('messages', [])
+        last = messages[-1] if messages else {}
+        user_text = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+        tools_allowed = bool(body.get('tools')) and body.get('tool_choice') != 'none'
+
+        rule = next((r for r in self.rules if r['pattern'].search(user_text)), None)
+        delay = rule['latency']() if rule and 'latency' in rule else self.latency()
+
+        error = rule.get('error') if rule else None
+        if error is None and self.error_rate and random.random() < self.error_rate:
+            error = random.choice(self.error_statuses)
+        if error is not None:
+            return {'delay': delay, 'error': int(error)}
+
+        if last.get('role') == 'tool':
+            return {'delay': delay, 'content': self.after_tool_reply, 'tool_calls': []}
+        if rule and rule.get('tool_calls') and tools_allowed:
+            return {'delay': delay, 'content': None, 'tool_calls': rule['tool_calls']}
+        if rule and 'rotation' in rule:
+            with self._lock:
+                content = next(rule['rotation'])
+        elif rule and 'reply' in rule:
+            content = rule['reply']
+        else:
+            content = self.default_reply
+        return {'delay': delay, 'content': content.replace('{message}', user_text), 'tool_calls': []}
+
+def split_tokens(text: str) -> List[str]:
+    """Split text into word-sized stream chunks that join back to the original."""
+    return re.findall(r"\S+\s*|\s+", text) or ['']
+
+def _tool_call_entries(tool_calls: List[Dict]) -> List[Dict]:
+    return [{
+        'id': f"call_{uuid.uuid4().hex[:24]}",
+        'type': 'function',
+        'function': {'name': call['name'], 'arguments': json.dumps(call.get('arguments', {}))}
+    } for call in tool_calls]
+
+def _error_response(status: int):
+    messages = {429: ('Rate limit reached (stub)', 'rate_limit_exceeded'),
+                503: ('The server is overloaded (stub)', 'server_error')}
+    message, code = messages.get(status, (f'Injected error {status} (stub)', 'server_error'))
+    headers = {'Retry-After': '1'} if status in (429, 503) else {}
+    return jsonify({'error': {'message': message, 'type': code, 'param': None, 'code': code}}), status, headers
+
+def create_app(script: StubScript) -> Quart:
+    stub = Quart(__name__)
+    stats = Counter()
+
+    @stub.route('/v1/models', methods=['GET'])
+    async def list_models():
+        return jsonify({'object': 'list', 'data': [{'id': 'gpt-4', 'object': 'model', 'created': 0, 'owned_by': 'stub'}]})
+
+    @stub.route('/v1/models/<path:model>', methods=['GET'])
+    async def get_model(model):
+        return jsonify({'id': model, 'object': 'model', 'created': 0, 'owned_by': 'stub'})
+
+    @stub.route('/stats', methods=['GET'])
+    async def get_stats():
+        return jsonify(dict(stats))
+
+    @stub.route('/v1/chat/completions', methods=['POST'])
+    async def chat_completions():
+        body = await request.get_json()
+        plan = script.plan(body)
+        model = body.get('model', 'gpt-4')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        stats['requests'] += 1
+
+        if 'error' in plan:
+            stats[f"error_{plan['error']}"] += 1
+            await asyncio.sleep(plan['delay'])
+            return _error_response(plan['error'])
+
+        tool_calls = _tool_call_entries(plan['tool_calls'])
+        content = plan['content']
+        tokens = split_tokens(content) if content is not None else []
+        finish_reason = 'tool_calls' if tool_calls else 'stop'
+        stats['tool_calls' if tool_calls else 'replies'] += 1
+        prompt_tokens = sum(estimate_tokens(m.get('content') or '') for m in body.get('messages', []))
+        completion_tokens = estimate_tokens(content or json.dumps(tool_calls))
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                 'total_tokens': prompt_tokens + completion_tokens}
+
+        if not body.get('stream'):
+            await asyncio.sleep(plan['delay'] + script.token_delay * len(tokens))
+            message = {'role': 'assistant', 'content': content}
+            if tool_calls:
+                message['tool_calls'] = tool_calls
+            return jsonify({
+                'id': completion_id, 'object': 'chat.completion', 'created': created, 'model': model,
+                'choices': [{'index': 0, 'message': message, 'finish_reason': finish_reason}],
+                'usage': usage
+            })
+
+        def chunk(delta: Dict, finish: Optional[str] = None) -> str:
+            payload = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                       'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish}]}
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def generate():
+            # The first delay stands for time to first token
+            await asyncio.sleep(plan['delay'])
+            yield chunk({'role': 'assistant', 'content': '' if content is not None else None})
+            for index, call in enumerate(tool_calls):
+                yield chunk({'tool_calls': [{'index': index, 'id': call['id'], 'type': 'function',
+                                             'function': {'name': call['function']['name'], 'arguments': ''}}]})
+                yield chunk({'tool_calls': [{'index': index,
+                                             'function': {'arguments': call['function']['arguments']}}]})
+            for token in tokens:
+                await asyncio.sleep(script.token_delay)
+                yield chunk({'content': token})
+            yield chunk({}, finish_reason)
+            # Like OpenAI, usage comes in a final chunk with no choices when asked for
+            if (body.get('stream_options') or {}).get('include_usage'):
+                payload = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created,
+                           'model': model, 'choices': [], 'usage': usage}
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        response = Response(generate(), mimetype='text/event-stream')
+        response.timeout = None
+        return response
+
+    return stub
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8010)
+    parser.add_argument('--script', help='JSON script file with latency, errors and responses')
+    parser.add_argument('--latency', help="Time to first token, e.g. 'fixed:0.5' or 'lognormal:0.8,0.5'")
+    parser.add_argument('--token-delay', type=float, help='Seconds between streamed tokens')
+    parser.add_argument('--error-rate', type=float, help='Fraction of requests that fail')
+    parser.add_argument('--seed', type=int, help='Seed the random sampler for repeatable runs')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    script = StubScript.load(args.script, latency=args.latency, token_delay=args.token_delay,
+                             error_rate=args.error_rate)
+    print(f"Stub LLM server on http://{args.host}:{args.port}/v1")
+    create_app(script).run(host=args.host, port=args.port)
+
+if __name__ == '__main__':
+    main()
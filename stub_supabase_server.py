@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""Offline PostgREST-compatible stand-in for Supabase, for profiling and load testing.
+
+Serves /rest/v1/<table> from in-memory tables seeded with the sample
+services from create_tables.sql plus generated clients and schedules. It
+understands the subset of PostgREST the agent uses: column selection with
+one level of embedded resources (e.g. "*, clients(name)"), eq/neq/gt/gte/
+lt/lte/like/ilike/in/is filters, order, limit and offset, and insert,
+update and delete returning the affected rows.
+
+Point the app at it with SUPABASE_URL=http://127.0.0.1:8020 and any
+JWT-shaped SUPABASE_KEY, such as the STUB_SUPABASE_KEY below.
+"""
+import argparse
+import asyncio
+import datetime
+import random
+import re
+import threading
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+from quart import Quart, jsonify, request
+from stub_llm_server import parse_latency
+
+# supabase-py only checks that the key looks like a JWT
+STUB_SUPABASE_KEY = 'stub.stub.stub'
+
+SAMPLE_SERVICES = [
+    ('Window cleaning', 'Professional window cleaning service', 150.00, 120),
+    ('Eaves cleaning', 'Gutter and eaves cleaning service', 225.00, 180),
+    ('Light fixture cleaning', 'Interior and exterior light fixture cleaning', 75.00, 60),
+    ('General maintenance', 'General property maintenance and repairs', 100.00, 120),
+]
+FIRST_NAMES = ['Anna', 'Ben', 'Chloe', 'David', 'Emma', 'Farid', 'Grace', 'Hiro', 'Isla', 'Jamal', 'Kate', 'Liam']
+LAST_NAMES = ['Wong', 'Smith', 'Patel', 'Garcia', 'Nguyen', 'Brown', 'Martin', 'Lee', 'Clark', 'Singh']
+START_TIMES = ['09:00', '10:00', '11:00', '13:00', '14:00', '15:00']
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+def seed_tables(clients: int, schedules: int, days: int = 30) -> Dict[str, List[Dict]]:
+    """Build in-memory tables; schedules spread over `days` either side of today."""
+    created_at = _now()
+    tables = {'services': [], 'clients': [], 'locations': [], 'schedules': []}
+    for name, description, price, duration in SAMPLE_SERVICES:
+        tables['services'].append({'id': str(uuid.uuid4()), 'name': name, 'description': description, 'price': price,
+                                   'duration_minutes': duration, 'created_at': created_at, 'updated_at': created_at})
+    for i in range(clients):
+        name = f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+        if i >= len(FIRST_NAMES) * len(LAST_NAMES):
+            name += f" {i}"
+        tables['clients'].append({'id': str(uuid.uuid4()), 'name': name, 'email': None, 'phone': None,
+                                  'address': None, 'created_at': created_at, 'updated_at': created_at})
+    today = datetime.date.today()
+    for _ in range(schedules if clients else 0):
+        service = random.choice(tables['services'])
+        start = datetime.datetime.strptime(random.choice(START_TIMES), '%H:%M')
+        end = start + datetime.timedelta(minutes=service['duration_minutes'])
+        tables['schedules'].append({
+            'id': str(uuid.uuid4()), 'client_id': random.choice(tables['clients'])['id'], 'service_id': service['id'],
+            'location_id': None, 'service_date': (today + datetime.timedelta(days=random.randint(-days, days))).isoformat(),
+            'start_time': start.strftime('%H:%M:%S'), 'end_time': end.strftime('%H:%M:%S'), 'status': 'scheduled',
+            'notes': None, 'created_at': created_at, 'updated_at': created_at})
+    return tables
+
+def _split_top_level(text: str) -> List[str]:
+    """Split a select list on commas that are not inside parentheses."""
+    parts, depth, current = [], 0, ''
+    for char in text:
+        if char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+            continue
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+def _like(pattern: str, case_insensitive: bool):
+    # % (or PostgREST's *) is any run, _ any one character, and a backslash escapes the next character
+    regex = '^' + ''.join(
+        re.escape(escaped) if escaped else '.*' if wildcard in ('%', '*') else '.' if wildcard else re.escape(literal)
+        for escaped, wildcard, literal in re.findall(r'\\(.)|([%*_])|(.)', pattern, re.DOTALL)) + '$'
+    return re.compile(regex, re.IGNORECASE if case_insensitive else 0)
+
+def _comparable(value):
+    return '' if value is None else value
+
+def _matches(row: Dict, column: str, expression: str) -> bool:
+    op, _, operand = expression.partition('.')
+    value = row.get(column)
+    if op == 'eq':
+        return value is not None and str(value) == operand
+    if op == 'neq':
+        return value is None or str(value) != operand
+    if op in ('gt', 'gte', 'lt', 'lte'):
+        if value is None:
+            return False
+        left, right = (float(value), float(operand)) if isinstance(value, (int, float)) else (str(value), operand)
+        return {'gt': left > right, 'gte': left >= right, 'lt': left < right, 'lte': left <= right}[op]
+    if op in ('like', 'ilike'):
+        return value is not None and bool(_like(operand, op == 'ilike').match(str(value)))
+    if op == 'in':
+        return str(value) in [v.strip().strip('"') for v in operand.strip('()').split(',')]
+    if op == 'is':
+        return value is None if operand == 'null' else value is (operand == 'true')
+    raise ValueError(f"Unsupported filter '{op}'")
+
+class StubDatabase:
+    """In-memory tables answering PostgREST-style queries."""
+
+    def __init__(self, tables: Dict[str, List[Dict]]):
+        self.tables = tables
+        self._lock = threading.Lock()
+
+    def _filtered(self, table: str, filters: Dict[str, List[str]]) -> List[Dict]:
+        return [row for row in self.tables[table]
+                if all(_matches(row, column, expression) for column, expressions in filters.items()
+                       for expression in expressions)]
+
+    def _project(self, row: Dict, select: str) -> Dict:
+        result = {}
+        for part in _split_top_level(select or '*'):
+            embedded = re.match(r'^(\w+)\((.*)\)$', part)
+            if embedded:
+                relation, columns = embedded.groups()
+                # Follow the <singular>_id foreign key, e.g. clients -> client_id
+                target_id = row.get(f"{relation[:-1]}_id")
+                target = next((r for r in self.tables.get(relation, []) if r['id'] == target_id), None)
+                result[relation] = self._project(target, columns) if target else None
+            elif part == '*':
+                result.update(row)
+            else:
+                result[part] = row.get(part)
+        return result
+
+    def select(self, table: str, filters: Dict[str, List[str]], select: str, order: Optional[str],
+               limit: Optional[int], offset: int) -> List[Dict]:
+        with self._lock:
+            rows = self._filtered(table, filters)
+            for term in reversed((order or '').split(',') if order else []):
+                column, _, direction = term.partition('.')
+                rows.sort(key=lambda r: _comparable(r.get(column)), reverse=direction.startswith('desc'))
+            rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            return [self._project(row, select) for row in rows]
+
+    def insert(self, table: str, rows: List[Dict]) -> List[Dict]:
+        with self._lock:
+            inserted = []
+            for row in rows:
+                row = dict(row)
+                row.setdefault('id', str(uuid.uuid4()))
+                row.setdefault('created_at', _now())
+                row.setdefault('updated_at', row['created_at'])
+                self.tables[table].append(row)
+                inserted.append(dict(row))
+            return inserted
+
+    def update(self, table: str, filters: Dict[str, List[str]], changes: Dict) -> List[Dict]:
+        with self._lock:
+            updated = []
+            for row in self._filtered(table, filters):
+                row.update(changes)
+                row['updated_at'] = _now()
+                updated.append(dict(row))
+            return updated
+
+    def delete(self, table: str, filters: Dict[str, List[str]]) -> List[Dict]:
+        with self._lock:
+            doomed = self._filtered(table, filters)
+            ids = {id(row) for row in doomed}
+            self.tables[table] = [row for row in self.tables[table] if id(row) not in ids]
+            return doomed
+
+RESERVED_PARAMS = ('select', 'order', 'limit', 'offset', 'on_conflict', 'columns')
+
+def create_app(database: StubDatabase, latency=None) -> Quart:
+    stub = Quart(__name__)
+    sample_latency = latency or (lambda: 0.0)
+    stats = Counter()
+
+    @stub.route('/stats', methods=['GET'])
+    async def get_stats():
+        return jsonify(dict(stats))
+
+    @stub.route('/rest/v1/<table>', methods=['GET', 'POST', 'PATCH', 'DELETE'])
+    async def rest(table):
+        if table not in database.tables:
+            return jsonify({'code': '42P01', 'message': f'relation "{table}" does not exist'}), 404
+        filters: Dict[str, List[str]] = {}
+        for column, expression in request.args.items(multi=True):
+            if column not in RESERVED_PARAMS:
+                filters.setdefault(column, []).append(expression)
+        stats[f"{request.method.lower()}_{table}"] += 1
+        # postgrest-py sends a JSON body even with GET; read it so the connection stays usable
+        body = await request.get_json(silent=True)
+        await asyncio.sleep(sample_latency())
+
+        try:
+            if request.method == 'GET':
+                limit = request.args.get('limit')
+                rows = database.select(table, filters, request.args.get('select', '*'), request.args.get('order'),
+                                       int(limit) if limit else None, int(request.args.get('offset', 0)))
+                return jsonify(rows)
+            if request.method == 'POST':
+                return jsonify(database.insert(table, body if isinstance(body, list) else [body])), 201
+            if request.method == 'PATCH':
+                return jsonify(database.update(table, filters, body))
+            return jsonify(database.delete(table, filters))
+        except ValueError as e:
+            return jsonify({'code': 'PGRST100', 'message': str(e)}), 400
+
+    return stub
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8020)
+    parser.add_argument('--clients', type=int, default=200, help='Generated clients')
+    parser.add_argument('--schedules', type=int, default=1000, help='Generated schedules')
+    parser.add_argument('--latency', default='fixed:0.02', help="Per-request latency, e.g. 'uniform:0.01,0.05'")
+    parser.add_argument('--seed', type=int, help='Seed the generator for repeatable data')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    database = StubDatabase(seed_tables(args.clients, args.schedules))
+    print(f"Stub Supabase server on http://{args.host}:{args.port} "
+          f"({args.clients} clients, {args.schedules} schedules)")
+    create_app(database, parse_latency(args.latency)).run(host=args.host, port=args.port)
+
+if __name__ == '__main__':
+    main()
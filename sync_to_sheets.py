@@ -1,25 +1,22 @@
 import os
 from dotenv import load_dotenv
-from supabase import create_client
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import json
 import datetime
+from repository import get_repository
 
 class DataSyncer:
-    def __init__(self):
+    def __init__(self, repository=None, sheets_service=None):
         # Load environment variables
         load_dotenv()
         
-        # Initialize Supabase client
-        self.supabase = create_client(
-            os.getenv('SUPABASE_URL'),
-            os.getenv('SUPABASE_KEY')
-        )
+        # Shared repository (Supabase unless REPOSITORY_BACKEND says otherwise)
+        self.repository = repository or get_repository()
         
         # Initialize Google Sheets client
-        self.sheets_service = self._init_sheets_service()
+        self.sheets_service = sheets_service or self._init_sheets_service()
         self.spreadsheet_id = os.getenv('GOOGLE_SHEETS_SPREADSHEET_ID')
 
     def _init_sheets_service(self):
@@ -48,8 +45,7 @@ class DataSyncer:
         """Sync clients data from Supabase to Google Sheets."""
         try:
             # Fetch clients from Supabase
-            response = self.supabase.table('clients').select('*').execute()
-            clients = response.data
+            clients = self.repository.all('clients')
 
             # Prepare data for Google Sheets
             values = [['ID', 'Name', 'Email', 'Phone', 'Address', 'Created At', 'Updated At']]
@@ -80,8 +76,7 @@ class DataSyncer:
         """Sync services data from Supabase to Google Sheets."""
         try:
             # Fetch services from Supabase
-            response = self.supabase.table('services').select('*').execute()
-            services = response.data
+            services = self.repository.all('services')
 
             # Prepare data for Google Sheets
             values = [['ID', 'Name', 'Description', 'Price', 'Duration (Minutes)', 'Created At', 'Updated At']]
@@ -112,10 +107,7 @@ class DataSyncer:
         """Sync schedules data from Supabase to Google Sheets."""
         try:
             # Fetch schedules with client and service names
-            response = self.supabase.table('schedules')\
-                .select('*, clients(name), services(name)')\
-                .execute()
-            schedules = response.data
+            schedules = self.repository.all('schedules', columns='*, clients(name), services(name)')
 
             # Prepare data for Google Sheets
             values = [['ID', 'Client Name', 'Service Name', 'Service Date', 'Start Time', 
@@ -150,8 +142,7 @@ class DataSyncer:
         """Sync locations data from Supabase to Google Sheets."""
         try:
             # Fetch locations from Supabase
-            response = self.supabase.table('locations').select('*').execute()
-            locations = response.data
+            locations = self.repository.all('locations')
 
             # Prepare data for Google Sheets
             values = [['ID', 'Name', 'Address', 'City', 'Postal Code', 'Created At', 'Updated At']]
@@ -50,9 +50,9 @@ except ImportError:
     print("❌ python-dotenv not installed, skipping environment check")
     all_env_vars_set = False
 
-# Check Flask installation
+# Check Quart installation
 print("\nChecking Python dependencies:")
-dependencies = ["flask", "flask_cors", "supabase", "openai", "asyncio"]
+dependencies = ["quart", "quart_cors", "supabase", "openai", "asyncio"]
 all_deps_installed = True
 
 for dep in dependencies:
@@ -80,4 +80,4 @@ else:
     
     if not all_deps_installed:
         print("\nSome Python dependencies are missing. Run:")
-        print("pip3 install flask flask-cors python-dotenv supabase openai") 
\ No newline at end of file
+        print("pip3 install quart quart-cors python-dotenv supabase openai") 
\ No newline at end of file
@@ -0,0 +1,40 @@
+import os
+import sys
+
+# Everything runs offline: storage in memory, and no write-behind journal or read replica.
+# Set before the app modules are imported, since they read their settings at import time
+os.environ['REPOSITORY_BACKEND'] = 'memory'
+os.environ['LLM_BACKEND'] = 'stub'
+os.environ['SCHEDULE_WRITE_BEHIND'] = ''
+os.environ['READ_REPLICA_PATH'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datetime
+
+import pytest
+from repository import MemoryRepository, set_repository
+
+CLIENTS = [{'id': 'c1', 'name': 'Anna Wong', 'address': '12 Queen St E, Toronto M5C 1R6'},
+           {'id': 'c2', 'name': 'Ben Carter', 'address': '40 Kingston Rd, Toronto M4E 1Z4'}]
+SERVICES = [{'id': 's1', 'name': 'Window Cleaning', 'price': 120, 'duration_minutes': 60},
+            {'id': 's2', 'name': 'Gutter Cleaning', 'price': 200, 'duration_minutes': 120}]
+
+def future_date(days: int = 7) -> str:
+    """The date `days` ahead, so bookings on it are never in the past."""
+    return (datetime.date.today() + datetime.timedelta(days=days)).isoformat()
+
+@pytest.fixture
+def repository():
+    """A fresh in-memory repository with two clients and two services, used process-wide."""
+    repository = MemoryRepository({'clients': [dict(row) for row in CLIENTS],
+                                   'services': [dict(row) for row in SERVICES]})
+    set_repository(repository)
+    yield repository
+    set_repository(MemoryRepository())
+
+@pytest.fixture
+def agent(repository):
+    from scheduling_agent import SchedulingAgent
+    agent = SchedulingAgent()
+    yield agent
+    agent.close()
@@ -0,0 +1,56 @@
+import pytest
+from conftest import future_date
+
+DAY = future_date(10)
+
+def item(start, end, **extra):
+    return dict({'client_id': 'c1', 'service_id': 's1', 'service_date': DAY,
+                 'start_time': start, 'end_time': end}, **extra)
+
+@pytest.fixture
+def insert_calls(repository, monkeypatch):
+    """Record each insert's row count, and fail any insert that carries a row noted 'boom'."""
+    calls = []
+    insert = repository.insert
+
+    def failing_insert(table, rows):
+        calls.append(len(rows))
+        if any(row.get('notes') == 'boom' for row in rows):
+            raise RuntimeError('insert rejected')
+        return insert(table, rows)
+
+    monkeypatch.setattr(repository, 'insert', failing_insert)
+    return calls
+
+def test_rows_are_inserted_one_request_per_chunk(agent, repository, insert_calls):
+    items = [item(f'{9 + i}:00', f'{9 + i}:30') for i in range(7)]
+    results = agent.create_schedules(items, chunk_size=3)
+    assert [result['status'] for result in results] == ['created'] * 7
+    assert insert_calls == [3, 3, 1]
+    assert len(repository.all('schedules')) == 7
+
+def test_a_failed_chunk_is_retried_row_by_row(agent, repository, insert_calls):
+    items = [item(f'{9 + i}:00', f'{9 + i}:30', notes='boom' if i == 1 else None) for i in range(5)]
+    results = agent.create_schedules(items, chunk_size=3)
+    assert [result['status'] for result in results] == ['created', 'error', 'created', 'created', 'created']
+    assert results[1]['error'] == 'insert rejected'
+    # The first chunk failed, then went one row at a time; the second went through whole
+    assert insert_calls == [3, 1, 1, 1, 2]
+    assert len(repository.all('schedules')) == 4
+    # The failed row no longer holds its slot
+    assert agent.create_schedule('c2', 's1', DAY, '10:00', '10:30') is not None
+
+def test_invalid_and_conflicting_rows_are_reported_without_an_insert(agent, insert_calls):
+    items = [item('09:00', '10:00', id='ok'),
+             item('09:30', '10:30', id='overlaps ok'),
+             item('11:00', '10:00', id='backwards'),
+             item('11:00', '12:00', client_id='nobody', id='unknown client'),
+             item('11:00', '12:00', service_id='nothing', id='unknown service'),
+             item('11:00', '12:00', service_date='2001-01-01', id='past'),
+             'not a dict']
+    results = agent.create_schedules(items)
+    assert [result['status'] for result in results] == \
+        ['created', 'conflict', 'invalid', 'invalid', 'invalid', 'invalid', 'invalid']
+    assert [result.get('id') for result in results[:6]] == \
+        ['ok', 'overlaps ok', 'backwards', 'unknown client', 'unknown service', 'past']
+    assert insert_calls == [1]
@@ -0,0 +1,49 @@
+import pytest
+from conftest import future_date
+
+@pytest.fixture
+def bookings(repository):
+    days = [future_date(7), future_date(8), future_date(9)]
+    rows = [{'id': f'b{i:02d}', 'client_id': 'c1' if i % 2 else 'c2', 'service_id': 's1',
+             'service_date': days[i % 3], 'start_time': '09:00', 'status': 'scheduled'} for i in range(25)]
+    # Outside the requested range, so never returned
+    rows.append({'id': 'late', 'client_id': 'c1', 'service_id': 's1', 'service_date': future_date(30)})
+    repository.insert('schedules', rows)
+    return days, sorted(((row['service_date'], row['id']) for row in rows[:-1]))
+
+def all_pages(agent, start, end, limit, max_pages=100):
+    keys, after, pages = [], None, 0
+    while pages < max_pages:
+        events, after = agent.get_calendar_page(start, end, after, limit)
+        keys += [(event['start'], event['id']) for event in events]
+        pages += 1
+        if after is None:
+            return keys, pages
+    pytest.fail(f'Still paging after {max_pages} pages')
+
+@pytest.mark.parametrize('limit', [1, 4, 8, 25, 100])
+def test_pages_cover_the_range_once_in_key_order(agent, bookings, limit):
+    days, expected = bookings
+    keys, pages = all_pages(agent, days[0], days[-1], limit)
+    assert keys == expected
+    assert pages == max(1, -(-len(expected) // limit))
+
+def test_page_continues_inside_the_day_it_stopped_in(agent, bookings):
+    days, expected = bookings
+    events, after = agent.get_calendar_page(days[0], days[-1], limit=3)
+    assert after == expected[2]
+    assert after[0] == days[0]
+    events, _ = agent.get_calendar_page(days[0], days[-1], after, limit=3)
+    assert [(event['start'], event['id']) for event in events] == expected[3:6]
+
+def test_events_carry_client_and_service_names(agent, bookings):
+    days, _ = bookings
+    events, _ = agent.get_calendar_page(days[0], days[0], limit=1)
+    assert events[0]['title'] in ('Anna Wong - Window Cleaning', 'Ben Carter - Window Cleaning')
+
+def test_deleting_a_row_behind_the_cursor_does_not_shift_later_pages(agent, repository, bookings):
+    days, expected = bookings
+    _, after = agent.get_calendar_page(days[0], days[-1], limit=5)
+    repository.delete('schedules', expected[0][1])
+    events, _ = agent.get_calendar_page(days[0], days[-1], after, limit=5)
+    assert [(event['start'], event['id']) for event in events] == expected[5:10]
@@ -0,0 +1,73 @@
+import pytest
+import scheduling_agent
+from conftest import future_date
+from schedule_index import ScheduleConflict, ScheduleIndex
+
+DAY = future_date(7)
+
+def booking(schedule_id, start, end=None, crew=None, status='scheduled', service_id='s1', day=DAY):
+    return {'id': schedule_id, 'service_date': day, 'start_time': start, 'end_time': end,
+            'crew': crew, 'status': status, 'service_id': service_id}
+
+@pytest.fixture
+def index():
+    rows = [booking('a', '09:00', '10:00'), booking('b', '13:00', None, service_id='s2'),
+            booking('c', '09:00', '10:00', crew='Team'), booking('x', '11:00', '12:00', status='cancelled')]
+    durations = {'s1': 60, 's2': 120}
+    return ScheduleIndex(lambda from_date: rows, durations.get)
+
+@pytest.mark.parametrize('start, end, expected', [
+    ('09:30', '10:30', ['a']),
+    ('08:00', '09:00', []),            # ends as the other starts
+    ('10:00', '11:00', []),            # starts as the other ends
+    ('08:00', '16:00', ['a', 'b']),
+    ('14:30', '15:30', ['b']),         # no end time: the service's 120 minutes
+    ('11:15', '11:45', []),            # the cancelled booking frees its slot
+])
+def test_conflicts_for_one_crew(index, start, end, expected):
+    conflicts = index.conflicts(booking('new', start, end))
+    assert sorted(conflict['id'] for conflict in conflicts) == expected
+
+def test_other_crews_and_days_do_not_conflict(index):
+    assert [c['id'] for c in index.conflicts(booking('new', '09:30', '10:30', crew='Team'))] == ['c']
+    assert index.conflicts(booking('new', '09:30', '10:30', crew='Solo')) == []
+    assert index.conflicts(booking('new', '09:30', '10:30', day=future_date(8))) == []
+
+def test_a_booking_never_conflicts_with_itself(index):
+    assert index.conflicts(booking('a', '09:15', '10:15')) == []
+
+def test_reserve_holds_the_slot_only_without_conflicts(index):
+    assert index.reserve(booking('n1', '10:00', '11:00')) == []
+    assert [c['id'] for c in index.conflicts(booking('n2', '10:30', '10:45'))] == ['n1']
+    assert [c['id'] for c in index.reserve(booking('n3', '09:30', '10:30'))] == ['a', 'n1']
+    assert index.get('n3') is None
+    index.reserve(booking('n4', '09:30', '10:30'), allow_conflicts=True)
+    assert index.get('n4') is not None
+
+def test_moving_only_the_start_keeps_the_length(index):
+    edited = index.edited('a', {'start_time': '14:30'})
+    assert (edited['start_time'], edited['end_time']) == ('14:30', '15:30')
+    assert [c['id'] for c in index.conflicts(edited)] == ['b']
+
+def test_agent_rejects_an_overlapping_booking(agent):
+    agent.create_schedule('c1', 's1', DAY, '09:00', '10:00')
+    with pytest.raises(ScheduleConflict) as raised:
+        agent.create_schedule('c2', 's1', DAY, '09:30', '10:30')
+    assert len(raised.value.conflicts) == 1
+    assert agent.create_schedule('c2', 's1', DAY, '10:00', '11:00') is not None
+
+def test_agent_flags_instead_when_configured(agent, monkeypatch):
+    monkeypatch.setattr(scheduling_agent, 'SCHEDULE_CONFLICT_POLICY', 'flag')
+    first = agent.create_schedule('c1', 's1', DAY, '09:00', '10:00')
+    second = agent.create_schedule('c2', 's1', DAY, '09:30', '10:30')
+    assert [conflict['id'] for conflict in second['conflicts']] == [first['id']]
+
+def test_booking_made_elsewhere_is_seen_before_writing(agent, repository):
+    agent.schedule_index.conflicts(booking('warm', '07:00', '07:30'))
+    # Written by another worker after this worker's index was loaded
+    repository.insert('schedules', [dict(booking('elsewhere', '09:00', '10:00'), client_id='c2')])
+    with pytest.raises(ScheduleConflict):
+        agent.create_schedule('c1', 's1', DAY, '09:30', '10:30')
+    results = agent.create_schedules([{'client_id': 'c1', 'service_id': 's1', 'service_date': DAY,
+                                       'start_time': '09:15', 'end_time': '09:45'}])
+    assert results[0]['status'] == 'conflict'
@@ -0,0 +1,86 @@
+import asyncio
+import datetime
+
+import pytest
+from intent_classifier import classify, parse_date_range
+
+# A Wednesday
+TODAY = datetime.date(2025, 4, 2)
+
+@pytest.mark.parametrize('message, intent, entities', [
+    ('list services', 'list_services', {}),
+    ('What services do you offer?', 'list_services', {}),
+    ('could you please show me the services', 'list_services', {}),
+    ("what's on the schedule for Friday", 'show_schedule', {'start_date': '2025-04-04', 'end_date': '2025-04-04'}),
+    ('bookings for 12/25', 'show_schedule', {'start_date': '2025-12-25', 'end_date': '2025-12-25'}),
+    ('schedule for next week', 'show_schedule', {'start_date': '2025-04-07', 'end_date': '2025-04-13'}),
+    ('can you show me the calendar for tomorrow', 'show_schedule',
+     {'start_date': '2025-04-03', 'end_date': '2025-04-03'}),
+    ('Hi, can you tell me what is on for april 10th?', 'show_schedule',
+     {'start_date': '2025-04-10', 'end_date': '2025-04-10'}),
+    ('cancel booking 3', 'delete_schedule', {'index': 3}),
+    ('find client Anna Wong', 'search_client', {'client': 'Anna Wong'}),
+    ('yes please', 'confirm', {}),
+    ('nope', 'decline', {}),
+])
+def test_routine_messages_are_classified(message, intent, entities):
+    assert classify(message, TODAY) == {'intent': intent, 'entities': entities}
+
+@pytest.mark.parametrize('message', [
+    "what's on next friday",                       # which Friday is ambiguous
+    'book a window clean for Anna tomorrow at 9',
+    'list services and cancel booking 2',
+    'show me the schedule for ' + 'very ' * 30 + 'soon',
+    '',
+])
+def test_everything_else_goes_to_the_llm(message):
+    assert classify(message, TODAY) is None
+
+@pytest.mark.parametrize('text, expected', [
+    ('today', ('2025-04-02', '2025-04-02')),
+    ('this week', ('2025-03-31', '2025-04-06')),
+    ('monday', ('2025-04-07', '2025-04-07')),
+    ('wednesday', ('2025-04-02', '2025-04-02')),
+    ('2025-05-01', ('2025-05-01', '2025-05-01')),
+    ('march 3', ('2026-03-03', '2026-03-03')),         # already past this year
+    ('3rd of may, 2027', ('2027-05-03', '2027-05-03')),
+    ('2025-02-30', None),
+    ('someday', None),
+])
+def test_date_phrases(text, expected):
+    result = parse_date_range(text, TODAY)
+    assert (tuple(day.isoformat() for day in result) if result else None) == expected
+
+@pytest.fixture
+def offline_agent(agent, monkeypatch):
+    """The agent with every LLM entry point made to fail, so only the fast path can answer."""
+    async def no_llm(*args, **kwargs):
+        raise AssertionError('The message went to the LLM')
+    monkeypatch.setattr(agent, 'chat_with_gpt', no_llm)
+    return agent
+
+def test_services_are_listed_without_the_llm(offline_agent):
+    reply = asyncio.run(offline_agent.process_message('can you show me your prices', 'fast'))
+    assert 'Window Cleaning ($120.00, about 60 minutes)' in reply
+    assert 'Gutter Cleaning' in reply
+
+def test_listed_booking_is_cancelled_after_confirmation(offline_agent, repository):
+    day = datetime.date.today() + datetime.timedelta(days=1)
+    repository.insert('schedules', [{'id': 'b1', 'client_id': 'c1', 'service_id': 's1',
+                                     'service_date': day.isoformat(), 'start_time': '09:00', 'status': 'scheduled'}])
+
+    async def conversation():
+        listed = await offline_agent.process_message('can you show me the calendar for tomorrow', 'fast')
+        asked = await offline_agent.process_message('cancel booking 1', 'fast')
+        done = await offline_agent.process_message('yes', 'fast')
+        return listed, asked, done
+
+    listed, asked, done = asyncio.run(conversation())
+    assert '1. ' in listed and 'Anna Wong' in listed
+    assert asked.startswith('Just to confirm')
+    assert done.startswith("Done, I've cancelled booking 1")
+    assert repository.get('schedules', 'b1') is None
+
+def test_client_search_answers_locally(offline_agent):
+    reply = asyncio.run(offline_agent.process_message('find client anna wong', 'fast'))
+    assert 'Anna Wong' in reply
@@ -0,0 +1,78 @@
+import datetime
+import random
+
+import pytest
+from availability import SlotFinder
+from benchmark_slots import generate_bookings, naive_find
+from schedule_index import ScheduleIndex
+
+TODAY = datetime.date.today()
+# The Monday at least a week ahead, and a fixed "now" well before it
+MONDAY = TODAY + datetime.timedelta(days=7 + (-TODAY.weekday()) % 7)
+NOW = datetime.datetime.combine(TODAY, datetime.time(0, 0))
+
+def finder_for(rows, crews=None):
+    return SlotFinder(ScheduleIndex(lambda from_date: rows), crews=crews)
+
+def booking(day, start, end, crew=None, schedule_id=None):
+    return {'id': schedule_id or f'{day}-{start}-{crew}', 'service_date': day.isoformat(),
+            'start_time': start, 'end_time': end, 'status': 'scheduled', 'crew': crew}
+
+def starts(slots):
+    return [(slot['service_date'], slot['start_time']) for slot in slots]
+
+def test_empty_day_offers_the_first_business_slots():
+    slots = finder_for([]).find(60, MONDAY, MONDAY, limit=3, now=NOW)
+    assert starts(slots) == [(MONDAY.isoformat(), t) for t in ('09:00', '09:15', '09:30')]
+    assert slots[0]['end_time'] == '10:00'
+
+def test_slots_start_after_existing_bookings():
+    rows = [booking(MONDAY, '09:00', '10:30')]
+    assert starts(finder_for(rows).find(60, MONDAY, MONDAY, limit=1, now=NOW)) == [(MONDAY.isoformat(), '10:30')]
+
+def test_a_gap_shorter_than_the_service_is_skipped():
+    rows = [booking(MONDAY, '09:00', '10:00'), booking(MONDAY, '10:30', '17:00')]
+    tuesday = MONDAY + datetime.timedelta(days=1)
+    finder = finder_for(rows)
+    assert starts(finder.find(30, MONDAY, tuesday, limit=1, now=NOW)) == [(MONDAY.isoformat(), '10:00')]
+    assert starts(finder.find(60, MONDAY, tuesday, limit=1, now=NOW)) == [(tuesday.isoformat(), '09:00')]
+
+def test_a_slot_must_end_by_closing_time():
+    rows = [booking(MONDAY, '09:00', '15:00')]
+    slots = finder_for(rows).find(120, MONDAY, MONDAY, limit=10, now=NOW)
+    assert starts(slots) == [(MONDAY.isoformat(), '15:00')]
+
+def test_weekends_are_skipped():
+    saturday = MONDAY - datetime.timedelta(days=2)
+    assert starts(finder_for([]).find(60, saturday, MONDAY, limit=1, now=NOW)) == [(MONDAY.isoformat(), '09:00')]
+
+def test_slots_already_started_today_are_skipped():
+    now = datetime.datetime.combine(MONDAY, datetime.time(11, 7))
+    assert starts(finder_for([]).find(60, MONDAY, MONDAY, limit=1, now=now)) == [(MONDAY.isoformat(), '11:15')]
+
+def test_the_first_free_crew_gets_the_slot():
+    rows = [booking(MONDAY, '09:00', '12:00', crew='Solo')]
+    slots = finder_for(rows, crews=['Solo', 'Team']).find(60, MONDAY, MONDAY, limit=1, now=NOW)
+    assert (slots[0]['start_time'], slots[0]['crew']) == ('09:00', 'Team')
+
+def test_matches_a_naive_scan_on_generated_bookings():
+    random.seed(7)
+    rows = generate_bookings(400, 21, ['Solo', 'Team'], MONDAY)
+    finder = finder_for(rows, crews=['Solo', 'Team'])
+    end = MONDAY + datetime.timedelta(days=20)
+    for duration in (60, 120, 180, 240):
+        assert finder.find(duration, MONDAY, end, limit=20, now=NOW) == \
+            naive_find(rows, finder, duration, MONDAY, end, 20, NOW)
+
+def test_agent_uses_the_service_duration(agent):
+    result = agent.find_free_slots('s2', MONDAY.isoformat(), MONDAY.isoformat(), limit=1)
+    assert result['duration_minutes'] == 120
+    assert (result['slots'][0]['start_time'], result['slots'][0]['end_time']) == ('09:00', '11:00')
+
+@pytest.mark.parametrize('service_id, start, end', [
+    ('nope', MONDAY.isoformat(), MONDAY.isoformat()),
+    ('s1', 'monday', MONDAY.isoformat()),
+    ('s1', MONDAY.isoformat(), (MONDAY - datetime.timedelta(days=1)).isoformat()),
+])
+def test_agent_reports_bad_searches(agent, service_id, start, end):
+    assert 'error' in agent.find_free_slots(service_id, start, end)
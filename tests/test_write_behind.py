@@ -0,0 +1,102 @@
+import pytest
+import write_behind
+from repository import MemoryRepository
+from write_behind import ScheduleJournal, WriteBehindFlusher
+
+@pytest.fixture
+def journal(tmp_path):
+    return ScheduleJournal(str(tmp_path / 'journal.sqlite3'))
+
+@pytest.fixture
+def store():
+    return MemoryRepository({'schedules': [{'id': 'old', 'service_date': '2030-01-01', 'notes': 'before'}]})
+
+class Outage:
+    """Wraps a repository and fails every call while `down` is set."""
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.down = False
+        self.upserts = 0
+
+    def __getattr__(self, name):
+        method = getattr(self.repository, name)
+
+        def call(*args, **kwargs):
+            if self.down:
+                raise ConnectionError('database unreachable')
+            if name == 'upsert':
+                self.upserts += 1
+            return method(*args, **kwargs)
+        return call
+
+def notes(store):
+    return {row['id']: row.get('notes') for row in store.all('schedules')}
+
+def test_mutations_replay_in_journal_order(journal, store):
+    journal.append('insert', 'a', {'id': 'a', 'service_date': '2030-01-02', 'notes': 'new'})
+    journal.append('update', 'a', {'notes': 'edited'})
+    journal.append('update', 'old', {'notes': 'after'})
+    journal.append('insert', 'b', {'id': 'b', 'service_date': '2030-01-03'})
+    journal.append('delete', 'b')
+    assert WriteBehindFlusher(journal, lambda: store).flush() == 5
+    assert notes(store) == {'old': 'after', 'a': 'edited'}
+    assert journal.counts() == {}
+
+def test_a_run_of_inserts_is_one_upsert(journal, store):
+    backend = Outage(store)
+    for i in range(4):
+        journal.append('insert', f's{i}', {'id': f's{i}', 'service_date': '2030-01-02', 'notes': None if i else 'x'})
+    WriteBehindFlusher(journal, lambda: backend).flush()
+    assert backend.upserts == 1
+    assert len(store.all('schedules')) == 5
+
+def test_writes_survive_a_restart(tmp_path, store):
+    path = str(tmp_path / 'journal.sqlite3')
+    ScheduleJournal(path).append('insert', 'a', {'id': 'a', 'service_date': '2030-01-02'})
+    # A new process opens the same file and sends what the old one left behind
+    reopened = ScheduleJournal(path)
+    assert WriteBehindFlusher(reopened, lambda: store).flush() == 1
+    assert 'a' in notes(store)
+
+def test_an_update_to_a_missing_schedule_is_parked(journal, store):
+    journal.append('update', 'gone', {'notes': 'lost'})
+    journal.append('update', 'old', {'notes': 'after'})
+    assert WriteBehindFlusher(journal, lambda: store).flush() == 1
+    assert journal.counts() == {'failed': 1}
+    assert notes(store)['old'] == 'after'
+
+def test_failed_writes_back_off_and_hold_later_writes_for_the_schedule(journal, store, monkeypatch):
+    monkeypatch.setattr(write_behind, 'SCHEDULE_FLUSH_RETRY_SECONDS', 60)
+    backend = Outage(store)
+    flusher = WriteBehindFlusher(journal, lambda: backend)
+    journal.append('update', 'old', {'notes': 'first'})
+    backend.down = True
+    assert flusher.flush() == 0
+    backend.down = False
+    journal.append('update', 'old', {'notes': 'second'})
+    journal.append('insert', 'other', {'id': 'other', 'service_date': '2030-01-02'})
+    # 'old' is still backing off, so only the other schedule goes out
+    assert flusher.flush() == 1
+    assert notes(store)['old'] == 'before'
+    assert [entry['schedule_id'] for entry in journal.pending(10)] == ['old', 'old']
+
+    monkeypatch.setattr(write_behind.time, 'time', lambda: 1e12)
+    assert flusher.flush() == 2
+    assert notes(store)['old'] == 'second'
+
+def test_writes_are_parked_after_max_attempts(journal, store, monkeypatch):
+    monkeypatch.setattr(write_behind, 'SCHEDULE_FLUSH_RETRY_SECONDS', 0)
+    backend = Outage(store)
+    backend.down = True
+    flusher = WriteBehindFlusher(journal, lambda: backend, max_attempts=3)
+    journal.append('update', 'old', {'notes': 'never'})
+    for _ in range(3):
+        flusher.flush()
+    assert journal.counts() == {'failed': 1}
+
+def test_only_one_flusher_leads_a_journal(journal, store):
+    first = WriteBehindFlusher(journal, lambda: store)
+    second = WriteBehindFlusher(ScheduleJournal(journal.path), lambda: store)
+    assert first._is_leader()
+    assert not second._is_leader()
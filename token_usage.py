@@ -0,0 +1,174 @@
+import contextvars
+import datetime
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import metrics
+
+# Sessions whose token totals are kept; the least recently active are dropped first
+TOKEN_USAGE_MAX_SESSIONS = int(os.getenv('TOKEN_USAGE_MAX_SESSIONS', '1000'))
+# How often the server logs a usage summary; 0 turns the log off
+TOKEN_USAGE_LOG_SECONDS = float(os.getenv('TOKEN_USAGE_LOG_SECONDS', '300'))
+
+# US dollars per 1,000 (prompt, completion) tokens. A model is priced by its longest matching
+# prefix, so dated snapshots such as gpt-4-0613 use the family's price. LLM_PRICES takes JSON
+# like {"gpt-4": [0.03, 0.06]} to add models or change prices.
+DEFAULT_PRICES = {
+    'gpt-4': (0.03, 0.06),
+    'gpt-4-32k': (0.06, 0.12),
+    'gpt-4-turbo': (0.01, 0.03),
+    'gpt-4-1106': (0.01, 0.03),
+    'gpt-4-0125': (0.01, 0.03),
+    'gpt-4o': (0.0025, 0.01),
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+}
+LLM_PRICES = dict(DEFAULT_PRICES, **{model: tuple(price) for model, price
+                                     in json.loads(os.getenv('LLM_PRICES') or '{}').items()})
+
+# The HTTP endpoint a call is made for; app.py sets it per request
+current_endpoint: contextvars.ContextVar = contextvars.ContextVar('current_endpoint', default='internal')
+
+def session_label(session_id: str) -> str:
+    """A one-way label for a session id. Anyone holding an id can resume its conversation
+    through /api/chat, so usage reports show this instead."""
+    return hashlib.sha256(session_id.encode()).hexdigest()[:16]
+
+def usage_counts(usage) -> Optional[Tuple[int, int]]:
+    """(prompt_tokens, completion_tokens) from a response's usage, as an object or a dict."""
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return int(usage.get('prompt_tokens') or 0), int(usage.get('completion_tokens') or 0)
+    return int(usage.prompt_tokens or 0), int(usage.completion_tokens or 0)
+
+def _totals() -> Dict:
+    return {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0, 'cost_usd': 0.0}
+
+def _add(totals: Dict, prompt_tokens: int, completion_tokens: int, cost: float):
+    totals['calls'] += 1
+    totals['prompt_tokens'] += prompt_tokens
+    totals['completion_tokens'] += completion_tokens
+    totals['total_tokens'] += prompt_tokens + completion_tokens
+    totals['cost_usd'] += cost
+
+def _rounded(totals: Dict) -> Dict:
+    return dict(totals, cost_usd=round(totals['cost_usd'], 6))
+
+class UsageTracker:
+    """Token counts and cost of every LLM call, by session, endpoint and model.
+
+    Totals are kept for the whole process, per endpoint and per model, and
+    per session for the most recently active TOKEN_USAGE_MAX_SESSIONS
+    sessions. A session also records the prompt size of its first, latest
+    and largest call, which shows how fast its history grows the prompt.
+    Every call is exported to the Prometheus metrics as well. Calls whose
+    response had no usage block are counted as `unreported`.
+    """
+
+    def __init__(self, prices: Optional[Dict[str, Tuple[float, float]]] = None,
+                 max_sessions: int = TOKEN_USAGE_MAX_SESSIONS):
+        self.prices = LLM_PRICES if prices is None else prices
+        self.max_sessions = max_sessions
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self._totals = _totals()
+        self._unreported = 0
+        self._by_endpoint: Dict[str, Dict] = {}
+        self._by_model: Dict[str, Dict] = {}
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def calls(self) -> int:
+        return self._totals['calls'] + self._unreported
+
+    def price(self, model: str) -> Optional[Tuple[float, float]]:
+        """Per-1K-token (prompt, completion) price of the longest known prefix of `model`."""
+        matches = [known for known in self.prices if model.startswith(known)]
+        return self.prices[max(matches, key=len)] if matches else None
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        price = self.price(model)
+        if price is None:
+            return 0.0
+        return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1000
+
+    def record(self, model: str, usage, session_id: Optional[str] = None,
+               endpoint: Optional[str] = None) -> Optional[Dict]:
+        """Add one call's usage; returns its counts and cost, or None if the response had no usage."""
+        endpoint = endpoint or current_endpoint.get()
+        counts = usage_counts(usage)
+        if counts is None:
+            with self._lock:
+                self._unreported += 1
+            metrics.LLM_CALLS_UNREPORTED.inc(endpoint=endpoint, model=model)
+            return None
+        prompt_tokens, completion_tokens = counts
+        cost = self.cost(model, prompt_tokens, completion_tokens)
+
+        with self._lock:
+            _add(self._totals, prompt_tokens, completion_tokens, cost)
+            _add(self._by_endpoint.setdefault(endpoint, _totals()), prompt_tokens, completion_tokens, cost)
+            _add(self._by_model.setdefault(model, _totals()), prompt_tokens, completion_tokens, cost)
+            if session_id is not None:
+                session = self._sessions.pop(session_id, None)
+                if session is None:
+                    session = dict(_totals(), first_prompt_tokens=prompt_tokens, max_prompt_tokens=0)
+                _add(session, prompt_tokens, completion_tokens, cost)
+                session['last_prompt_tokens'] = prompt_tokens
+                session['max_prompt_tokens'] = max(session['max_prompt_tokens'], prompt_tokens)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+
+        metrics.LLM_TOKENS.inc(prompt_tokens, endpoint=endpoint, model=model, kind='prompt')
+        metrics.LLM_TOKENS.inc(completion_tokens, endpoint=endpoint, model=model, kind='completion')
+        metrics.LLM_COST.inc(cost, endpoint=endpoint, model=model)
+        metrics.PROMPT_TOKENS.observe(prompt_tokens, endpoint=endpoint)
+        return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens, 'cost_usd': cost}
+
+    @staticmethod
+    def _session_view(session_id: str, session: Dict) -> Dict:
+        calls = session['calls']
+        growth = (session['last_prompt_tokens'] - session['first_prompt_tokens']) / (calls - 1) if calls > 1 else 0
+        return dict(_rounded(session), session=session_label(session_id),
+                    prompt_growth_per_call=round(growth, 1))
+
+    def session(self, session_id: str) -> Optional[Dict]:
+        """One session's totals and prompt sizes, or None if it made no calls (or was dropped)."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return self._session_view(session_id, dict(session)) if session else None
+
+    def summary(self, top: int = 10) -> Dict:
+        """Process-wide totals, per endpoint and model, and the `top` sessions by tokens used."""
+        with self._lock:
+            sessions = sorted(self._sessions.items(), key=lambda item: item[1]['total_tokens'], reverse=True)
+            return {
+                'since': self.started_at.isoformat(),
+                'totals': dict(_rounded(self._totals), unreported_calls=self._unreported),
+                'by_endpoint': {name: _rounded(totals) for name, totals in sorted(self._by_endpoint.items())},
+                'by_model': {name: _rounded(totals) for name, totals in sorted(self._by_model.items())},
+                'sessions_tracked': len(self._sessions),
+                'top_sessions': [self._session_view(session_id, session) for session_id, session in sessions[:top]],
+            }
+
+    def log_line(self) -> str:
+        """A one-line summary for the periodic log."""
+        with self._lock:
+            totals = dict(self._totals)
+            endpoints = sorted(self._by_endpoint.items(), key=lambda item: item[1]['total_tokens'], reverse=True)
+            sessions = len(self._sessions)
+        average = totals['prompt_tokens'] / totals['calls'] if totals['calls'] else 0
+        line = (f"LLM usage since {self.started_at:%Y-%m-%d %H:%M}: {totals['calls']} calls, "
+                f"{totals['total_tokens']:,} tokens ({totals['prompt_tokens']:,} prompt, "
+                f"{totals['completion_tokens']:,} completion), ${totals['cost_usd']:.4f}, "
+                f"{average:.0f} prompt tokens per call, {sessions} sessions")
+        if endpoints:
+            line += '; ' + ', '.join(f"{name} {values['total_tokens']:,} tokens ${values['cost_usd']:.4f}"
+                                     for name, values in endpoints)
+        return line
@@ -0,0 +1,238 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import metrics
+from repository import Repository
+
+# Local journal of schedule writes waiting to reach Supabase; workers on one machine share it
+SCHEDULE_JOURNAL_PATH = os.getenv('SCHEDULE_JOURNAL_PATH', 'schedule_journal.sqlite3')
+# How often the flusher looks for new writes, and most writes sent per round
+SCHEDULE_FLUSH_INTERVAL_SECONDS = float(os.getenv('SCHEDULE_FLUSH_INTERVAL_SECONDS', '0.5'))
+SCHEDULE_FLUSH_BATCH = int(os.getenv('SCHEDULE_FLUSH_BATCH', '100'))
+# Failed writes are retried with exponential backoff, then parked as failed
+SCHEDULE_FLUSH_MAX_ATTEMPTS = int(os.getenv('SCHEDULE_FLUSH_MAX_ATTEMPTS', '10'))
+SCHEDULE_FLUSH_RETRY_SECONDS = 1.0
+SCHEDULE_FLUSH_MAX_RETRY_SECONDS = 300.0
+
+OPERATIONS = ('insert', 'update', 'delete')
+
+class PermanentWriteError(Exception):
+    """A write that cannot succeed however often it is retried."""
+
+class ScheduleJournal:
+    """Durable, append-only queue of schedule mutations in a SQLite file.
+
+    Each entry is (seq, op, schedule_id, payload). Appends are committed
+    before they return, so an accepted write survives a crash. Entries are
+    deleted once Supabase has them; ones that keep failing stay behind with
+    status 'failed' for someone to look at.
+    """
+
+    def __init__(self, path: str = SCHEDULE_JOURNAL_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=FULL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS schedule_mutations ('
+                         'seq INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, schedule_id TEXT NOT NULL, '
+                         'payload TEXT NOT NULL, status TEXT NOT NULL DEFAULT \'pending\', '
+                         'attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL DEFAULT 0, '
+                         'last_error TEXT, created_at REAL NOT NULL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_schedule_mutations_status ON schedule_mutations(status, seq)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_schedule_mutations_schedule '
+                         'ON schedule_mutations(schedule_id, seq)')
+        self._lock = threading.Lock()
+
+    def append(self, op: str, schedule_id: str, payload: Optional[Dict] = None) -> int:
+        """Queue one mutation and return its sequence number."""
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{op}'")
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT INTO schedule_mutations (op, schedule_id, payload, created_at) VALUES (?, ?, ?, ?)',
+                (op, str(schedule_id), json.dumps(payload or {}, default=str), time.time()))
+            return cursor.lastrowid
+
+    def pending(self, limit: int, now: Optional[float] = None) -> List[Dict]:
+        """The oldest pending mutations, in the order they were made.
+
+        With `now`, only those due by then: an entry still backing off is left
+        out along with every later one for the same schedule, so a run of
+        retries neither reorders a schedule's writes nor crowds out due ones.
+        """
+        with self._lock:
+            if now is None:
+                rows = self._db.execute(
+                    'SELECT seq, op, schedule_id, payload, attempts, next_attempt_at FROM schedule_mutations '
+                    'WHERE status = \'pending\' ORDER BY seq LIMIT ?', (limit,)).fetchall()
+            else:
+                rows = self._db.execute(
+                    'SELECT seq, op, schedule_id, payload, attempts, next_attempt_at FROM schedule_mutations m '
+                    'WHERE status = \'pending\' AND NOT EXISTS (SELECT 1 FROM schedule_mutations w '
+                    'WHERE w.schedule_id = m.schedule_id AND w.seq <= m.seq AND w.status = \'pending\' '
+                    'AND w.next_attempt_at > ?) ORDER BY seq LIMIT ?', (now, limit)).fetchall()
+        return [{'seq': seq, 'op': op, 'schedule_id': schedule_id, 'payload': json.loads(payload),
+                 'attempts': attempts, 'next_attempt_at': next_attempt_at}
+                for seq, op, schedule_id, payload, attempts, next_attempt_at in rows]
+
+    def done(self, seqs: List[int]):
+        with self._lock:
+            self._db.executemany('DELETE FROM schedule_mutations WHERE seq = ?', [(seq,) for seq in seqs])
+
+    def retry_later(self, seq: int, attempts: int, error: str, next_attempt_at: float):
+        with self._lock:
+            self._db.execute('UPDATE schedule_mutations SET attempts = ?, last_error = ?, next_attempt_at = ? '
+                             'WHERE seq = ?', (attempts, error, next_attempt_at, seq))
+
+    def fail(self, seq: int, attempts: int, error: str):
+        with self._lock:
+            self._db.execute('UPDATE schedule_mutations SET status = \'failed\', attempts = ?, last_error = ? '
+                             'WHERE seq = ?', (attempts, error, seq))
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute('SELECT status, COUNT(*) FROM schedule_mutations GROUP BY status').fetchall()
+        return dict(rows)
+
+class WriteBehindFlusher:
+    """Background thread that replays the journal through the repository.
+
+    Mutations are applied in journal order. Runs of inserts go out as one
+    upsert, so a retried batch never duplicates rows. If a mutation fails,
+    later mutations of the same schedule wait until it succeeds or is
+    parked, which keeps each schedule's writes in order. Only one process
+    flushes a journal at a time, chosen by an exclusive lock on
+    `<journal>.lock`, so workers sharing the file never send a write twice.
+    """
+
+    def __init__(self, journal: ScheduleJournal, get_repository: Callable[[], Repository],
+                 interval: float = SCHEDULE_FLUSH_INTERVAL_SECONDS, batch: int = SCHEDULE_FLUSH_BATCH,
+                 max_attempts: int = SCHEDULE_FLUSH_MAX_ATTEMPTS):
+        self.journal = journal
+        self.get_repository = get_repository
+        self.interval = interval
+        self.batch = batch
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+        self._flush_lock = threading.Lock()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='schedule-write-behind', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        """Flush soon instead of waiting for the next interval."""
+        self._wake.set()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the thread after one last flush attempt."""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _is_leader(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        lock_file = open(self.journal.path + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                if self._is_leader():
+                    while self.flush() >= self.batch and not self._stopping.is_set():
+                        pass
+            except Exception as e:
+                print(f"Error flushing schedule journal: {e}")
+            if self._stopping.is_set():
+                return
+
+    def flush(self) -> int:
+        """Send one batch of due mutations to Supabase; returns how many were sent."""
+        with self._flush_lock:
+            now = time.time()
+            entries = self.journal.pending(self.batch, now)
+            blocked = set()
+            inserts: List[Dict] = []
+            sent = 0
+
+            for entry in entries:
+                schedule_id = entry['schedule_id']
+                if schedule_id in blocked or entry['next_attempt_at'] > now:
+                    # Something earlier for this schedule is still waiting, so this must wait too
+                    blocked.add(schedule_id)
+                    continue
+                if entry['op'] == 'insert':
+                    inserts.append(entry)
+                    continue
+                # Inserts made earlier in the journal go first
+                sent += self._send_inserts(inserts, blocked)
+                inserts = []
+                sent += self._send(entry, blocked)
+            sent += self._send_inserts(inserts, blocked)
+
+            counts = self.journal.counts()
+            metrics.WRITE_BEHIND_QUEUE.set(counts.get('pending', 0), status='pending')
+            metrics.WRITE_BEHIND_QUEUE.set(counts.get('failed', 0), status='failed')
+            return sent
+
+    def _send_inserts(self, entries: List[Dict], blocked: set) -> int:
+        entries = [entry for entry in entries if entry['schedule_id'] not in blocked]
+        if not entries:
+            return 0
+        if len(entries) > 1:
+            try:
+                self.get_repository().upsert('schedules', [entry['payload'] for entry in entries])
+                self.journal.done([entry['seq'] for entry in entries])
+                metrics.WRITE_BEHIND.inc(len(entries), op='insert', result='flushed')
+                return len(entries)
+            except Exception as e:
+                print(f"Error flushing {len(entries)} inserts, sending them one by one: {e}")
+        return sum(self._send(entry, blocked) for entry in entries)
+
+    def _send(self, entry: Dict, blocked: set) -> int:
+        if entry['schedule_id'] in blocked:
+            return 0
+        repository = self.get_repository()
+        try:
+            if entry['op'] == 'insert':
+                repository.upsert('schedules', [entry['payload']])
+            elif entry['op'] == 'update':
+                if repository.update('schedules', entry['schedule_id'], entry['payload']) is None:
+                    raise PermanentWriteError('No schedule with that id')
+            else:
+                # A schedule that is already gone needs nothing more
+                repository.delete('schedules', entry['schedule_id'])
+        except Exception as e:
+            attempts = entry['attempts'] + 1
+            if isinstance(e, PermanentWriteError) or attempts >= self.max_attempts:
+                # Parked for inspection; later writes for the schedule go ahead without it
+                print(f"Giving up on schedule {entry['op']} #{entry['seq']} for {entry['schedule_id']}: {e}")
+                self.journal.fail(entry['seq'], attempts, str(e))
+                metrics.WRITE_BEHIND.inc(op=entry['op'], result='failed')
+            else:
+                delay = min(SCHEDULE_FLUSH_RETRY_SECONDS * 2 ** (attempts - 1), SCHEDULE_FLUSH_MAX_RETRY_SECONDS)
+                self.journal.retry_later(entry['seq'], attempts, str(e), time.time() + delay)
+                metrics.WRITE_BEHIND.inc(op=entry['op'], result='retried')
+            blocked.add(entry['schedule_id'])
+            return 0
+        self.journal.done([entry['seq']])
+        metrics.WRITE_BEHIND.inc(op=entry['op'], result='flushed')
+        return 1